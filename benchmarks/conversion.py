@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+# benchmark the conversion of api responses to DataFrames and detect
+# regressions against a stored baseline
+# run from the repository root: python3 -m benchmarks.conversion
+# system modules
+import os
+import sys
+import json
+import time
+import argparse
+import tracemalloc
+
+# internal modules
+import netatmo
+from netatmo.api import requests
+from netatmo.api.variables import *
+from tests.test_server import synthetic_stations, synthetic_measures, \
+    synthetic_device
+
+# the numbers of Getpublicdata stations to benchmark
+STATION_SIZES = [1, 100, 10000, 100000]
+
+# the numbers of Getmeasure values to benchmark
+MEASURE_SIZES = [1, 32, GETMEASURE_MAX_MEASURES]
+
+# the default baseline file
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+    "conversion_baseline.json")
+
+# relative increase of time or peak memory regarded as regression
+THRESHOLD = 0.25
+
+# absolute increases below these are regarded as noise
+MIN_SECONDS = 0.001
+MIN_BYTES = 64 * 1024
+
+# minimum total time to spend timing a case
+MIN_TIMING = 0.2
+
+def getpublicdata_response(n):
+    """ a GetpublicdataResponse with n synthetic stations
+    """
+    apirequest = requests.GetpublicdataRequest()
+    return apirequest.response_class(request = apirequest,
+        response = {"status":"ok", "body":synthetic_stations(n)})
+
+def getmeasure_response(n, scale, optimize):
+    """ a GetmeasureResponse with n values of all types allowed at scale
+    """
+    types = GETMEASURE_ALLOWED_TYPES_BY_SCALE[scale]
+    date_begin = 1487242771
+    date_end = date_begin + n * GETMEASURE_SCALE_SECONDS[scale] - 1
+    apirequest = requests.GetmeasureRequest(payload = {"scale":scale,
+        "type":",".join(types), "optimize":"true" if optimize else "false"})
+    return apirequest.response_class(request = apirequest,
+        response = {"status":"ok", "body":synthetic_measures(types,
+            date_begin = date_begin, date_end = date_end, scale = scale,
+            limit = n, optimize = optimize)})
+
+def getstationsdata_response():
+    """ a GetstationsdataResponse of a synthetic device
+    """
+    apirequest = requests.GetstationsdataRequest()
+    return apirequest.response_class(request = apirequest,
+        response = {"status":"ok",
+            "body":synthetic_device("70:ee:50:00:00:01")})
+
+def cases(station_sizes = STATION_SIZES, measure_sizes = MEASURE_SIZES):
+    """ the benchmark cases
+
+    Yields:
+        name, factory: the case name and a function creating the response
+    """
+    for n in station_sizes:
+        yield "getpublicdata/stations={}".format(n), \
+            lambda n=n: getpublicdata_response(n)
+    for scale in GETMEASURE_ALLOWED_TYPES_BY_SCALE:
+        for optimize in (True, False):
+            for n in measure_sizes:
+                yield "getmeasure/scale={}/optimize={}/measures={}".format(
+                    scale, str(optimize).lower(), n), \
+                    lambda n=n, s=scale, o=optimize: getmeasure_response(n,s,o)
+    yield "getstationsdata", getstationsdata_response
+
+def measure(factory):
+    """ the best wall time and the peak memory of a conversion
+
+    Args:
+        factory (callable): creates the response to convert
+
+    Returns:
+        dict: the best wall time in seconds and the peak memory in bytes
+    """
+    response = factory()
+    # wall time: best of repeated conversions (to_dataframe does not cache)
+    best, total, repeats = float("inf"), 0, 0
+    while repeats < 3 or total < MIN_TIMING:
+        start = time.perf_counter()
+        response.to_dataframe()
+        seconds = time.perf_counter() - start
+        best, total, repeats = min(best, seconds), total + seconds, repeats + 1
+    # peak memory: a separate conversion as tracing slows it down
+    tracemalloc.start()
+    try:
+        response.to_dataframe()
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"seconds": best, "peak_bytes": peak}
+
+def regressions(results, baseline, threshold = THRESHOLD):
+    """ compare results to a baseline
+
+    Args:
+        results, baseline (dict): case name -> measure() result
+        threshold (float, optional): the relative increase regarded as
+            regression. Defaults to THRESHOLD.
+
+    Returns:
+        list of str: descriptions of the regressions
+    """
+    found = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        for key, minimum in (("seconds",MIN_SECONDS),("peak_bytes",MIN_BYTES)):
+            new, old = result[key], base[key]
+            if new > old * (1 + threshold) and new - old > minimum:
+                found.append("{}: {} {:.6g} -> {:.6g} (+{:.0%})".format(
+                    name, key, old, new, new / old - 1 if old else float("inf")))
+    return found
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = "benchmark the conversion "
+        "of api responses to DataFrames")
+    parser.add_argument("--baseline", default = BASELINE,
+        help = "the baseline JSON file. Defaults to {}".format(BASELINE))
+    parser.add_argument("--save", action = "store_true",
+        help = "store the results as new baseline")
+    parser.add_argument("--threshold", type = float, default = THRESHOLD,
+        help = "relative increase regarded as regression. "
+        "Defaults to {}".format(THRESHOLD))
+    parser.add_argument("--filter", default = "",
+        help = "only run cases whose name contains this")
+    parser.add_argument("--quick", action = "store_true",
+        help = "skip the largest sizes")
+    args = parser.parse_args(argv)
+
+    station_sizes = STATION_SIZES[:-1] if args.quick else STATION_SIZES
+    measure_sizes = MEASURE_SIZES[:-1] if args.quick else MEASURE_SIZES
+    try:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+    except (OSError, ValueError, KeyError):
+        baseline = {}
+
+    results = {}
+    print("{:<52} {:>12} {:>12} {:>8}".format("case", "ms", "peak KiB",
+        "vs base"))
+    for name, factory in cases(station_sizes, measure_sizes):
+        if args.filter not in name:
+            continue
+        result = results[name] = measure(factory)
+        base = baseline.get(name)
+        print("{:<52} {:>12.3f} {:>12.1f} {:>8}".format(name,
+            result["seconds"] * 1e3, result["peak_bytes"] / 1024,
+            "{:+.0%}".format(result["seconds"] / base["seconds"] - 1)
+            if base else "-"))
+
+    if args.save:
+        baseline.update(results)
+        with open(args.baseline, "w") as f:
+            json.dump({"version": netatmo.__version__, "time": time.time(),
+                "results": baseline}, f, indent = 4, sort_keys = True)
+        print("baseline saved to {}".format(args.baseline))
+        return 0
+    found = regressions(results, baseline, threshold = args.threshold)
+    for regression in found:
+        print("REGRESSION {}".format(regression), file = sys.stderr)
+    return 1 if found else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# benchmark the conversion of Getpublicdata responses to DataFrames
+# run from the repository root: python3 -m benchmarks.getpublicdata_dataframe
+# system modules
+import time
+import random
+
+# internal modules
+from netatmo.api import responsetypes
+from netatmo.api import requests
+
+# the numbers of stations to benchmark
+SIZES = [1000, 10000, 100000]
+
+def synthetic_stations(n, seed = 0):
+    """ create n synthetic Getpublicdata stations with a realistic mix of
+    modules (outdoor module, indoor module, sometimes rain and wind)
+    """
+    rng = random.Random(seed)
+    stations = []
+    for i in range(n):
+        now = 1487242771 + rng.randint(0, 600)
+        measures = {
+            "02:00:00:{:02x}:{:02x}:{:02x}".format(
+                i >> 16 & 0xff, i >> 8 & 0xff, i & 0xff): {
+                "res": {str(now): [rng.uniform(-10,30), rng.randint(20,100)]},
+                "type": ["temperature", "humidity"],
+                },
+            "70:ee:50:{:02x}:{:02x}:{:02x}".format(
+                i >> 16 & 0xff, i >> 8 & 0xff, i & 0xff): {
+                "res": {str(now + 30): [rng.uniform(990,1040)]},
+                "type": ["pressure"],
+                },
+            }
+        if i % 3 == 0:
+            measures["05:00:00:00:00:00"] = {
+                "rain_60min": 0, "rain_24h": 0.3, "rain_live": 0,
+                "rain_timeutc": now,
+                }
+        stations.append({
+            "_id": "70:ee:50:{:02x}:{:02x}:{:02x}".format(
+                i >> 16 & 0xff, i >> 8 & 0xff, i & 0xff),
+            "place": {
+                "location": [rng.uniform(5,15), rng.uniform(47,55)],
+                "altitude": rng.randint(0,500),
+                "timezone": "Europe/Berlin",
+                },
+            "measures": measures,
+            })
+    return stations
+
+def benchmark(n, repeat = 3):
+    """ best wall time in seconds of converting n stations to a DataFrame
+    """
+    response = responsetypes.GetpublicdataResponse(
+        request = requests.GetpublicdataRequest(),
+        response = {"status":"ok", "body":synthetic_stations(n)})
+    best = float("inf")
+    for i in range(repeat):
+        start = time.perf_counter()
+        response.dataframe
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main():
+    print("{:>10} {:>12} {:>18}".format("stations","seconds","µs per station"))
+    for n in SIZES:
+        seconds = benchmark(n)
+        print("{:>10} {:>12.4f} {:>18.2f}".format(n, seconds, seconds / n * 1e6))
+
+if __name__ == "__main__":
+    main()
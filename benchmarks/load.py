@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# end-to-end load benchmark of the client against a local mock api server
+# run from the repository root: python3 -m benchmarks.load
+# system modules
+import json
+import time
+import asyncio
+import argparse
+import http.client
+import concurrent.futures
+
+# internal modules
+import netatmo
+from netatmo.api import authentication
+from netatmo.api import client
+from netatmo.api import connectionpool
+from tests.test_data import EXAMPLE_CREDENTIALS, HAMBURG_COORDINATES_OUTLINE
+from tests.test_server import MockNetatmoServer
+
+DEVICE_ID = "70:ee:50:00:00:01"
+
+# the benchmarked calls
+SCENARIOS = {
+    "getpublicdata": lambda c: c.Getpublicdata(
+        region = HAMBURG_COORDINATES_OUTLINE),
+    "getmeasure": lambda c: c.Getmeasure(device_id = DEVICE_ID,
+        type = ["Temperature","Humidity"], date_begin = 1487242771,
+        date_end = 1487242771 + 1024 * 300, optimize = True),
+    "getstationsdata": lambda c: c.Getstationsdata(device_id = DEVICE_ID),
+    }
+
+def percentile(values, p):
+    """ the p-th percentile of values (nearest rank)
+    """
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values)-1))))]
+
+def summary(name, latencies, seconds, nbytes):
+    """ the benchmark results of a scenario
+    """
+    return {
+        "scenario": name,
+        "requests": len(latencies),
+        "requests_per_second": len(latencies) / seconds,
+        "p50_ms": percentile(latencies, 50) * 1e3,
+        "p99_ms": percentile(latencies, 99) * 1e3,
+        "bytes_per_request": nbytes / len(latencies),
+        }
+
+def make_client(server, cls = client.NetatmoClient):
+    """ a client using the mock server for everything
+    """
+    pool = connectionpool.ConnectionPool(maxsize = 64,
+        connection_class = http.client.HTTPConnection)
+    auth = authentication.Authentication(credentials = EXAMPLE_CREDENTIALS)
+    auth.server = server.address
+    auth.connection_pool = pool
+    return cls(authentication = auth, server = server.address,
+        connection_pool = pool)
+
+def run_threads(server, name, requests, workers):
+    """ issue the requests of a scenario from a thread pool
+    """
+    c = make_client(server)
+    call = SCENARIOS[name]
+    call(c) # warm up: tokens and connections
+    before = server.bytes_sent
+    def timed(i):
+        start = time.perf_counter()
+        call(c).dataframe
+        return time.perf_counter() - start
+    start = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(workers) as executor:
+        latencies = list(executor.map(timed, range(requests)))
+    seconds = time.perf_counter() - start
+    return summary(name, latencies, seconds, server.bytes_sent - before)
+
+def run_async(server, name, requests, workers):
+    """ issue the requests of a scenario with the AsyncNetatmoClient
+    """
+    c = make_client(server, cls = client.AsyncNetatmoClient)
+    call = SCENARIOS[name]
+    async def timed(semaphore):
+        async with semaphore: # measure the latency, not the queueing
+            start = time.perf_counter()
+            (await call(c)).dataframe
+            return time.perf_counter() - start
+    async def all_requests():
+        semaphore = asyncio.Semaphore(workers)
+        await call(c) # warm up: tokens
+        before = server.bytes_sent
+        start = time.perf_counter()
+        latencies = await asyncio.gather(
+            *[timed(semaphore) for i in range(requests)])
+        seconds = time.perf_counter() - start
+        return summary(name, latencies, seconds, server.bytes_sent - before)
+    return asyncio.run(all_requests())
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = "benchmark the client "
+        "against a local mock api server")
+    parser.add_argument("--requests", type = int, default = 200,
+        help = "requests per scenario")
+    parser.add_argument("--workers", type = int, default = 8,
+        help = "concurrent requests")
+    parser.add_argument("--stations", type = int, default = 500,
+        help = "stations per Getpublicdata response")
+    parser.add_argument("--latency", type = float, default = 0.005,
+        help = "seconds the server waits before responding")
+    parser.add_argument("--async", dest = "use_async", action = "store_true",
+        help = "use the AsyncNetatmoClient")
+    parser.add_argument("--scenario", choices = sorted(SCENARIOS),
+        action = "append", help = "run only these scenarios")
+    parser.add_argument("--json", metavar = "FILE",
+        help = "append the results to this JSON lines file to compare "
+        "releases")
+    args = parser.parse_args(argv)
+
+    run = run_async if args.use_async else run_threads
+    results = []
+    with MockNetatmoServer(stations = args.stations,
+        latency = args.latency) as server:
+        print("{:<16} {:>9} {:>10} {:>9} {:>9} {:>12}".format("scenario",
+            "requests", "req/s", "p50 ms", "p99 ms", "bytes/req"))
+        for name in args.scenario or sorted(SCENARIOS):
+            result = run(server, name, args.requests, args.workers)
+            results.append(result)
+            print("{scenario:<16} {requests:>9} {requests_per_second:>10.1f} "
+                "{p50_ms:>9.2f} {p99_ms:>9.2f} {bytes_per_request:>12.0f}"
+                .format(**result))
+    if args.json:
+        with open(args.json, "a") as f:
+            f.write(json.dumps({"version": netatmo.__version__,
+                "time": time.time(), "async": args.use_async,
+                "workers": args.workers, "stations": args.stations,
+                "latency": args.latency, "results": results}) + "\n")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+# benchmark the CPU time of debug logging large responses when DEBUG is off
+# run from the repository root: python3 -m benchmarks.logging_overhead
+# system modules
+import json
+import time
+import logging
+
+# internal modules
+from netatmo.api import requests
+from netatmo.api import jsonstream
+from tests.test_server import synthetic_stations
+
+# the numbers of Getpublicdata stations to benchmark
+SIZES = [1000, 10000, 100000]
+
+def cpu_time(function, repeat = 3):
+    """ best CPU time in seconds of calling function
+    """
+    best = float("inf")
+    for i in range(repeat):
+        start = time.process_time()
+        function()
+        best = min(best, time.process_time() - start)
+    return best
+
+def benchmark(n):
+    """ CPU time of decoding a Getpublicdata response with n stations like
+    ApiRequest.post_request does and of logging it eagerly (str.format, as
+    before) and lazily (%-style, as now)
+    """
+    body = json.dumps({"status":"ok", "body":synthetic_stations(n)}).encode()
+    def decode():
+        return jsonstream.JSONObjectStream(
+            jsonstream.chunks_of(body)).load()
+    data = decode()
+    logger = requests.ApiRequest(server = "", url = "").logger
+    return (cpu_time(decode),
+        cpu_time(lambda: logger.debug("api responeded: {}".format(data))),
+        cpu_time(lambda: logger.debug("api responded: %s", data)))
+
+def main():
+    logging.basicConfig(level = logging.INFO) # DEBUG is disabled
+    print("{:>10} {:>12} {:>12} {:>12}".format("stations", "decode ms",
+        "eager ms", "lazy ms"))
+    for n in SIZES:
+        decode, eager, lazy = benchmark(n)
+        print("{:>10} {:>12.1f} {:>12.1f} {:>12.4f}".format(n,
+            decode * 1e3, eager * 1e3, lazy * 1e3))
+
+if __name__ == "__main__":
+    main()
@@ -6,6 +6,7 @@
 # Internal modules
 from . import utils
 from . import api
+from . import storage
 
 __version__ = "0.1.3"
 
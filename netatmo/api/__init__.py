@@ -5,12 +5,21 @@
 
 # Internal modules
 
+from . import asynchttp
 from . import authentication
+from . import cache
 from . import client
+from . import connectionpool
 from . import errors
+from . import instrumentation
+from . import jsonstream
+from . import poller
+from . import ratelimit
 from . import variables
 from . import requests
 from . import responsetypes
+from . import retry
+from . import tokenstores
 
 __all__ = ['authentication']
 
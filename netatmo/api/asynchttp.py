@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+# module for non-blocking HTTP requests with asyncio
+# system modules
+import socket
+import asyncio
+import contextlib
+import http.client
+import ssl as sslmodule
+
+# internal modules
+from .errors import *
+
+# seconds to wait for connecting and for every read or write
+DEFAULT_TIMEOUT = 60
+
+
+def split_server(server, ssl = True):
+    """ split a server specification into host and port
+
+    Args:
+        server (str): the server domain, optionally with ':port'
+        ssl (bool, optional): whether to use the https default port if no port
+            is given. Defaults to True.
+
+    Returns:
+        host, port
+    """
+    host, sep, port = server.rpartition(":")
+    if not sep or not port.isdigit(): # no port specified
+        return server, 443 if ssl else 80
+    return host, int(port)
+
+async def read_headers(reader):
+    """ read HTTP headers until the empty line
+
+    Args:
+        reader (asyncio.StreamReader): the stream to read from
+
+    Returns:
+        dict: the headers with lowercase names
+    """
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""): # end of headers
+            return headers
+        name, sep, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+async def read_body(reader, headers):
+    """ read a HTTP body according to the given headers
+
+    Args:
+        reader (asyncio.StreamReader): the stream to read from
+        headers (dict): the response headers with lowercase names
+
+    Returns:
+        bytes: the body
+    """
+    if "chunked" in headers.get("transfer-encoding","").lower():
+        chunks = []
+        while True:
+            size = int((await reader.readline()).split(b";")[0], 16)
+            if size == 0: # last chunk
+                await read_headers(reader) # skip trailers
+                return b"".join(chunks)
+            chunks.append(await reader.readexactly(size))
+            await reader.readline() # skip line break after chunk
+    elif "content-length" in headers:
+        return await reader.readexactly(int(headers["content-length"]))
+    else: # read until server closes the connection
+        return await reader.read()
+
+class Connection(object):
+    """ HTTP/1.1 connection to a server using asyncio streams. The connection
+    is kept alive after a response unless the server closes it, so it can be
+    reused for further requests, e.g. from a ConnectionPool. A connection
+    belongs to the event loop it was connected in.
+
+    Args:
+        server (str): the server domain, optionally with ':port'
+        ssl (bool, optional): whether to use SSL. Defaults to True.
+        timeout (float, optional): seconds to wait for connecting and for
+            every read or write. Defaults to DEFAULT_TIMEOUT. None means no
+            limit.
+    """
+    def __init__(self, server, ssl = True, timeout = DEFAULT_TIMEOUT):
+        self.server = server
+        self.ssl = ssl
+        self.timeout = timeout
+        self.reader = None
+        self.writer = None
+        self.responded = False # whether bytes of the last response arrived
+
+    ##################
+    ### Properties ###
+    ##################
+    @property
+    def connected(self):
+        """ [read only] whether the connection is open and can be used
+        """
+        return self.writer is not None and not self.writer.is_closing() \
+            and not self.reader.at_eof()
+
+    @property
+    def host_header(self):
+        """ [read only] the value of the Host header, the host with the port
+        unless it is the default port
+        """
+        host, port = split_server(self.server, ssl = self.ssl)
+        return host if port == (443 if self.ssl else 80) \
+            else "{}:{}".format(host, port)
+
+    ###############
+    ### Methods ###
+    ###############
+    async def within_timeout(self, awaitable):
+        """ await something within the timeout
+
+        Raises:
+            socket.timeout if the timeout passed, like http.client does
+        """
+        try:
+            return await asyncio.wait_for(awaitable, self.timeout)
+        except asyncio.TimeoutError:
+            raise socket.timeout("no answer from {} within {} seconds".format(
+                self.server, self.timeout))
+
+    async def connect(self):
+        """ open the connection
+        """
+        host, port = split_server(self.server, ssl = self.ssl)
+        context = sslmodule.create_default_context() if self.ssl else None
+        self.reader, self.writer = await self.within_timeout(
+            asyncio.open_connection(host, port, ssl = context))
+
+    def close(self):
+        """ close the connection
+        """
+        if self.writer is not None:
+            try: self.writer.close()
+            except RuntimeError: pass # the event loop is closed already
+        self.reader = self.writer = None
+
+    async def aclose(self):
+        """ close the connection and wait until it is closed
+        """
+        writer = self.writer
+        self.close()
+        if writer is not None:
+            try: await writer.wait_closed()
+            except OSError: pass # closed anyway
+
+    async def request(self, url, body, headers = {}, timer = None,
+        close = False):
+        """ Issue a POST request. The connection has to be connected.
+
+        Args:
+            url (str): the url relative to the server
+            body (str or bytes): the request body. str is encoded as UTF-8.
+            headers (dict, optional): additional request headers
+            timer (callable, optional): called with the names of the phases
+                'send', 'wait' and 'read', returns a context manager timing
+                the phase, e.g. instrumentation.RequestEvent.timer
+            close (bool, optional): ask the server to close the connection
+                after the response. Defaults to False.
+
+        Returns:
+            status, headers, body: the response status code, the response
+                headers with lowercase names and the response body bytes.
+                Afterwards, the connection is closed unless it can be reused.
+
+        Raises:
+            http.client.RemoteDisconnected if the server closed the connection
+            without responding
+        """
+        if timer is None:
+            timer = lambda phase: contextlib.nullcontext()
+        if isinstance(body, str):
+            body = body.encode("UTF-8")
+        self.responded = False
+        # assemble the request
+        lines = [
+            "POST {} HTTP/1.1".format(url),
+            "Host: {}".format(self.host_header),
+            "Content-Length: {}".format(len(body)),
+            ]
+        if close:
+            lines.append("Connection: close")
+        lines.extend("{}: {}".format(k,v) for k,v in headers.items())
+        head = ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+        try:
+            with timer("send"):
+                self.writer.write(head + body)
+                await self.within_timeout(self.writer.drain())
+            # read the status line
+            with timer("wait"):
+                statusline = await self.within_timeout(self.reader.readline())
+            if not statusline:
+                raise http.client.RemoteDisconnected("{} closed the "
+                    "connection without response".format(self.server))
+            self.responded = True
+            statusline = statusline.decode("latin-1").split(None,2)
+            try:
+                status = int(statusline[1])
+            except (IndexError, ValueError):
+                raise ApiResponseError("invalid HTTP status line {}".format(
+                    statusline))
+            with timer("read"):
+                response_headers = await self.within_timeout(
+                    read_headers(self.reader))
+                delimited = "content-length" in response_headers or "chunked" \
+                    in response_headers.get("transfer-encoding","").lower()
+                data = await self.within_timeout(
+                    read_body(self.reader, response_headers))
+        except BaseException:
+            self.close()
+            raise
+        keep_alive = delimited and not close and statusline[0] == "HTTP/1.1" \
+            and response_headers.get("connection","").lower() != "close"
+        if not keep_alive:
+            self.close()
+        return status, response_headers, data
+
+    def __repr__(self):
+        """ python representation of this object
+        """
+        return "{module}.{name}(server = {server}, ssl = {ssl}, timeout = " \
+            "{timeout})".format(
+            name=self.__class__.__name__,module=self.__class__.__module__,
+            server=repr(self.server),ssl=self.ssl,timeout=self.timeout)
+
+
+async def post(server, url, body, headers = {}, ssl = True, timer = None,
+    timeout = DEFAULT_TIMEOUT):
+    """ Issue a POST request on a new connection which is closed afterwards.
+    Use a Connection (e.g. from a ConnectionPool) to keep it alive.
+
+    Args:
+        server (str): the server domain, optionally with ':port'
+        url (str): the url relative to the server
+        body (str or bytes): the request body. str is encoded as UTF-8.
+        headers (dict, optional): additional request headers
+        ssl (bool, optional): whether to use SSL. Defaults to True.
+        timer (callable, optional): called with the names of the phases
+            'connect', 'send', 'wait' and 'read', returns a context manager
+            timing the phase, e.g. instrumentation.RequestEvent.timer
+        timeout (float, optional): see Connection
+
+    Returns:
+        status, headers, body: the response status code, the response
+            headers with lowercase names and the response body bytes
+    """
+    if timer is None:
+        timer = lambda phase: contextlib.nullcontext()
+    connection = Connection(server, ssl = ssl, timeout = timeout)
+    with timer("connect"):
+        await connection.connect()
+    try:
+        return await connection.request(url, body, headers = headers,
+            timer = timer, close = True)
+    finally:
+        connection.close()
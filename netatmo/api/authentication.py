@@ -7,9 +7,13 @@ import logging
 import signal
 import time
 import contextlib
+import threading
+import asyncio
 
 from .. import utils
 from . import requests
+from . import tokenstores
+from . import connectionpool
 from .variables import *
 from .errors import *
 
@@ -50,8 +54,24 @@ EMPTY_TOKEN_REFRESH_REQUEST = {
 
 DEFAULT_EXPIRE_TIME = 10800
 
+# seconds before the tokens expire when the full up-to-date check is done again
+TOKEN_EXPIRY_MARGIN = 60
+
+# seconds before the tokens expire when the background refresh renews them
+BACKGROUND_REFRESH_MARGIN = 300
+# seconds to wait before trying again if the background refresh failed or
+# could not be done
+BACKGROUND_REFRESH_RETRY = 60
+# minimum seconds to wait after renewing, in case the new tokens expire within
+# the margin, too
+BACKGROUND_REFRESH_MIN_WAIT = 10
+
 EMPTY_TOKENS = { "access_token" :"", "refresh_token":"" }
 
+# states of the token update state machine
+TOKEN_UPDATE_IDLE = "idle" # no token update in flight
+TOKEN_UPDATE_RUNNING = "running" # one thread updates the tokens
+
 class Authentication(object):
     """
     Netatmo api Oauth2 authentication client
@@ -62,18 +82,34 @@ class Authentication(object):
         tokens (dict of str, optional): the access and refresh token.
             Required keys: access_token, refresh_token
         tmpfile (str, optional): temporary file to use for tokens
+        token_store (TokenStore, optional): where to persist the tokens
+            instead of the tmpfile
     """
     def __init__(self, 
             credentials = EMPTY_CREDENTIALS,
             tokens      = EMPTY_TOKENS,
-            tmpfile     = None
+            tmpfile     = None,
+            token_store = None,
             ):
+        # per-thread state, e.g. the recursion preventer
+        self._thread_state = threading.local()
+        # the token update state machine
+        self._token_update_condition = threading.Condition()
+        self._token_update_state = TOKEN_UPDATE_IDLE
+        self._token_update_owner = None
+        self._token_update_generation = 0
+        self._token_update_error = None
+
         self.logger.debug("init: setting credentials...")
         self.credentials = credentials
         self.logger.debug("init: credentials set.")
         self.logger.debug("init: setting tmpfile...")
         self.tmpfile     = tmpfile 
         self.logger.debug("init: tmpfile set.")
+        if token_store is not None:
+            self.logger.debug("init: setting token store...")
+            self.token_store = token_store
+            self.logger.debug("init: token store set.")
 
         # only set the (empty) tokens if you didn't already read them from file
         if self.last_token_action != "read_tokens" or tokens != EMPTY_TOKENS: 
@@ -130,6 +166,13 @@ class Authentication(object):
         If you set this property, it is checked for valid content first.
         Also, automatic saving to the tmpfile occurs if necessary.
         """
+        # fast path: the tokens are known to be valid for a while
+        try:
+            if time.time() < self._tokens_valid_until:
+                return self._tokens
+        except AttributeError: # not determined yet
+            pass
+
         # if there are no tokens yet, set them to empty tokens
         if not hasattr(self,"_tokens"): self._tokens = EMPTY_TOKENS
 
@@ -141,6 +184,10 @@ class Authentication(object):
                 "tokens are up to date.")
             with self.no_token_getter_recursion():
                 self.make_sure_tokens_are_up_to_date()
+                # skip all of this until the tokens are about to expire
+                if self.tokens_are_up_to_date:
+                    self._tokens_valid_until = \
+                        self.tokens_expire_at - self.token_expiry_margin
 
         return self._tokens
 
@@ -159,20 +206,43 @@ class Authentication(object):
             self.logger.info("given tokens have invalid format."
                     "Using empty default.")
             self._tokens = EMPTY_TOKENS
+            self._tokens_valid_until = 0 # determine again
 
     @property
     def token_getter_in_progress(self):
         """ This is an internal property to prevent recursion in the tokens
         getter. It is always boolean. When you set it, it is converted to bool.
+        It is local to the current thread, so other threads still make sure
+        the tokens are up to date.
         """
-        if hasattr(self,"_token_getter_in_progress"):
-            return bool(self._token_getter_in_progress)
-        else:
-            return False
+        return getattr(self._thread_state, "token_getter_in_progress", False)
 
     @token_getter_in_progress.setter
     def token_getter_in_progress(self, value):
-        self._token_getter_in_progress = bool(value)
+        self._thread_state.token_getter_in_progress = bool(value)
+
+    @property
+    def token_update_state(self):
+        """ [read only] The state of the token update state machine. Either
+        TOKEN_UPDATE_IDLE or TOKEN_UPDATE_RUNNING.
+        """
+        with self._token_update_condition:
+            return self._token_update_state
+
+    @property
+    def token_update_lock_async(self):
+        """ [read only] asyncio.Lock the coroutines of the running event loop
+        queue for to update the tokens. It is created for every event loop.
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            lock_loop, lock = self._token_update_lock_async
+        except AttributeError: # not created yet
+            lock_loop = None
+        if lock_loop is not loop:
+            lock = asyncio.Lock()
+            self._token_update_lock_async = (loop, lock)
+        return lock
 
     @property
     def tmpfile(self):
@@ -190,14 +260,42 @@ class Authentication(object):
         # set the value
         oldtmpfile = self.tmpfile
         if oldtmpfile == value:
-            self.logger.debug((
-            "Request to set the tmpfile to the same value of '{}'."
-            " Not doing anything.").format(value))
+            self.logger.debug("Request to set the tmpfile to the same value "
+                "of '%s'. Not doing anything.", value)
             return
 
         self._tmpfile = value
-        self.logger.debug("The tmpfile was changed from '{}' to '{}'.".format(
-            oldtmpfile, value))
+        self._token_store = None if value is None else \
+            tokenstores.JSONFileTokenStore(value)
+        self.logger.debug("The tmpfile was changed from '%s' to '%s'.",
+            oldtmpfile, value)
+
+        # update the tmpfile change time
+        self.update_time("change_tmpfile")
+
+        # do tmpfile IO
+        self.tmpfile_io()
+
+    @property
+    def token_store(self):
+        """ TokenStore: Where the tokens are persisted. Setting the tmpfile
+        sets this to a JSONFileTokenStore. All processes using the same store
+        share the tokens and only one of them updates them at a time.
+
+        If you set this property, an attempt to read tokens from the store is
+        made. If that fails, the current tokens are written to the store.
+        """
+        try:    return self._token_store
+        except AttributeError: return None # defaults to None
+
+    @token_store.setter
+    def token_store(self, value):
+        assert value is None or isinstance(value, tokenstores.TokenStore), \
+            "token_store has to be None or a TokenStore"
+        self._token_store = value
+        self._tmpfile = getattr(value, "filename", None) \
+            if isinstance(value, tokenstores.JSONFileTokenStore) else None
+        self.logger.debug("The token store was changed to %s.", value)
 
         # update the tmpfile change time
         self.update_time("change_tmpfile")
@@ -205,6 +303,33 @@ class Authentication(object):
         # do tmpfile IO
         self.tmpfile_io()
 
+    @property
+    def server(self):
+        """ The OAuth2 server domain (optionally with ':port') or None for the
+        default NETATMO_API_SERVER, e.g. to use a local stand-in server.
+        """
+        try: return self._server
+        except AttributeError: return None
+
+    @server.setter
+    def server(self, value):
+        self._server = None if value is None else str(value)
+
+    @property
+    def connection_pool(self):
+        """ The ConnectionPool for the token requests or None for the shared
+        default pool.
+        """
+        try: return self._connection_pool
+        except AttributeError: return None
+
+    @connection_pool.setter
+    def connection_pool(self, newpool):
+        assert newpool is None or \
+            isinstance(newpool, connectionpool.ConnectionPool), \
+            "connection_pool has to be None or a ConnectionPool"
+        self._connection_pool = newpool
+
     ### property checkers ###
     @property
     def tokens_defined(self):
@@ -249,10 +374,11 @@ class Authentication(object):
         """ [read only] The UNIX timestamp of the last new token request
         """
         last_refresh_time = \
-            self.tokens.get("token_refresh_time",    # try saved time
+            self.tokens.get("refresh_request_time",  # try saved time
+            self.tokens.get("token_refresh_time",    # try old saved time
             self.token_times.get("refresh_tokens",  # try internal time
             0 # use default
-            ))
+            )))
         return last_refresh_time
 
     @property
@@ -284,6 +410,27 @@ class Authentication(object):
             else: # not expired
                 return True # up to date
 
+    @property
+    def tokens_expire_at(self):
+        """ [read only] The UNIX timestamp when the current tokens expire
+        """
+        with self.no_token_getter_recursion():
+            return max(self.last_refresh_time, self.last_request_time) \
+                + self.expire_time
+
+    @property
+    def token_expiry_margin(self):
+        """ Seconds before the tokens expire from when on the tokens getter
+        checks again whether the tokens are up to date. Until then, the tokens
+        getter just returns the tokens. Defaults to TOKEN_EXPIRY_MARGIN.
+        """
+        try: return self._token_expiry_margin
+        except AttributeError: return TOKEN_EXPIRY_MARGIN
+
+    @token_expiry_margin.setter
+    def token_expiry_margin(self, value):
+        self._token_expiry_margin = float(value)
+        self._tokens_valid_until = 0 # determine again
 
     ### the specific times ###
     @property
@@ -313,8 +460,8 @@ class Authentication(object):
                 key=self.token_times.get, # according to the times
                 reverse = True            # in reversed order (newest first)
                 )[0]                      # and return the newest element
-            self.logger.debug("The last token-related action was '{}'.".format(
-                action))
+            self.logger.debug("The last token-related action was '%s'.",
+                action)
             return action
 
     ### context managers ###
@@ -326,9 +473,8 @@ class Authentication(object):
             self.token_getter_in_progress = True
             yield
         finally:
-            self.logger.debug(
-                "recursion-preventer: resetting variable to {}".format(
-                old_token_getter_in_progress))
+            self.logger.debug("recursion-preventer: resetting variable to %s",
+                old_token_getter_in_progress)
             self.token_getter_in_progress = old_token_getter_in_progress
 
 
@@ -357,13 +503,16 @@ class Authentication(object):
         Args:
             action (str): the token-related action to update the time for
         """
-        self.logger.debug("updating the time for action '{}'".format(action))
+        self.logger.debug("updating the time for action '%s'", action)
         if not action in EMPTY_TIMES.keys():
             raise KeyError
         # update the tmpfile change time
         times = self.token_times.copy()
         times.update({action:time.time()})
         self._token_times = times
+        # something token-related happened, the tokens getter has to check
+        # again whether the tokens are up to date
+        self._tokens_valid_until = 0
 
     def tmpfile_io(self):
         """ Read or write the tmpfile dependant on what happend last
@@ -382,8 +531,7 @@ class Authentication(object):
         last_token_action = self.last_token_action
         # get the appropriate action
         action = actions.get(last_token_action, utils.nothing)
-        self.logger.debug("The appropriate action is {}.".format(
-            action.__name__))
+        self.logger.debug("The appropriate action is %s.", action.__name__)
 
         # do it!
         success = action()
@@ -400,20 +548,22 @@ class Authentication(object):
             bool: True if something was actually read from the file into the
                 tokens property, False otherwise.
         """
-        self.logger.debug("Try reading tokens from tmpfile '{}'....".format(
-            self.tmpfile))
+        self.logger.debug("Try reading tokens from tmpfile '%s'....",
+            self.tmpfile)
+        if self.token_store is None: # nothing to read from
+            return False
         # read
-        tokens = utils.read_json_from_file(self.tmpfile)
+        tokens = self.token_store.read()
         # check
         if self.check_tokens(tokens):
             self._tokens = tokens # set
             self.update_time("read_tokens") # update time
-            self.logger.debug("tokens were read from tmpfile '{}'.".format(
-                self.tmpfile))
+            self.logger.debug("tokens were read from tmpfile '%s'.",
+                self.tmpfile)
             return True
         else:
-            self.logger.debug("tokens from tmpfile '{}' are invalid.".format(
-                self.tmpfile))
+            self.logger.debug("tokens from tmpfile '%s' are invalid.",
+                self.tmpfile)
             return False
             
 
@@ -426,51 +576,112 @@ class Authentication(object):
                 otherwise.  
         """
         with self.no_token_getter_recursion():
-            self.logger.debug("Try writing tokens to tmpfile '{}'.".format(
-                self.tmpfile))
+            self.logger.debug("Try writing tokens to tmpfile '%s'.",
+                self.tmpfile)
             # try to write
-            success = utils.write_json_to_file(self.tokens, self.tmpfile)
+            success = self.token_store is not None and \
+                self.token_store.write(self.tokens)
             if success: # check
-                self.logger.debug("tokens written to tmpfile '{}'".format(
-                    self.tmpfile))
+                self.logger.debug("tokens written to tmpfile '%s'",
+                    self.tmpfile)
                 self.update_time("write_tokens") # update time
             else:
-                self.logger.debug("could not write tokens to tmpfile '{}'".format(
-                    self.tmpfile))
+                self.logger.debug("could not write tokens to tmpfile '%s'",
+                    self.tmpfile)
                 
             return success
 
 
-    def request_new_tokens(self):
-        """ POST a token request to the api OAuth2 server to get NEW tokens
+    def new_tokens_request(self):
+        """ Create a token request to the api OAuth2 server to get NEW tokens
+
+        Returns:
+            TokenRequest: the not yet issued request
         """
-        # check for completeness
-        assert self.credentials_defined, \
-            "Cannot make a token request with incomplete credentials"
+        payload = EMPTY_TOKEN_REQUEST.copy() # a copy of an empty request
+        payload.update(self.credentials) # update with credentials
+        self.logger.debug("token request payload: %s", payload)
+        return self.prepare(requests.TokenRequest(payload = payload))
+
+    def refresh_tokens_request(self):
+        """ Create a refresh request to the api OAuth2 server to refresh tokens
 
+        Returns:
+            TokenRequest: the not yet issued request
+        """
         with self.no_token_getter_recursion():
-            payload = EMPTY_TOKEN_REQUEST.copy() # a copy of an empty request
-            payload.update(self.credentials) # update with credentials
-            self.logger.debug("token request payload: {}".format(payload))
+            ### create the payload ###
+            payload = EMPTY_TOKEN_REFRESH_REQUEST.copy() # a copy of empty request
+            # add refresh token
+            for key in ("refresh_token",): # add refresh_token to payload
+                payload[key] = self.tokens.get(key)
+            for key in ("client_id", "client_secret"): # add credentials to payload
+                payload[key] = self.credentials.get(key)
+            self.logger.debug("token refresh request payload: %s", payload)
+        return self.prepare(requests.TokenRequest(payload = payload))
+
+    def prepare(self, tokenrequest):
+        """ Apply the server and connection_pool to a token request
 
-            ### create the request ###
-            # the request
-            tokenrequest = requests.TokenRequest(payload = payload)
-            # the response
-            tokenresponse = tokenrequest.response
+        Args:
+            tokenrequest (TokenRequest): the request
+
+        Returns:
+            TokenRequest: the same request
+        """
+        if self.server is not None:
+            tokenrequest.server = self.server
+        if self.connection_pool is not None:
+            tokenrequest.connection_pool = self.connection_pool
+        return tokenrequest
 
-            # check for errors
-            error = tokenresponse.response.get("error")
-            if error: 
-                raise API_ERRORS.get(error, ApiResponseError(error))
+    def use_token_response(self, tokenresponse, action):
+        """ Check a TokenResponse for errors and update the tokens with it
 
+        Args:
+            tokenresponse (TokenResponse): the api response to a token request
+            action (str): the token-related action this response belongs to.
+                Either 'request_tokens' or 'refresh_tokens'.
+        """
+        # check for errors
+        error = tokenresponse.response.get("error")
+        if error: 
+            raise api_error(error)
+
+        timekey = {
+            "request_tokens": "token_request_time",
+            "refresh_tokens": "refresh_request_time",
+            }[action]
+        with self.no_token_getter_recursion():
             tokens = self.tokens.copy() # a copy of current tokens
             tokens.update(tokenresponse.response) # update with new data
-            tokens.update({"token_request_time":time.time()})
+            tokens.update({timekey:time.time()})
             self.tokens = tokens # set the updated tokens
 
-            # update the time
-            self.update_time("request_tokens")
+        # update the time
+        self.update_time(action)
+
+    def request_new_tokens(self):
+        """ POST a token request to the api OAuth2 server to get NEW tokens
+        """
+        # check for completeness
+        assert self.credentials_defined, \
+            "Cannot make a token request with incomplete credentials"
+
+        with self.no_token_getter_recursion():
+            tokenrequest = self.new_tokens_request() # the request
+            self.use_token_response(tokenrequest.response, "request_tokens")
+
+    async def request_new_tokens_async(self):
+        """ Awaitable version of request_new_tokens
+        """
+        # check for completeness
+        assert self.credentials_defined, \
+            "Cannot make a token request with incomplete credentials"
+
+        tokenrequest = self.new_tokens_request() # the request
+        tokenresponse = await tokenrequest.issue_async()
+        self.use_token_response(tokenresponse, "request_tokens")
 
     def refresh_current_tokens(self):
         """ POST a refresh request to the api OAuth2 server to refresh tokens
@@ -479,59 +690,394 @@ class Authentication(object):
             "Cannot refresh the tokens with incomplete tokens"
 
         with self.no_token_getter_recursion():
-            ### create the payload ###
-            payload = EMPTY_TOKEN_REFRESH_REQUEST.copy() # a copy of empty request
-            # add refresh token
-            for key in ("refresh_token",): # add refresh_token to payload
-                payload[key] = self.tokens.get(key)
-            for key in ("client_id", "client_secret"): # add credentials to payload
-                payload[key] = self.credentials.get(key)
-            self.logger.debug("token refresh request payload: {}".format(payload))
-
-            ### create the request ###
-            # the request
-            tokenrequest = requests.TokenRequest(payload = payload)
-            # the response
-            tokenresponse = tokenrequest.response
+            tokenrequest = self.refresh_tokens_request() # the request
+            self.use_token_response(tokenrequest.response, "refresh_tokens")
 
-            # check for errors
-            error = tokenresponse.response.get("error")
-            if error: 
-                raise API_ERRORS.get(error, ApiResponseError(error))
+    async def refresh_current_tokens_async(self):
+        """ Awaitable version of refresh_current_tokens
+        """
+        assert self.tokens_defined, \
+            "Cannot refresh the tokens with incomplete tokens"
 
-            tokens = self.tokens.copy() # a copy of current tokens
-            tokens.update(tokenresponse.response) # update with new data
-            tokens.update({"refresh_request_time":time.time()})
-            self.tokens = tokens # set the updated tokens
+        tokenrequest = self.refresh_tokens_request() # the request
+        tokenresponse = await tokenrequest.issue_async()
+        self.use_token_response(tokenresponse, "refresh_tokens")
 
-            # update the time
-            self.update_time("refresh_tokens")
+    def needed_token_update(self):
+        """ Determine what has to be done to make sure the tokens are up to date
 
-    def make_sure_tokens_are_up_to_date(self):
-        # """ Make sure the tokens are up to date (if possible)
-        # """
+        Returns:
+            str or None: 'refresh_tokens' if the current tokens have to be
+                refreshed, 'request_tokens' if new tokens have to be requested
+                and None if nothing can or has to be done.
+        """
         self.logger.debug("I was told to make sure the tokens are up to date.")
         if self.tokens_are_up_to_date: # check if they are outdated
             self.logger.debug("tokens are already up to date! " 
                 "No needed to update anything.")
-        else:
-            self.logger.debug("tokens are outdated! " 
-                "Now let's check if we have credentials.")
-            if self.credentials_defined:
-                self.logger.debug("Yes, we have credentials and should be able" 
-                    " to post requests.")
-                if self.tokens_defined: # there are tokens already
-                    self.logger.debug("We already have tokens, let's " 
-                        "refresh them.")
-                    self.refresh_current_tokens() # refresh them
-                else: # no tokens yet
-                    self.logger.debug("We don't have any tokens yet, let's " 
-                        "request new ones.")
-                    self.request_new_tokens() # request new
+            return None
+        self.logger.debug("tokens are outdated! " 
+            "Now let's check if we have credentials.")
+        if not self.credentials_defined:
+            self.logger.debug("credentials are not defined. I can't do " 
+                "anything to make sure the tokens are up to date...")
+            return None
+        self.logger.debug("Yes, we have credentials and should be able" 
+            " to post requests.")
+        if self.tokens_defined: # there are tokens already
+            self.logger.debug("We already have tokens, let's " 
+                "refresh them.")
+            return "refresh_tokens"
+        else: # no tokens yet
+            self.logger.debug("We don't have any tokens yet, let's " 
+                "request new ones.")
+            return "request_tokens"
+
+    def claim_token_update(self):
+        """ Become the one updating the tokens if no update is in flight
+
+        Returns:
+            int or None: None if the current thread now runs the update and
+                has to call finish_token_update afterwards, otherwise the
+                generation of the update in flight to pass to
+                wait_for_token_update
+        """
+        with self._token_update_condition:
+            if self._token_update_state == TOKEN_UPDATE_RUNNING:
+                return self._token_update_generation
+            self._token_update_state = TOKEN_UPDATE_RUNNING
+            self._token_update_owner = threading.current_thread()
+            return None
+
+    def wait_for_token_update(self, generation):
+        """ Wait for the token update in flight to finish and raise its
+        exception, if any
+
+        Args:
+            generation (int): the generation returned by claim_token_update
+        """
+        with self._token_update_condition:
+            while self._token_update_generation == generation:
+                self._token_update_condition.wait()
+            if self._token_update_error is not None:
+                # a new instance per waiting thread
+                raise copy_error(self._token_update_error)
+
+    def finish_token_update(self, error = None):
+        """ Finish the token update claimed with claim_token_update and wake
+        up the waiting threads
+
+        Args:
+            error (BaseException, optional): the exception the update failed
+                with, it is raised in the waiting threads
+        """
+        with self._token_update_condition:
+            self._token_update_state = TOKEN_UPDATE_IDLE
+            self._token_update_owner = None
+            # keep a copy, the original's traceback grows in the updating thread
+            self._token_update_error = \
+                None if error is None else copy_error(error)
+            self._token_update_generation += 1
+            self._token_update_condition.notify_all()
+
+    def single_flight_token_update(self, update):
+        """ Run a token update so that only one is in flight at a time. If
+        another thread is already updating the tokens, wait for it to finish
+        and share its result (or exception) instead of running 'update'.
+
+        Args:
+            update (callable): the token update. It should check again whether
+                it is still necessary, as another thread might just have
+                updated the tokens.
+        """
+        with self._token_update_condition:
+            nested = self._token_update_state == TOKEN_UPDATE_RUNNING and \
+                self._token_update_owner is threading.current_thread()
+        if nested: # already updating in this thread, just run it
+            update()
+            return
+        generation = self.claim_token_update()
+        if generation is not None: # wait for the update in flight
+            self.logger.debug("another thread is updating the "
+                "tokens, waiting for it.")
+            self.wait_for_token_update(generation)
+            return
+        error = None
+        try:
+            if self.token_store is None:
+                update()
+            else: # coordinate with other processes using the same store
+                with self.token_store.locked():
+                    self.reload_tokens_from_store()
+                    update()
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            self.finish_token_update(error)
+
+    async def single_flight_token_update_async(self, update, blocking_update):
+        """ Awaitable version of single_flight_token_update. The coroutines of
+        the running event loop queue for token_update_lock_async, other
+        threads and processes are coordinated like in
+        single_flight_token_update. The locks of a token store belong to a
+        thread, so with a token store the blocking update is run in a worker
+        thread. Otherwise, the update is awaited in the event loop.
+
+        Args:
+            update (coroutine function): the non-blocking token update. It
+                should check again whether it is still necessary.
+            blocking_update (callable): the same update, blocking
+        """
+        loop = asyncio.get_running_loop()
+        async with self.token_update_lock_async:
+            if self.token_store is not None:
+                def run():
+                    with self.no_token_getter_recursion():
+                        self.single_flight_token_update(blocking_update)
+                await loop.run_in_executor(None, run)
+                return
+            generation = self.claim_token_update()
+            if generation is not None: # another thread is updating
+                self.logger.debug("another thread is updating the "
+                    "tokens, waiting for it.")
+                await loop.run_in_executor(None, self.wait_for_token_update,
+                    generation)
+                return
+            error = None
+            try:
+                await update()
+            except BaseException as e:
+                error = e
+                raise
+            finally:
+                self.finish_token_update(error)
+
+    def reload_tokens_from_store(self):
+        """ Use the tokens from the token store if another process has updated
+        them more recently than this one.
+
+        Returns:
+            bool: True if the stored tokens are used now, False otherwise
+        """
+        if self.token_store is None:
+            return False
+        tokens = self.token_store.read()
+        if not self.check_tokens(tokens):
+            return False
+        def issued(tokens):
+            return max(tokens.get("token_request_time",0),
+                tokens.get("refresh_request_time",0))
+        with self.no_token_getter_recursion():
+            if issued(tokens) <= issued(self.tokens):
+                return False
+        self.logger.debug("Using the more recent tokens from the token store.")
+        self._tokens = tokens
+        self.update_time("read_tokens")
+        return True
+
+    def update_tokens_if_needed(self):
+        """ Refresh or request the tokens if needed_token_update says so.
+        Another thread might just have updated the tokens, so this checks
+        again.
+        """
+        with self.no_token_getter_recursion():
+            action = self.needed_token_update()
+        if action == "refresh_tokens":
+            self.refresh_current_tokens() # refresh them
+        elif action == "request_tokens":
+            self.request_new_tokens() # request new
+
+    async def update_tokens_if_needed_async(self):
+        """ Awaitable version of update_tokens_if_needed
+        """
+        with self.no_token_getter_recursion():
+            action = self.needed_token_update()
+        if action == "refresh_tokens":
+            await self.refresh_current_tokens_async() # refresh them
+        elif action == "request_tokens":
+            await self.request_new_tokens_async() # request new
+
+    def make_sure_tokens_are_up_to_date(self):
+        """ Make sure the tokens are up to date (if possible). If several
+        threads do this at the same time, only one of them updates the tokens
+        and the others wait for it.
+        """
+        if self.needed_token_update() is None: # nothing to do
+            return
+        self.single_flight_token_update(self.update_tokens_if_needed)
+
+    async def make_sure_tokens_are_up_to_date_async(self):
+        """ Awaitable version of make_sure_tokens_are_up_to_date. Coroutines,
+        threads and processes sharing the token store share one token update.
+        """
+        with self.no_token_getter_recursion():
+            if self.needed_token_update() is None: # nothing to do
+                return
+        await self.single_flight_token_update_async(
+            self.update_tokens_if_needed_async, self.update_tokens_if_needed)
+
+    def seconds_until_background_refresh(self, margin):
+        """ Determine how long the background refresh should wait before
+        renewing the tokens
+
+        Args:
+            margin (float): seconds before the tokens expire when they should
+                be renewed
+
+        Returns:
+            float or None: seconds to wait or None if the tokens can't be
+                renewed because the credentials are not defined
+        """
+        with self.no_token_getter_recursion():
+            if not self.credentials_defined:
+                return None
+            if not self.tokens_defined: # no tokens yet, request them now
+                return 0
+            return max(self.tokens_expire_at - margin - time.time(), 0)
+
+    def renew_tokens_if_due(self, margin):
+        """ Renew the tokens if they expire within 'margin' seconds. Another
+        thread might just have renewed them, so this checks again.
+
+        Args:
+            margin (float): seconds before the tokens expire when they should
+                be renewed
+        """
+        if self.seconds_until_background_refresh(margin) == 0:
+            self.logger.debug("background refresh: renewing tokens")
+            with self.no_token_getter_recursion():
+                defined = self.tokens_defined
+            if defined:
+                self.refresh_current_tokens()
             else:
-                self.logger.debug("credentials are not defined. I can't do " 
-                    "anything to make sure the tokens are up to date...")
-            
+                self.request_new_tokens()
+
+    async def renew_tokens_if_due_async(self, margin):
+        """ Awaitable version of renew_tokens_if_due
+        """
+        if self.seconds_until_background_refresh(margin) == 0:
+            self.logger.debug("background refresh: renewing tokens")
+            with self.no_token_getter_recursion():
+                defined = self.tokens_defined
+            if defined:
+                await self.refresh_current_tokens_async()
+            else:
+                await self.request_new_tokens_async()
+
+    def background_refresh_wait(self, margin):
+        """ Determine how long the background refresh should wait before the
+        next step
+
+        Args:
+            margin (float): seconds before the tokens expire when they should
+                be renewed
+
+        Returns:
+            float or None: seconds to wait or None if the tokens are due
+        """
+        wait = self.seconds_until_background_refresh(margin)
+        if wait is None:
+            self.logger.debug("background refresh: credentials are not "
+                "defined, can't renew tokens.")
+            return BACKGROUND_REFRESH_RETRY
+        return wait or None
+
+    def background_refresh_step(self, margin):
+        """ Do one step of the background refresh: renew the tokens if they
+        expire within 'margin' seconds.
+
+        Args:
+            margin (float): seconds before the tokens expire when they should
+                be renewed
+
+        Returns:
+            float: seconds to wait until the next step. After renewing, this is
+                at least BACKGROUND_REFRESH_MIN_WAIT, even if the new tokens
+                expire within 'margin' seconds.
+        """
+        wait = self.background_refresh_wait(margin)
+        if wait is not None:
+            return wait
+        try:
+            self.single_flight_token_update(
+                lambda: self.renew_tokens_if_due(margin))
+        except Exception as e:
+            self.logger.warning("background refresh: renewing tokens "
+                "failed: %s", e)
+            return BACKGROUND_REFRESH_RETRY
+        return max(self.seconds_until_background_refresh(margin) or
+            BACKGROUND_REFRESH_RETRY, BACKGROUND_REFRESH_MIN_WAIT)
+
+    async def background_refresh_step_async(self, margin):
+        """ Awaitable version of background_refresh_step
+        """
+        wait = self.background_refresh_wait(margin)
+        if wait is not None:
+            return wait
+        try:
+            await self.single_flight_token_update_async(
+                lambda: self.renew_tokens_if_due_async(margin),
+                lambda: self.renew_tokens_if_due(margin))
+        except Exception as e:
+            self.logger.warning("background refresh: renewing tokens "
+                "failed: %s", e)
+            return BACKGROUND_REFRESH_RETRY
+        return max(self.seconds_until_background_refresh(margin) or
+            BACKGROUND_REFRESH_RETRY, BACKGROUND_REFRESH_MIN_WAIT)
+
+    def start_background_refresh(self, margin = BACKGROUND_REFRESH_MARGIN):
+        """ Start a daemon thread that renews the tokens 'margin' seconds
+        before they expire, so that accessing the tokens never has to wait
+        for the OAuth2 server. Does nothing if it is already running.
+
+        Args:
+            margin (float, optional): seconds before the tokens expire when
+                they are renewed. Should be larger than token_expiry_margin.
+                Defaults to BACKGROUND_REFRESH_MARGIN.
+        """
+        if self.background_refresh_running:
+            return
+        stop = threading.Event()
+        def refresh():
+            while not stop.wait(self.background_refresh_step(margin)):
+                pass
+        thread = threading.Thread(target = refresh, daemon = True,
+            name = "netatmo-token-refresh")
+        self._background_refresh = (thread, stop)
+        thread.start()
+
+    def stop_background_refresh(self):
+        """ Stop the background refresh thread started with
+        start_background_refresh
+        """
+        try: thread, stop = self._background_refresh
+        except AttributeError: return # not running
+        stop.set()
+        if not thread is threading.current_thread():
+            thread.join()
+        del self._background_refresh
+
+    @property
+    def background_refresh_running(self):
+        """ [read only] whether the background refresh thread is running
+        """
+        try: thread, stop = self._background_refresh
+        except AttributeError: return False
+        return thread.is_alive() and not stop.is_set()
+
+    async def refresh_in_background(self, margin = BACKGROUND_REFRESH_MARGIN):
+        """ Awaitable version of the background refresh using the non-blocking
+        token flow. Run this as an asyncio task and cancel it to stop it. It
+        shares the token updates with the AsyncNetatmoClient.
+
+        Args:
+            margin (float, optional): seconds before the tokens expire when
+                they are renewed. Defaults to BACKGROUND_REFRESH_MARGIN.
+        """
+        while True:
+            await asyncio.sleep(await self.background_refresh_step_async(margin))
+
     def __repr__(self):
         """ python representation of this object
         """
@@ -0,0 +1,406 @@
+#!/usr/bin/env python3
+# module for caching api responses
+# system modules
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+import collections
+
+# internal modules
+from .. import utils
+from . import requests
+from .variables import *
+
+# the request classes to rebuild responses read from disk
+REQUEST_CLASSES = {
+    NETATMO_API_GETPUBLICDATA_URL:   requests.GetpublicdataRequest,
+    NETATMO_API_GETMEASURE_URL:      requests.GetmeasureRequest,
+    NETATMO_API_GETSTATIONSDATA_URL: requests.GetstationsdataRequest,
+    }
+
+EMPTY_CACHE_STATISTICS = {
+    "hits":0,       # responses returned from the cache
+    "misses":0,     # requests not in the cache or expired
+    "stores":0,     # responses put into the cache
+    "evictions":0,  # responses dropped to stay within maxbytes
+    }
+
+def normalized_payload(payload):
+    """ The payload without the access token and with all values as str, like
+    they are sent to the server
+
+    Args:
+        payload (dict): the request payload
+
+    Returns:
+        dict: the normalized payload
+    """
+    return {k:str(v) for k,v in payload.items() if k != "access_token"}
+
+def cache_key(url, payload):
+    """ Create the cache key of a request
+
+    Args:
+        url (str): the endpoint url
+        payload (dict): the request payload. The access token is ignored.
+
+    Returns:
+        str: the key
+    """
+    return json.dumps([url, normalized_payload(payload)], sort_keys = True)
+
+
+class ResponseCache(object):
+    """ Base class for api response caches. Successful responses are cached
+    for a time-to-live depending on the endpoint url. Subclasses implement
+    the storage in load, store, discard and clear and hold the lock only
+    while they change their bookkeeping.
+
+    Args:
+        ttls (dict, optional): seconds to cache responses per endpoint url.
+            Endpoints not listed are not cached. Defaults to
+            RESPONSE_CACHE_TTLS.
+        maxbytes (int, optional): maximum size of the cached responses in
+            bytes of JSON. The least recently used responses are evicted
+            first. Defaults to RESPONSE_CACHE_MAXBYTES.
+    """
+    def __init__(self, ttls = None, maxbytes = RESPONSE_CACHE_MAXBYTES):
+        self.ttls = RESPONSE_CACHE_TTLS if ttls is None else ttls
+        self.maxbytes = maxbytes
+        self._lock = threading.RLock()
+        self.reset_statistics()
+
+    ##################
+    ### Properties ###
+    ##################
+    @property
+    def logger(self):
+        """ the logging.Logger used for logging.
+        Defaults to logging.getLogger(__name__).
+        """
+        try: # try to return the internal property
+            return self._logger
+        except AttributeError: # didn't work
+            return logging.getLogger(__name__) # return default logger
+
+    @logger.setter
+    def logger(self, logger):
+        assert isinstance(logger, logging.Logger), \
+            "logger property has to be a logging.Logger"
+        self._logger = logger
+
+    @property
+    def ttls(self):
+        """ dict: seconds to cache responses per endpoint url
+        """
+        return self._ttls
+
+    @ttls.setter
+    def ttls(self, value):
+        assert isinstance(value, dict), "ttls has to be a dict"
+        self._ttls = value.copy()
+
+    @property
+    def maxbytes(self):
+        """ maximum size of the cached responses in bytes of JSON
+        """
+        return self._maxbytes
+
+    @maxbytes.setter
+    def maxbytes(self, value):
+        value = int(value)
+        assert value >= 0, "maxbytes has to be non-negative"
+        self._maxbytes = value
+
+    @property
+    def statistics(self):
+        """ [read only] copy of the cache statistics
+        """
+        with self._lock:
+            return self._statistics.copy()
+
+    ###############
+    ### Methods ###
+    ###############
+    def count(self, event, n = 1):
+        """ count an event in the statistics
+        """
+        with self._lock:
+            self._statistics[event] += n
+
+    def reset_statistics(self):
+        """ reset the statistics to zero
+        """
+        with self._lock:
+            self._statistics = EMPTY_CACHE_STATISTICS.copy()
+
+    def get(self, apirequest):
+        """ Look up the response to a request
+
+        Args:
+            apirequest (ApiRequest): the request
+
+        Returns:
+            ApiResponse or derivate or None: the cached response or None if
+                it is not cached or expired
+        """
+        if not self.ttls.get(apirequest.url):
+            return None # not cached at all
+        key = cache_key(apirequest.url, apirequest.payload)
+        cached = self.load(key)
+        if cached is not None and cached[0] < time.time(): # expired
+            self.discard(key)
+            cached = None
+        if cached is None:
+            self.count("misses")
+            return None
+        self.count("hits")
+        return cached[1]
+
+    def put(self, apirequest, apiresponse):
+        """ Cache the response to a request if its endpoint is cached
+
+        Args:
+            apirequest (ApiRequest): the request
+            apiresponse (ApiResponse or derivate): the response
+        """
+        ttl = self.ttls.get(apirequest.url)
+        if not ttl:
+            return
+        key = cache_key(apirequest.url, apirequest.payload)
+        self.store(key, time.time() + ttl, apirequest, apiresponse)
+        self.count("stores")
+
+    def load(self, key):
+        """ Load a cached response. Subclasses override this.
+
+        Returns:
+            (expires, ApiResponse) or None if there is nothing cached
+        """
+        return None
+
+    def store(self, key, expires, apirequest, apiresponse):
+        """ Store a response. Subclasses override this.
+        """
+        pass
+
+    def discard(self, key):
+        """ Drop a cached response. Subclasses override this.
+        """
+        pass
+
+    def clear(self):
+        """ Drop all cached responses. Subclasses override this.
+        """
+        pass
+
+    def __repr__(self):
+        """ python representation of this object
+        """
+        return "{module}.{name}(ttls = {ttls}, maxbytes = {maxbytes})".format(
+            name=self.__class__.__name__,module=self.__class__.__module__,
+            ttls=self.ttls, maxbytes=self.maxbytes)
+
+
+class MemoryResponseCache(ResponseCache):
+    """ Response cache in memory. The cached ApiResponse objects themselves
+    are returned, so don't modify them. The size of a response is the size
+    of the JSON it was received as, or estimated from its JSON serialization
+    if that is unknown. See ResponseCache for the arguments.
+    """
+    def __init__(self, ttls = None, maxbytes = RESPONSE_CACHE_MAXBYTES):
+        super().__init__(ttls = ttls, maxbytes = maxbytes)
+        # key -> (expires, nbytes, apiresponse), least recently used first
+        self._entries = collections.OrderedDict()
+        self._nbytes = 0
+
+    @property
+    def nbytes(self):
+        """ [read only] estimated size of the cached responses in bytes
+        """
+        return self._nbytes
+
+    def load(self, key):
+        with self._lock:
+            try: expires, nbytes, apiresponse = self._entries[key]
+            except KeyError: return None
+            self._entries.move_to_end(key) # recently used
+        return expires, apiresponse
+
+    def store(self, key, expires, apirequest, apiresponse):
+        nbytes = apiresponse.nbytes
+        if nbytes is None: # not received from the server, estimate it
+            nbytes = len(json.dumps(apiresponse.response))
+        with self._lock:
+            self.discard(key)
+            if nbytes > self.maxbytes: # would evict everything else
+                return
+            self._entries[key] = (expires, nbytes, apiresponse)
+            self._nbytes += nbytes
+            while self._nbytes > self.maxbytes:
+                self.discard(next(iter(self._entries))) # least recently used
+                self.count("evictions")
+
+    def discard(self, key):
+        with self._lock:
+            try: expires, nbytes, apiresponse = self._entries.pop(key)
+            except KeyError: return
+            self._nbytes -= nbytes
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._nbytes = 0
+
+
+class DiskResponseCache(ResponseCache):
+    """ Response cache in a directory with one JSON file per response, so it
+    survives restarts and can be shared between processes. The access token
+    is not written to disk. Files are replaced atomically. The size of the
+    files is kept as a running total, the directory is only scanned every
+    RESPONSE_CACHE_RESCAN_SECONDS and to evict files.
+
+    Args:
+        directory (str): the cache directory. It is created if necessary.
+        ttls, maxbytes: see ResponseCache
+    """
+    def __init__(self, directory, ttls = None,
+        maxbytes = RESPONSE_CACHE_MAXBYTES):
+        super().__init__(ttls = ttls, maxbytes = maxbytes)
+        self.directory = directory
+        self._nbytes = None # running total of the file sizes, None until scan
+        self._scanned = 0 # time of the last scan
+
+    @property
+    def nbytes(self):
+        """ [read only] size of the cache files in bytes as of the last scan
+        plus the changes since then
+        """
+        with self._lock:
+            if self._nbytes is None:
+                self.scan()
+            return self._nbytes
+
+    @property
+    def directory(self):
+        """ the cache directory
+        """
+        return self._directory
+
+    @directory.setter
+    def directory(self, value):
+        assert isinstance(value, str), "directory has to be a str"
+        os.makedirs(value, exist_ok = True)
+        self._directory = value
+
+    def filename(self, key):
+        """ the cache file for a key
+        """
+        return os.path.join(self.directory, "{}.json".format(
+            hashlib.sha256(key.encode("UTF-8")).hexdigest()))
+
+    def files(self):
+        """ all cache files
+
+        Returns:
+            list of (last use time, size, filename)
+        """
+        files = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".json"):
+                try: stat = entry.stat()
+                except OSError: continue # removed in the meantime
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+        return files
+
+    def scan(self):
+        """ Scan the cache files and reset the running total of their size
+
+        Returns:
+            list of (last use time, size, filename): see files
+        """
+        files = self.files()
+        with self._lock:
+            self._nbytes = sum(size for mtime, size, filename in files)
+            self._scanned = time.time()
+        return files
+
+    def file_size(self, filename):
+        """ the size of a file or 0 if it doesn't exist
+        """
+        try: return os.stat(filename).st_size
+        except OSError: return 0
+
+    def load(self, key):
+        filename = self.filename(key)
+        cached = utils.read_json_from_file(filename, cache = False)
+        try:
+            url, payload = cached["url"], cached["payload"]
+            expires, response = cached["expires"], cached["response"]
+        except (KeyError, TypeError):
+            return None # not cached or broken file
+        try: os.utime(filename) # recently used
+        except OSError: pass
+        apirequest = REQUEST_CLASSES[url](payload = payload)
+        apiresponse = apirequest.response_class(
+            request = apirequest, response = response)
+        apirequest.response = apiresponse
+        return expires, apiresponse
+
+    def store(self, key, expires, apirequest, apiresponse):
+        cached = {
+            "url": apirequest.url,
+            "payload": normalized_payload(apirequest.payload),
+            "expires": expires,
+            "response": apiresponse.response,
+            }
+        filename = self.filename(key)
+        replaced = self.file_size(filename)
+        if not utils.write_json_to_file(cached, filename,
+            atomic = True, compact = True):
+            self.logger.debug("could not write cache file for %s", key)
+            return
+        written = self.file_size(filename)
+        with self._lock:
+            if self._nbytes is None or \
+                time.time() - self._scanned > RESPONSE_CACHE_RESCAN_SECONDS:
+                self.scan()
+            else:
+                self._nbytes += written - replaced
+            if self._nbytes > self.maxbytes:
+                self.evict()
+
+    def evict(self):
+        """ Remove the least recently used files until there is some headroom
+        below maxbytes, see RESPONSE_CACHE_EVICTION_HEADROOM
+        """
+        target = self.maxbytes * (1 - RESPONSE_CACHE_EVICTION_HEADROOM)
+        with self._lock:
+            files = sorted(self.scan())
+            for mtime, size, filename in files:
+                if self._nbytes <= target:
+                    break
+                try: os.remove(filename)
+                except OSError: continue
+                self._nbytes -= size
+                self.count("evictions")
+
+    def discard(self, key):
+        filename = self.filename(key)
+        size = self.file_size(filename)
+        try: os.remove(filename)
+        except OSError: return
+        with self._lock:
+            if self._nbytes is not None:
+                self._nbytes -= size
+
+    def clear(self):
+        with self._lock:
+            for mtime, size, filename in self.files():
+                try: os.remove(filename)
+                except OSError: pass
+            self._nbytes = 0
+            self._scanned = time.time()
@@ -2,16 +2,97 @@
 # system modules
 import logging
 import time
+import asyncio
+import collections
+import concurrent.futures
+
+# external modules
+import pandas as pd
+from pandas import DataFrame
 
 # internal modules
 from .. import utils
 from . import authentication
 from . import responsetypes
 from . import requests
+from . import cache
+from . import ratelimit
+from . import retry
+from . import connectionpool
+from . import instrumentation
 from .variables import *
 from .errors import *
 
 
+def split_region(region):
+    """ Split a region into its four quadrants
+
+    Args:
+        region (dict): the region with keys lat_ne, lat_sw, lon_ne and lon_sw
+
+    Returns:
+        list of dict: the four quadrant regions
+    """
+    lat_mid = (region["lat_ne"] + region["lat_sw"]) / 2
+    lon_mid = (region["lon_ne"] + region["lon_sw"]) / 2
+    return [
+        {"lat_ne":lat_ne, "lat_sw":lat_sw, "lon_ne":lon_ne, "lon_sw":lon_sw}
+        for lat_sw, lat_ne in ((region["lat_sw"], lat_mid),
+                               (lat_mid, region["lat_ne"]))
+        for lon_sw, lon_ne in ((region["lon_sw"], lon_mid),
+                               (lon_mid, region["lon_ne"]))
+        ]
+
+def tile_is_saturated(tile, nstations, saturation, min_tile_size):
+    """ Check if a Getpublicdata tile is saturated and may still be split
+
+    Args:
+        tile (dict): the region of the tile
+        nstations (int): the number of stations returned for this tile
+        saturation (int): number of stations to consider the tile saturated
+        min_tile_size (float): minimum tile extent (degrees) after splitting
+
+    Returns:
+        bool: True if the tile should be split, False otherwise
+    """
+    return nstations >= saturation and min(
+        tile["lat_ne"] - tile["lat_sw"],
+        tile["lon_ne"] - tile["lon_sw"]) >= 2 * min_tile_size
+
+def station_key(station):
+    """ The key to deduplicate Getpublicdata stations of overlapping tiles by
+
+    Args:
+        station (dict): the station
+
+    Returns:
+        hashable: the station's '_id'. Stations without one are identified by
+            their coordinates or if these are missing too by the station dict
+            itself, so they are all kept.
+    """
+    if station.get("_id") is not None:
+        return station["_id"]
+    location = (station.get("place") or {}).get("location")
+    try: return ("location",) + tuple(location)
+    except TypeError: return ("station", id(station))
+
+def pacing_rate_limiter(rate):
+    """ Create a RateLimiter spacing requests evenly at a maximum rate
+
+    Args:
+        rate (float or None): maximum requests per second. None means no
+            limit.
+
+    Returns:
+        RateLimiter or None: a limiter with a single token per 1 / rate
+            seconds or None if there is no limit
+    """
+    if rate is None:
+        return None
+    assert rate > 0, "rate has to be positive"
+    return ratelimit.RateLimiter(budgets = {1 / rate: 1})
+
+
 class NetatmoClient(object):
     """
     Netatmo api client
@@ -19,9 +100,37 @@ class NetatmoClient(object):
     Args:
         authentication (Authentication, optional): 
             the authentication used for Oauth2 authentication
+        cache (ResponseCache, optional): the cache for api responses.
+            Defaults to None which means no caching.
+        rate_limiter (RateLimiter, optional): the rate limiter the requests
+            wait for. Defaults to None which means the shared
+            ratelimit.RATE_LIMITER.
+        priority (int, optional): the priority of the requests at the rate
+            limiter, e.g. ratelimit.PRIORITY_BACKFILL for bulk downloads.
+            Defaults to None which means ratelimit.PRIORITY_NORMAL.
+        retry_policy (RetryPolicy, optional): the policy to retry requests
+            after transient failures. Defaults to None which means the shared
+            retry.RETRY_POLICY.
+        server (str, optional): the api server domain (optionally with
+            ':port'). Defaults to None which means NETATMO_API_SERVER.
+        connection_pool (ConnectionPool, optional): the pool for the
+            connections. Defaults to None which means the shared pool.
+        observers (list, optional): the observers notified with an
+            instrumentation.RequestEvent about every call and every attempt
+            to send a request. Defaults to None which means the shared
+            instrumentation.OBSERVERS.
     """
-    def __init__(self, authentication = None):
+    def __init__(self, authentication = None, cache = None,
+        rate_limiter = None, priority = None, retry_policy = None,
+        server = None, connection_pool = None, observers = None):
         self.authentication = authentication
+        self.cache = cache
+        self.rate_limiter = rate_limiter
+        self.priority = priority
+        self.retry_policy = retry_policy
+        self.server = server
+        self.connection_pool = connection_pool
+        self.observers = observers
 
 
     ##################
@@ -61,39 +170,180 @@ class NetatmoClient(object):
         if not isinstance(newauth, authentication.Authentication):
             self.logger.debug("authentication property needs to be of " 
                 "class Authentication. Using empty instance instead " 
-                "of {}.".format(newauth))
+                "of %s.", newauth)
 
             self._authentication = authentication.Authentication()
         else:
             self._authentication = newauth
 
+    @property
+    def cache(self):
+        """ The ResponseCache for api responses or None for no caching.
+        Cached responses are returned directly without a request. Streamed
+        responses are not cached as they have no 'body'.
+        """
+        try: return self._cache
+        except AttributeError: return None
+
+    @cache.setter
+    def cache(self, newcache):
+        assert newcache is None or isinstance(newcache, cache.ResponseCache), \
+            "cache has to be None or a ResponseCache"
+        self._cache = newcache
+
+    @property
+    def rate_limiter(self):
+        """ The RateLimiter the requests wait for. None means the requests'
+        default, the shared ratelimit.RATE_LIMITER.
+        """
+        try: return self._rate_limiter
+        except AttributeError: return None
+
+    @rate_limiter.setter
+    def rate_limiter(self, newlimiter):
+        assert newlimiter is None or \
+            isinstance(newlimiter, ratelimit.RateLimiter), \
+            "rate_limiter has to be None or a RateLimiter"
+        self._rate_limiter = newlimiter
+
+    @property
+    def priority(self):
+        """ The priority of the requests at the rate limiter, lower values go
+        first. None means the requests' default ratelimit.PRIORITY_NORMAL.
+        """
+        try: return self._priority
+        except AttributeError: return None
+
+    @priority.setter
+    def priority(self, value):
+        self._priority = None if value is None else int(value)
+
+    @property
+    def retry_policy(self):
+        """ The RetryPolicy for transient failures. None means the requests'
+        default, the shared retry.RETRY_POLICY.
+        """
+        try: return self._retry_policy
+        except AttributeError: return None
+
+    @retry_policy.setter
+    def retry_policy(self, newpolicy):
+        assert newpolicy is None or isinstance(newpolicy, retry.RetryPolicy), \
+            "retry_policy has to be None or a RetryPolicy"
+        self._retry_policy = newpolicy
+
+    @property
+    def server(self):
+        """ The api server domain (optionally with ':port') or None for the
+        requests' default NETATMO_API_SERVER, e.g. to use a local stand-in
+        server. The authentication has its own server setting.
+        """
+        try: return self._server
+        except AttributeError: return None
+
+    @server.setter
+    def server(self, value):
+        self._server = None if value is None else str(value)
+
+    @property
+    def connection_pool(self):
+        """ The ConnectionPool for the requests or None for the shared default
+        pool
+        """
+        try: return self._connection_pool
+        except AttributeError: return None
+
+    @connection_pool.setter
+    def connection_pool(self, newpool):
+        assert newpool is None or \
+            isinstance(newpool, connectionpool.ConnectionPool), \
+            "connection_pool has to be None or a ConnectionPool"
+        self._connection_pool = newpool
+
+    @property
+    def observers(self):
+        """ The list of observers notified about the calls and the requests'
+        attempts or None for the shared instrumentation.OBSERVERS
+        """
+        try: return self._observers
+        except AttributeError: return None
+
+    @observers.setter
+    def observers(self, newobservers):
+        assert newobservers is None or isinstance(newobservers, list), \
+            "observers has to be None or a list"
+        self._observers = newobservers
+
 
     ###############
     ### Methods ###
     ###############
-    def Getpublicdata(self,region,required_data=None,filter=False):
-        """ Issue a Getpublicdata POST request to the netatmo server
+    def prepare(self, apirequest):
+        """ Apply the client's rate limiter, priority, retry policy, server,
+        connection pool and observers to a request
+        """
+        if self.rate_limiter is not None:
+            apirequest.rate_limiter = self.rate_limiter
+        if self.priority is not None:
+            apirequest.priority = self.priority
+        if self.retry_policy is not None:
+            apirequest.retry_policy = self.retry_policy
+        if self.server is not None:
+            apirequest.server = self.server
+        if self.connection_pool is not None:
+            apirequest.connection_pool = self.connection_pool
+        if self.observers is not None:
+            apirequest.observers = self.observers
+
+    def issue(self, apirequest):
+        """ Issue an api request and check the response. If the response is
+        in the cache, it is returned without a request.
 
         Args:
-            region (dict): dict definig the desired request region. Required
-                keys: lat_ne [-85;85], lat_sw [-85;85], lon_ne [-180;180] and
-                lon_sw [-180;180] with lat_ne > lat_sw and lon_ne > lon_sw
-            required_data (str or None, optional): Defaults to None which means
-                no filter.
-            filter (bool, optional): server-side filter for stations with
-                unusual data. Defaults to False with means no filter
+            apirequest (ApiRequest): the api request. The access token is added
+                to its payload.
 
         Returns:
-            instance of GetpublicdataResponse with response data
+            ApiResponse or derivate: the api response
+        """
+        with instrumentation.observed(kind = "call", endpoint = apirequest.url,
+            observers = self.observers) as event:
+            if self.cache is not None:
+                apiresponse = self.cache.get(apirequest)
+                if apiresponse is not None:
+                    event.outcome = "cached"
+                    return apiresponse
+
+            # set the access token
+            with event.timer("token"):
+                tokens = self.authentication.tokens
+            payload = apirequest.payload.copy()
+            payload["access_token"] = tokens.get("access_token")
+            apirequest.payload = payload
+            self.prepare(apirequest)
+
+            ### issue the request ###
+            with event.timer("request"):
+                apiresponse = apirequest.response
+
+            ### check for errors ###
+            self.check_response(apiresponse)
+
+            if self.cache is not None and not apirequest.stream_body:
+                self.cache.put(apirequest, apiresponse)
+
+            return apiresponse
+
+    def Getpublicdata_payload(self,region,required_data=None,filter=False):
+        """ Check the input for a Getpublicdata request and create the payload
+        (without access token). See Getpublicdata for the arguments.
 
         Raises:
             InvalidApiInputError or derivates if wrong input was provided
-            ApiResponseError or derivates if api responded with error
 
         Returns:
-            GetpublicdataResponse: The api response
+            dict: the payload
         """
-
         ### Check the input ###
         # check the region
         for key,bounds in GETPUBLICDATA_REGION_BOUNDS.items():
@@ -113,11 +363,8 @@ class NetatmoClient(object):
         if not isinstance(filter,bool):
             raise InvalidApiInputError("'filter' needs to be bool")
 
-            
         ### Create the payload ###
         payload = {} # start with empty dict
-        # set the access token
-        payload["access_token"] = self.authentication.tokens.get("access_token")
         # set the region
         payload.update(region)
         # set the required_data
@@ -126,45 +373,137 @@ class NetatmoClient(object):
         # set the filter option
         payload["filter"] = str(filter).lower()
 
+        return payload
+
+    def Getpublicdata(self,region,required_data=None,filter=False,
+        stream=False):
+        """ Issue a Getpublicdata POST request to the netatmo server
+
+        Args:
+            region (dict): dict definig the desired request region. Required
+                keys: lat_ne [-85;85], lat_sw [-85;85], lon_ne [-180;180] and
+                lon_sw [-180;180] with lat_ne > lat_sw and lon_ne > lon_sw
+            required_data (str or None, optional): Defaults to None which means
+                no filter.
+            filter (bool, optional): server-side filter for stations with
+                unusual data. Defaults to False with means no filter
+            stream (bool, optional): convert the stations to the DataFrame
+                while they are read instead of keeping them in the response.
+                This saves memory for large regions, but the response has no
+                'body'. Defaults to False.
+
+        Returns:
+            instance of GetpublicdataResponse with response data
+
+        Raises:
+            InvalidApiInputError or derivates if wrong input was provided
+            ApiResponseError or derivates if api responded with error
+
+        Returns:
+            GetpublicdataResponse: The api response
+        """
+        ### Create the payload ###
+        payload = self.Getpublicdata_payload(region = region,
+            required_data = required_data, filter = filter)
+
         ### issue the request ###
         apirequest = requests.GetpublicdataRequest( payload = payload )
-        apiresponse = apirequest.response
+        apirequest.stream_body = stream
+        return self.issue(apirequest)
+
+
+    def GetpublicdataScan(self,region,required_data=None,filter=False,
+        saturation=GETPUBLICDATA_SCAN_SATURATION,
+        min_tile_size=GETPUBLICDATA_SCAN_MIN_TILE_SIZE,
+        max_workers=GETPUBLICDATA_SCAN_WORKERS):
+        """ Scan a large region with Getpublicdata requests. The api only
+        returns a limited number of stations per request, so tiles that appear
+        saturated are recursively split into four quadrants. The tile requests
+        are issued concurrently and the stations of all tiles are merged and
+        deduplicated by their '_id' (see station_key).
+
+        Args:
+            region, required_data, filter: see Getpublicdata
+            saturation (int, optional): a tile with at least this many stations
+                is considered saturated and split. Defaults to
+                GETPUBLICDATA_SCAN_SATURATION.
+            min_tile_size (float, optional): tiles whose latitude or longitude
+                extent is smaller than this (degrees) are not split further.
+                Defaults to GETPUBLICDATA_SCAN_MIN_TILE_SIZE.
+            max_workers (int, optional): number of concurrent requests.
+                Defaults to GETPUBLICDATA_SCAN_WORKERS.
+
+        Raises:
+            InvalidApiInputError or derivates if wrong input was provided
+            ApiResponseError or derivates if api responded with error
+
+        Returns:
+            GetpublicdataResponse: The merged api response for the whole region
+        """
+        ### Check the input ###
+        payload = self.Getpublicdata_payload(region = region,
+            required_data = required_data, filter = filter)
+        # make sure the tokens are up to date before the fan-out
+        payload["access_token"] = self.authentication.tokens.get("access_token")
 
-        ### check for errors ###
-        error = apiresponse.response.get("error",{}).get("message")
-        if error: raise API_ERRORS.get(error,ApiResponseError(error))
+        ### scan the tiles ###
+        stations = collections.OrderedDict() # station_key -> station
+        pending = {} # future -> tile
+        with concurrent.futures.ThreadPoolExecutor(max_workers) as executor:
+            def submit(tile):
+                future = executor.submit(self.Getpublicdata, region = tile,
+                    required_data = required_data, filter = filter)
+                pending[future] = tile
+            submit(region)
+            while pending:
+                done, not_done = concurrent.futures.wait(pending,
+                    return_when = concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    tile = pending.pop(future)
+                    body = future.result().response.get("body") or []
+                    for station in body:
+                        stations.setdefault(station_key(station), station)
+                    if tile_is_saturated(tile, len(body), saturation,
+                        min_tile_size):
+                        self.logger.debug("tile %s is saturated with %d "
+                            "stations, splitting it", tile, len(body))
+                        for subtile in split_region(tile):
+                            submit(subtile)
+
+        ### merge the results ###
+        return self.merged_Getpublicdata_response(payload, stations)
+
+    def merged_Getpublicdata_response(self, payload, stations):
+        """ Pack stations gathered from several Getpublicdata requests into one
+        GetpublicdataResponse
+
+        Args:
+            payload (dict): the payload describing the whole region
+            stations (dict): station_key -> station
+
+        Returns:
+            GetpublicdataResponse: The merged api response
+        """
+        self.logger.debug("merging %d unique stations", len(stations))
+        apirequest = requests.GetpublicdataRequest( payload = payload )
+        apiresponse = apirequest.response_class(request = apirequest,
+            response = {"status":"ok", "body":list(stations.values())})
+        apirequest.response = apiresponse
 
         return apiresponse
 
 
-    def Getmeasure(self,device_id,module_id=None,type=None,
+    def Getmeasure_payload(self,device_id,module_id=None,type=None,
         scale=None,date_begin=None,date_end=None,real_time=False,
         optimize=False):
-        """ Issue a Getmeasure POST request to the netatmo server
-        Taken from API documentation: 
-        https://dev.netatmo.com/dev/resources/technical/reference/common/getmeasure
+        """ Check the input for a Getmeasure request and create the payload
+        (without access token). See Getmeasure for the arguments.
 
-        Args:
-            device_id (str): The mac address of the device
-            module_id (str, optinal): The mac address of the module of
-                interest. If not specified, returns data of the device. If
-                specified, returns data from the specified module
-            type (list of str, optional): Measures interested in. List of
-                "rain","humidity","pressure","wind" and "temperature".
-            scale (str, optional): Timelapse between two measurements. "max"
-                (every value is returned), "30min" (1 value every 30min),
-                "1hour", "3hours", "1day", "1week", "1month". Defaults to "max".
-            date_begin,date_end (int, optional): UNIX-timestamp of first/last
-                measure to receive. Limit is 1024 measures.
-            optimize (bool, optional): Determines the format of the answer.
-                Default is False. For mobile apps we recommend True and False if
-                bandwidth isn't an issue as it is easier to parse.
-            real_time (bool, optional): If scale different than max, timestamps
-                are by default offset + scale/2. To get exact timestamps, use
-                true. Default is false.  
+        Raises:
+            InvalidApiInputError if wrong input was provided
 
         Returns:
-            GetmeasureResponse: The api response
+            dict: the payload
         """
         ### Check the input ###
         # check device_id
@@ -222,8 +561,6 @@ class NetatmoClient(object):
 
         ### Prepare the payload ###
         payload = {} # start with empty dict
-        # access token
-        payload["access_token"] = self.authentication.tokens.get("access_token")
         # device id
         payload["device_id"] = device_id
         # module id
@@ -244,28 +581,344 @@ class NetatmoClient(object):
         # real_time
         payload["real_time"] = str(real_time).lower()
 
+        return payload
+
+    def Getmeasure(self,device_id,module_id=None,type=None,
+        scale=None,date_begin=None,date_end=None,real_time=False,
+        optimize=False):
+        """ Issue a Getmeasure POST request to the netatmo server
+        Taken from API documentation: 
+        https://dev.netatmo.com/dev/resources/technical/reference/common/getmeasure
+
+        Args:
+            device_id (str): The mac address of the device
+            module_id (str, optinal): The mac address of the module of
+                interest. If not specified, returns data of the device. If
+                specified, returns data from the specified module
+            type (list of str, optional): Measures interested in. List of
+                "rain","humidity","pressure","wind" and "temperature".
+            scale (str, optional): Timelapse between two measurements. "max"
+                (every value is returned), "30min" (1 value every 30min),
+                "1hour", "3hours", "1day", "1week", "1month". Defaults to "max".
+            date_begin,date_end (int, optional): UNIX-timestamp of first/last
+                measure to receive. Limit is 1024 measures.
+            optimize (bool, optional): Determines the format of the answer.
+                Default is False. For mobile apps we recommend True and False if
+                bandwidth isn't an issue as it is easier to parse.
+            real_time (bool, optional): If scale different than max, timestamps
+                are by default offset + scale/2. To get exact timestamps, use
+                true. Default is false.  
+
+        Returns:
+            GetmeasureResponse: The api response
+        """
+        ### Prepare the payload ###
+        payload = self.Getmeasure_payload(device_id = device_id,
+            module_id = module_id, type = type, scale = scale,
+            date_begin = date_begin, date_end = date_end,
+            real_time = real_time, optimize = optimize)
+
         ### issue the request ###
-        apirequest = requests.GetmeasureRequest( payload = payload )
-        apiresponse = apirequest.response
+        return self.issue(requests.GetmeasureRequest( payload = payload ))
 
-        ### check for errors ###
-        error = apiresponse.response.get("error",{}).get("message")
-        if error: raise API_ERRORS.get(error,ApiResponseError(error))
 
-        return apiresponse
+    def Getmeasure_windows(self,date_begin,date_end=None,scale=None,
+        window=None):
+        """ Split a time span into windows small enough for single Getmeasure
+        requests
 
+        Args:
+            date_begin,date_end (int): UNIX-timestamp of first/last measure.
+                date_end defaults to now.
+            scale (str, optional): the Getmeasure scale. Defaults to "max".
+            window (int, optional): the window length in seconds. Defaults to
+                GETMEASURE_MAX_MEASURES measures at the given scale.
 
-    def Getstationsdata(self, device_id, get_favourites = False):
-        """ Issue a Getstationsdata POST request to the netatmo server
-        Taken from API documentation: 
+        Returns:
+            list of (int, int): the (date_begin, date_end) of the windows
+        """
+        if date_end is None: date_end = time.time()
+        if scale is None: scale = "max"
+        try:
+            date_begin, date_end = int(date_begin), int(date_end)
+        except (TypeError, ValueError):
+            raise InvalidApiInputError("date_begin and date_end must be " 
+                "UNIX-timestamps")
+        if window is None:
+            try:
+                window = GETMEASURE_MAX_MEASURES * \
+                    GETMEASURE_SCALE_SECONDS[scale]
+            except KeyError:
+                raise InvalidApiInputError("scale must be one of {}".format(
+                    list(GETMEASURE_SCALE_SECONDS.keys())))
+        if not int(window) > 0:
+            raise InvalidApiInputError("window must be positive")
+        window = int(window)
+        windows = []
+        begin = date_begin
+        while True:
+            end = min(begin + window, date_end)
+            windows.append((begin, end))
+            if end >= date_end: break
+            begin = end
+        return windows
+
+    def Getmeasure_remainder(self, apiresponse, date_begin, date_end):
+        """ Find the part of a Getmeasure time window a response doesn't
+        cover. The api returns at most GETMEASURE_MAX_MEASURES measures, so a
+        full response may end before date_end, e.g. if the station measured
+        more often than the scale.
 
         Args:
-            device_id (str): The mac address of the device
-            get_favourites (bool): To retrieve user's favorite weather stations.
-                Is converted to bool. Default is false.
+            apiresponse (GetmeasureResponse): the response for the window
+            date_begin,date_end (int or None): the window
 
         Returns:
-            GetstationsdataResponse: The api response
+            (int, int) or None: the (date_begin, date_end) of the remainder
+                or None if the response covers the whole window
+        """
+        if date_begin is None or date_end is None:
+            return None # latest measures, no window
+        df = apiresponse.dataframe
+        if len(df) < GETMEASURE_MAX_MEASURES:
+            return None
+        last = int(df.index.max().timestamp())
+        if not int(date_begin) < last < int(date_end):
+            return None
+        return last, int(date_end)
+
+    def Getmeasure_complete(self, rate_limiter = None, **arguments):
+        """ Issue Getmeasure requests for a time window until all of its
+        measures are received. A full response is followed by a request for
+        the remainder of the window.
+
+        Args:
+            rate_limiter (RateLimiter, optional): acquired before each
+                request, in addition to the client's rate_limiter
+            arguments: the Getmeasure arguments
+
+        Returns:
+            list of GetmeasureResponse: the api responses
+        """
+        apiresponses = []
+        while True:
+            if rate_limiter is not None:
+                rate_limiter.acquire()
+            apiresponse = self.Getmeasure(**arguments)
+            apiresponses.append(apiresponse)
+            remainder = self.Getmeasure_remainder(apiresponse,
+                arguments.get("date_begin"), arguments.get("date_end"))
+            if remainder is None:
+                return apiresponses
+            self.logger.debug("Getmeasure response is full, requesting the "
+                "remaining window %s", remainder)
+            arguments = dict(arguments, date_begin = remainder[0],
+                date_end = remainder[1])
+
+    def stitch_Getmeasure_responses(self, apiresponses):
+        """ Stitch the responses of Getmeasure requests for consecutive time
+        windows into one DataFrame. Measures appearing in more than one
+        response (at the window boundaries) are only kept once.
+
+        Args:
+            apiresponses (list of GetmeasureResponse): the api responses
+
+        Returns:
+            pandas.DataFrame: time-indexed measurements
+        """
+        frames = [ r.dataframe for r in apiresponses
+            if r.response.get("body") ] # skip windows without data
+        if not frames:
+            return DataFrame(
+                index = pd.DatetimeIndex([], tz = "UTC", name = "time"))
+        df = pd.concat(frames)
+        df = df[~df.index.duplicated(keep = "first")] # boundary duplicates
+        df = df.sort_index()
+        return df
+
+    def GetmeasureRange(self,device_id,date_begin,date_end=None,module_id=None,
+        type=None,scale=None,real_time=False,window=None,
+        max_workers=GETMEASURE_RANGE_WORKERS):
+        """ Get measures of an arbitrary time span by issuing Getmeasure
+        requests for consecutive time windows. Each window covers at most
+        GETMEASURE_MAX_MEASURES measures at the given scale. If a response is
+        full nevertheless, the rest of its window is requested separately,
+        see Getmeasure_complete. As only the
+        DataFrame is returned, the compact optimized response format is used.
+
+        Args:
+            device_id, module_id, type, scale, real_time: see Getmeasure
+            date_begin (int): UNIX-timestamp of the first measure
+            date_end (int, optional): UNIX-timestamp of the last measure.
+                Defaults to now.
+            window (int, optional): the window length in seconds. Defaults to
+                GETMEASURE_MAX_MEASURES measures at the given scale.
+            max_workers (int, optional): number of windows fetched
+                concurrently. Defaults to GETMEASURE_RANGE_WORKERS.
+
+        Raises:
+            InvalidApiInputError if wrong input was provided
+            ApiResponseError or derivates if api responded with error
+
+        Returns:
+            pandas.DataFrame: time-indexed measurements of the whole time span
+        """
+        if date_end is None: date_end = int(time.time())
+        ### Check the input ###
+        self.Getmeasure_payload(device_id = device_id, module_id = module_id,
+            type = type, scale = scale, date_begin = date_begin,
+            date_end = date_end, real_time = real_time)
+        windows = self.Getmeasure_windows(date_begin = date_begin,
+            date_end = date_end, scale = scale, window = window)
+        self.logger.debug("fetching Getmeasure data in %d windows",
+            len(windows))
+
+        ### fetch the windows ###
+        def fetch(window):
+            return self.Getmeasure_complete(device_id = device_id,
+                module_id = module_id, type = type, scale = scale,
+                date_begin = window[0], date_end = window[1],
+                real_time = real_time, optimize = True)
+        with concurrent.futures.ThreadPoolExecutor(max_workers) as executor:
+            apiresponses = [ r for responses in executor.map(fetch, windows)
+                for r in responses ]
+
+        ### stitch the windows ###
+        return self.stitch_Getmeasure_responses(apiresponses)
+
+    def Getmeasure_batch_tasks(self, specs, **defaults):
+        """ Check the specs of a Getmeasure batch and split them into single
+        Getmeasure requests
+
+        Args:
+            specs (list of dict): the specs, see GetmeasureBatch
+            defaults: the default spec values
+
+        Raises:
+            InvalidApiInputError if a spec is invalid
+
+        Returns:
+            list of list of dict: the Getmeasure arguments of the requests
+                for each spec
+        """
+        if isinstance(specs, dict) or not hasattr(specs, "__iter__"):
+            raise InvalidApiInputError("specs has to be a list of dicts")
+        tasks = []
+        for i, spec in enumerate(specs):
+            try:
+                if not isinstance(spec, dict):
+                    raise InvalidApiInputError("spec is no dict")
+                unknown = set(spec) - set(GETMEASURE_BATCH_SPEC_KEYS)
+                if unknown:
+                    raise InvalidApiInputError("unknown keys {}".format(
+                        sorted(unknown)))
+                if not "device_id" in spec:
+                    raise InvalidApiInputError("device_id is missing")
+                arguments = defaults.copy()
+                arguments.update(spec)
+                self.Getmeasure_payload(**arguments)
+                if arguments.get("date_begin") is None: # latest measures
+                    tasks.append([arguments])
+                    continue
+                if arguments.get("date_end") is None:
+                    arguments["date_end"] = int(time.time())
+                windows = self.Getmeasure_windows(
+                    date_begin = arguments["date_begin"],
+                    date_end = arguments["date_end"],
+                    scale = arguments.get("scale"))
+            except InvalidApiInputError as e:
+                raise InvalidApiInputError("Getmeasure batch spec {} ({}): " 
+                    "{}".format(i, spec, e))
+            tasks.append([dict(arguments, date_begin = b, date_end = e)
+                for b, e in windows])
+        return tasks
+
+    def merge_Getmeasure_batch(self, tasks, apiresponses):
+        """ Merge the responses of a Getmeasure batch into one DataFrame
+
+        Args:
+            tasks (list of list of dict): see Getmeasure_batch_tasks
+            apiresponses (list of list of GetmeasureResponse): the responses
+                to each task in the order of the flattened tasks, see
+                Getmeasure_complete
+
+        Returns:
+            pandas.DataFrame: the measurements with a (device_id, module_id,
+                time) MultiIndex
+        """
+        frames, keys = [], []
+        apiresponses = iter(apiresponses)
+        for spec_tasks in tasks:
+            spec = spec_tasks[0]
+            frames.append(self.stitch_Getmeasure_responses(
+                [r for task in spec_tasks for r in next(apiresponses)]))
+            # the device itself is its main module
+            keys.append((spec["device_id"],
+                spec.get("module_id") or spec["device_id"]))
+        if not frames:
+            return DataFrame(index = pd.MultiIndex.from_arrays(
+                [[], [], pd.DatetimeIndex([], tz = "UTC")],
+                names = ["device_id", "module_id", "time"]))
+        return pd.concat(frames, keys = keys,
+            names = ["device_id", "module_id", "time"])
+
+    def GetmeasureBatch(self, specs, type=None, scale=None, date_begin=None,
+        date_end=None, real_time=False, max_workers=GETMEASURE_BATCH_WORKERS,
+        rate_limit=None):
+        """ Get measures of many devices and modules. All specs are checked
+        before the first request is issued. Time spans beyond the measure
+        limit are split into windows like in GetmeasureRange. The requests
+        are issued concurrently.
+
+        Args:
+            specs (list of dict): one dict per device or module with the
+                keys device_id (required), module_id, type, scale, date_begin,
+                date_end and real_time. See Getmeasure.
+            type, scale, date_begin, date_end, real_time: defaults for the
+                specs. Without date_begin, the latest measures are returned.
+            max_workers (int, optional): number of concurrent requests.
+                Defaults to GETMEASURE_BATCH_WORKERS.
+            rate_limit (float, optional): maximum requests per second.
+                Defaults to None which means no limit.
+
+        Raises:
+            InvalidApiInputError if a spec is invalid
+            ApiResponseError or derivates if api responded with error
+
+        Returns:
+            pandas.DataFrame: the measurements with a (device_id, module_id,
+                time) MultiIndex and one column per type. The module_id of
+                the device itself is its device_id.
+        """
+        ### Check the input ###
+        tasks = self.Getmeasure_batch_tasks(specs, type = type,
+            scale = scale, date_begin = date_begin, date_end = date_end,
+            real_time = real_time)
+        calls = [task for spec_tasks in tasks for task in spec_tasks]
+        self.logger.debug("fetching a Getmeasure batch of %d specs with %d " 
+            "requests", len(tasks), len(calls))
+
+        ### fetch ###
+        limiter = pacing_rate_limiter(rate_limit)
+        def fetch(task):
+            return self.Getmeasure_complete(rate_limiter = limiter,
+                optimize = True, **task)
+        with concurrent.futures.ThreadPoolExecutor(max_workers) as executor:
+            apiresponses = list(executor.map(fetch, calls))
+
+        ### merge ###
+        return self.merge_Getmeasure_batch(tasks, apiresponses)
+
+
+    def Getstationsdata_payload(self, device_id, get_favourites = False):
+        """ Check the input for a Getstationsdata request and create the
+        payload (without access token). See Getstationsdata for the arguments.
+
+        Raises:
+            InvalidApiInputError if wrong input was provided
+
+        Returns:
+            dict: the payload
         """
         ### Check the input ###
         # check device_id
@@ -280,22 +933,46 @@ class NetatmoClient(object):
 
         ### create the payload ###
         payload = {} # start with empty dict
-        # access token
-        payload["access_token"] = self.authentication.tokens.get("access_token")
         # device id
         payload["device_id"] = device_id
         # get_favourites
         payload["get_favourites"] = str(get_favourites).lower()
-        
+
+        return payload
+
+    def Getstationsdata(self, device_id, get_favourites = False):
+        """ Issue a Getstationsdata POST request to the netatmo server
+        Taken from API documentation: 
+
+        Args:
+            device_id (str): The mac address of the device
+            get_favourites (bool): To retrieve user's favorite weather stations.
+                Is converted to bool. Default is false.
+
+        Returns:
+            GetstationsdataResponse: The api response
+        """
+        ### create the payload ###
+        payload = self.Getstationsdata_payload(device_id = device_id,
+            get_favourites = get_favourites)
+
         ### issue the request ###
-        apirequest = requests.GetstationsdataRequest( payload = payload )
-        apiresponse = apirequest.response
+        return self.issue(requests.GetstationsdataRequest( payload = payload ))
 
-        ### check for errors ###
-        error = apiresponse.response.get("error",{}).get("message")
-        if error: raise API_ERRORS.get(error,ApiResponseError(error))
+    def check_response(self, apiresponse):
+        """ Raise the appropriate error if the api responded with an error
 
-        return apiresponse
+        Args:
+            apiresponse (ApiResponse): the api response to check
+
+        Raises:
+            ApiResponseError or derivates if api responded with error,
+            ApiThrottlingError if the request budget is used up
+        """
+        error = apiresponse.response.get("error",{})
+        message = error.get("message")
+        if error.get("code") in API_ERROR_CODES or message:
+            raise api_error(message, error.get("code"))
 
 
     def __repr__(self):
@@ -313,3 +990,276 @@ class NetatmoClient(object):
 
 
 
+
+
+class AsyncNetatmoClient(NetatmoClient):
+    """
+    Netatmo api client with awaitable api methods. The requests are issued
+    with a non-blocking asyncio transport, so many requests can be in flight
+    at the same time, e.g. via asyncio.gather. The input checks and the
+    returned response types are the same as for NetatmoClient.
+
+    Args:
+        authentication (Authentication, optional): 
+            the authentication used for Oauth2 authentication
+        max_concurrency (int, optional): maximum number of requests in flight
+            at the same time. Defaults to None which means no limit.
+        cache (ResponseCache, optional): the cache for api responses.
+            Defaults to None which means no caching.
+        rate_limiter, priority, retry_policy, server, connection_pool,
+            observers: see NetatmoClient
+    """
+    def __init__(self, authentication = None, max_concurrency = None,
+        cache = None, rate_limiter = None, priority = None,
+        retry_policy = None, server = None, connection_pool = None,
+        observers = None):
+        super().__init__(authentication = authentication, cache = cache,
+            rate_limiter = rate_limiter, priority = priority,
+            retry_policy = retry_policy, server = server,
+            connection_pool = connection_pool, observers = observers)
+        self.max_concurrency = max_concurrency
+
+    ##################
+    ### Properties ###
+    ##################
+    @property
+    def max_concurrency(self):
+        """ maximum number of requests in flight at the same time or None
+        """
+        try: return self._max_concurrency
+        except AttributeError: return None
+
+    @max_concurrency.setter
+    def max_concurrency(self, value):
+        if value is not None:
+            value = int(value)
+            assert value > 0, "max_concurrency has to be positive"
+        self._max_concurrency = value
+        self._semaphore = None # recreate on next use
+
+    ###############
+    ### Methods ###
+    ###############
+    async def tokens(self):
+        """ Make sure the authentication's tokens are up to date without
+        blocking and return them. Concurrent callers share one token update,
+        also with other threads, processes using the same token store and
+        Authentication.refresh_in_background.
+
+        Returns:
+            dict: the tokens
+        """
+        await self.authentication.make_sure_tokens_are_up_to_date_async()
+        with self.authentication.no_token_getter_recursion():
+            return self.authentication.tokens
+
+    async def close(self):
+        """ Close the idle keep-alive connections of the running event loop
+        in the connection pool. Await this before the event loop ends.
+        """
+        pool = self.connection_pool
+        if pool is None:
+            pool = connectionpool.CONNECTION_POOL
+        await pool.clear_async()
+
+    async def issue(self, apirequest):
+        """ Issue an api request without blocking and check the response. If
+        the response is in the cache, it is returned without a request.
+
+        Args:
+            apirequest (ApiRequest): the api request. The access token is added
+                to its payload.
+
+        Returns:
+            ApiResponse or derivate: the api response
+        """
+        with instrumentation.observed(kind = "call", endpoint = apirequest.url,
+            observers = self.observers) as event:
+            if self.cache is not None:
+                apiresponse = self.cache.get(apirequest)
+                if apiresponse is not None:
+                    event.outcome = "cached"
+                    return apiresponse
+
+            # set the access token
+            with event.timer("token"):
+                tokens = await self.tokens()
+            payload = apirequest.payload.copy()
+            payload["access_token"] = tokens.get("access_token")
+            apirequest.payload = payload
+            self.prepare(apirequest)
+
+            ### issue the request ###
+            if self.max_concurrency is None:
+                with event.timer("request"):
+                    apiresponse = await apirequest.issue_async()
+            else:
+                if self._semaphore is None:
+                    self._semaphore = asyncio.Semaphore(self.max_concurrency)
+                with event.timer("queue"):
+                    await self._semaphore.acquire()
+                try:
+                    with event.timer("request"):
+                        apiresponse = await apirequest.issue_async()
+                finally:
+                    self._semaphore.release()
+
+            ### check for errors ###
+            self.check_response(apiresponse)
+
+            if self.cache is not None and not apirequest.stream_body:
+                self.cache.put(apirequest, apiresponse)
+
+            return apiresponse
+
+    async def Getpublicdata(self,region,required_data=None,filter=False,
+        stream=False):
+        """ Awaitable version of NetatmoClient.Getpublicdata
+
+        Returns:
+            GetpublicdataResponse: The api response
+        """
+        payload = self.Getpublicdata_payload(region = region,
+            required_data = required_data, filter = filter)
+        apirequest = requests.GetpublicdataRequest(payload = payload)
+        apirequest.stream_body = stream
+        return await self.issue(apirequest)
+
+    async def GetpublicdataScan(self,region,required_data=None,filter=False,
+        saturation=GETPUBLICDATA_SCAN_SATURATION,
+        min_tile_size=GETPUBLICDATA_SCAN_MIN_TILE_SIZE,
+        max_workers=GETPUBLICDATA_SCAN_WORKERS):
+        """ Awaitable version of NetatmoClient.GetpublicdataScan. max_workers
+        is the maximum number of tile requests in flight.
+
+        Returns:
+            GetpublicdataResponse: The merged api response for the whole region
+        """
+        ### Check the input ###
+        payload = self.Getpublicdata_payload(region = region,
+            required_data = required_data, filter = filter)
+        payload["access_token"] = (await self.tokens()).get("access_token")
+
+        ### scan the tiles ###
+        stations = collections.OrderedDict() # station_key -> station
+        semaphore = asyncio.Semaphore(max_workers)
+        async def scan(tile):
+            async with semaphore:
+                apiresponse = await self.Getpublicdata(region = tile,
+                    required_data = required_data, filter = filter)
+            body = apiresponse.response.get("body") or []
+            for station in body:
+                stations.setdefault(station_key(station), station)
+            if tile_is_saturated(tile, len(body), saturation, min_tile_size):
+                self.logger.debug("tile %s is saturated with %d "
+                    "stations, splitting it", tile, len(body))
+                await asyncio.gather(*map(scan, split_region(tile)))
+        await scan(region)
+
+        ### merge the results ###
+        return self.merged_Getpublicdata_response(payload, stations)
+
+    async def Getmeasure(self,device_id,module_id=None,type=None,
+        scale=None,date_begin=None,date_end=None,real_time=False,
+        optimize=False):
+        """ Awaitable version of NetatmoClient.Getmeasure
+
+        Returns:
+            GetmeasureResponse: The api response
+        """
+        payload = self.Getmeasure_payload(device_id = device_id,
+            module_id = module_id, type = type, scale = scale,
+            date_begin = date_begin, date_end = date_end,
+            real_time = real_time, optimize = optimize)
+        return await self.issue(requests.GetmeasureRequest(payload = payload))
+
+    async def Getmeasure_complete(self, rate_limiter = None, **arguments):
+        """ Awaitable version of NetatmoClient.Getmeasure_complete
+
+        Returns:
+            list of GetmeasureResponse: the api responses
+        """
+        apiresponses = []
+        while True:
+            if rate_limiter is not None:
+                await rate_limiter.acquire_async()
+            apiresponse = await self.Getmeasure(**arguments)
+            apiresponses.append(apiresponse)
+            remainder = self.Getmeasure_remainder(apiresponse,
+                arguments.get("date_begin"), arguments.get("date_end"))
+            if remainder is None:
+                return apiresponses
+            self.logger.debug("Getmeasure response is full, requesting the "
+                "remaining window %s", remainder)
+            arguments = dict(arguments, date_begin = remainder[0],
+                date_end = remainder[1])
+
+    async def GetmeasureRange(self,device_id,date_begin,date_end=None,
+        module_id=None,type=None,scale=None,real_time=False,window=None,
+        max_workers=GETMEASURE_RANGE_WORKERS):
+        """ Awaitable version of NetatmoClient.GetmeasureRange. max_workers
+        is the maximum number of window requests in flight.
+
+        Returns:
+            pandas.DataFrame: time-indexed measurements of the whole time span
+        """
+        if date_end is None: date_end = int(time.time())
+        ### Check the input ###
+        self.Getmeasure_payload(device_id = device_id, module_id = module_id,
+            type = type, scale = scale, date_begin = date_begin,
+            date_end = date_end, real_time = real_time)
+        windows = self.Getmeasure_windows(date_begin = date_begin,
+            date_end = date_end, scale = scale, window = window)
+
+        ### fetch the windows ###
+        semaphore = asyncio.Semaphore(max_workers)
+        async def fetch(window):
+            async with semaphore:
+                return await self.Getmeasure_complete(device_id = device_id,
+                    module_id = module_id, type = type, scale = scale,
+                    date_begin = window[0], date_end = window[1],
+                    real_time = real_time, optimize = True)
+        apiresponses = [ r for responses in
+            await asyncio.gather(*map(fetch, windows)) for r in responses ]
+
+        ### stitch the windows ###
+        return self.stitch_Getmeasure_responses(apiresponses)
+
+    async def GetmeasureBatch(self, specs, type=None, scale=None,
+        date_begin=None, date_end=None, real_time=False,
+        max_workers=GETMEASURE_BATCH_WORKERS, rate_limit=None):
+        """ Awaitable version of NetatmoClient.GetmeasureBatch. max_workers
+        is the maximum number of requests in flight.
+
+        Returns:
+            pandas.DataFrame: the measurements with a (device_id, module_id,
+                time) MultiIndex
+        """
+        ### Check the input ###
+        tasks = self.Getmeasure_batch_tasks(specs, type = type,
+            scale = scale, date_begin = date_begin, date_end = date_end,
+            real_time = real_time)
+
+        ### fetch ###
+        semaphore = asyncio.Semaphore(max_workers)
+        limiter = pacing_rate_limiter(rate_limit)
+        async def fetch(task):
+            async with semaphore:
+                return await self.Getmeasure_complete(rate_limiter = limiter,
+                    optimize = True, **task)
+        apiresponses = await asyncio.gather(*[fetch(task)
+            for spec_tasks in tasks for task in spec_tasks])
+
+        ### merge ###
+        return self.merge_Getmeasure_batch(tasks, apiresponses)
+
+    async def Getstationsdata(self, device_id, get_favourites = False):
+        """ Awaitable version of NetatmoClient.Getstationsdata
+
+        Returns:
+            GetstationsdataResponse: The api response
+        """
+        payload = self.Getstationsdata_payload(device_id = device_id,
+            get_favourites = get_favourites)
+        return await self.issue(requests.GetstationsdataRequest(
+            payload = payload))
@@ -0,0 +1,371 @@
+#!/usr/bin/env python3
+# system modules
+import logging
+import threading
+import collections
+import http.client
+import time
+import asyncio
+import weakref
+
+# internal modules
+from . import asynchttp
+
+# constants
+DEFAULT_POOL_MAXSIZE = 10
+DEFAULT_POOL_IDLE_TIMEOUT = 60
+DEFAULT_POOL_TIMEOUT = 60
+
+EMPTY_POOL_STATISTICS = {
+"hits":0,       # an idle keep-alive connection was reused
+"misses":0,     # a new connection had to be created
+"reconnects":0, # a reused connection was dead and had to be replaced
+"discarded":0,  # a connection was closed instead of put back into the pool
+"bytes_received":0, # response body bytes as transferred (maybe compressed)
+"bytes_decoded":0,  # response body bytes after decompression
+}
+
+# errors that indicate that a reused keep-alive connection was closed by the
+# server in the meantime
+STALE_CONNECTION_ERRORS = (
+    http.client.RemoteDisconnected,
+    ConnectionResetError,
+    BrokenPipeError,
+    )
+
+class ConnectionPool(object):
+    """ Thread-safe pool of keep-alive connections to api servers. There is one
+    bucket of idle connections per server. The asyncio connections
+    (asynchttp.Connection) are pooled separately for every event loop.
+
+    Args:
+        maxsize (int, optional): maximum number of idle connections kept per
+            server. Defaults to DEFAULT_POOL_MAXSIZE. Use 0 to disable
+            keep-alive.
+        idle_timeout (float, optional): seconds an idle connection may stay in
+            the pool before it is closed instead of reused. Defaults to
+            DEFAULT_POOL_IDLE_TIMEOUT.
+        connection_class (class, optional): the http.client.HTTPConnection
+            derivate used to create new connections. Defaults to
+            http.client.HTTPSConnection.
+        timeout (float, optional): seconds new connections wait for
+            connecting and for every read or write. Defaults to
+            DEFAULT_POOL_TIMEOUT. None means no limit.
+    """
+    def __init__(self,
+            maxsize = DEFAULT_POOL_MAXSIZE,
+            idle_timeout = DEFAULT_POOL_IDLE_TIMEOUT,
+            connection_class = http.client.HTTPSConnection,
+            timeout = DEFAULT_POOL_TIMEOUT,
+            ):
+        self.maxsize = maxsize
+        self.idle_timeout = idle_timeout
+        self.connection_class = connection_class
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._idle = {} # server -> deque of (connection, release time)
+        # event loop -> server -> deque of (connection, release time)
+        self._async_idle = weakref.WeakKeyDictionary()
+        self._statistics = EMPTY_POOL_STATISTICS.copy()
+
+    ##################
+    ### Properties ###
+    ##################
+    @property
+    def logger(self):
+        """ the logging.Logger used for logging.
+        Defaults to logging.getLogger(__name__).
+        """
+        try: # try to return the internal property
+            return self._logger
+        except AttributeError: # didn't work
+            return logging.getLogger(__name__) # return default logger
+
+    @logger.setter
+    def logger(self, logger):
+        assert isinstance(logger, logging.Logger), \
+            "logger property has to be a logging.Logger"
+        self._logger = logger
+
+    @property
+    def maxsize(self):
+        """ maximum number of idle connections kept per server
+        """
+        return self._maxsize
+
+    @maxsize.setter
+    def maxsize(self, newsize):
+        newsize = int(newsize)
+        assert newsize >= 0, "maxsize must not be negative"
+        self._maxsize = newsize
+
+    @property
+    def idle_timeout(self):
+        """ seconds an idle connection may stay in the pool
+        """
+        return self._idle_timeout
+
+    @idle_timeout.setter
+    def idle_timeout(self, newtimeout):
+        newtimeout = float(newtimeout)
+        assert newtimeout >= 0, "idle_timeout must not be negative"
+        self._idle_timeout = newtimeout
+
+    @property
+    def timeout(self):
+        """ seconds new connections wait for connecting and for every read or
+        write, None means no limit
+        """
+        return self._timeout
+
+    @timeout.setter
+    def timeout(self, newtimeout):
+        if newtimeout is not None:
+            newtimeout = float(newtimeout)
+            assert newtimeout > 0, "timeout must be positive"
+        self._timeout = newtimeout
+
+    @property
+    def connection_class(self):
+        """ the http.client.HTTPConnection derivate for new connections
+        """
+        return self._connection_class
+
+    @connection_class.setter
+    def connection_class(self, newclass):
+        assert issubclass(newclass, http.client.HTTPConnection), \
+            "connection_class has to be http.client.HTTPConnection or derivate"
+        self._connection_class = newclass
+
+    @property
+    def uses_ssl(self):
+        """ [read only] whether the connection_class uses SSL
+        """
+        return issubclass(self.connection_class, http.client.HTTPSConnection)
+
+    @property
+    def statistics(self):
+        """ [read only] copy of the pool hit/miss statistics
+        """
+        with self._lock:
+            return self._statistics.copy()
+
+    ###############
+    ### methods ###
+    ###############
+    def count(self, event, n = 1):
+        """ increase the statistics counter for an event
+
+        Args:
+            event (str): one of the keys of EMPTY_POOL_STATISTICS
+            n (int, optional): the increment. Defaults to 1.
+        """
+        if not event in EMPTY_POOL_STATISTICS.keys():
+            raise KeyError(event)
+        with self._lock:
+            self._statistics[event] += n
+
+    def count_bytes(self, received, decoded):
+        """ increase the byte counters of the response bodies
+
+        Args:
+            received (int): bytes as transferred
+            decoded (int): bytes after decompression
+        """
+        with self._lock:
+            self._statistics["bytes_received"] += received
+            self._statistics["bytes_decoded"] += decoded
+
+    def reset_statistics(self):
+        """ reset all statistics counters to 0
+        """
+        with self._lock:
+            self._statistics = EMPTY_POOL_STATISTICS.copy()
+
+    def new_connection(self, server):
+        """ create a new (not yet connected) connection to a server
+
+        Args:
+            server (str): the server domain
+        """
+        return self.connection_class(server, timeout = self.timeout)
+
+    def new_async_connection(self, server):
+        """ create a new (not yet connected) asyncio connection to a server
+
+        Args:
+            server (str): the server domain
+        """
+        return asynchttp.Connection(server, ssl = self.uses_ssl,
+            timeout = self.timeout)
+
+    def take_idle(self, idle, connected):
+        """ Take the newest idle connection that did not expire. Call this
+        holding the lock.
+
+        Args:
+            idle (deque): the idle connections with their release times
+            connected (callable): whether a connection is still open
+
+        Returns:
+            connection, expired: the connection or None and the list of the
+                expired connections to close
+        """
+        now = time.time()
+        expired = []
+        connection = None
+        while idle: # newest connections are on the right
+            conn, released = idle.pop()
+            if now - released > self.idle_timeout or not connected(conn):
+                expired.append(conn)
+            else:
+                connection = conn
+                break
+        # older connections than an expired one are expired as well
+        while idle:
+            expired.append(idle.pop()[0])
+        self._statistics["discarded"] += len(expired)
+        self._statistics["misses" if connection is None else "hits"] += 1
+        return connection, expired
+
+    def acquire(self, server, fresh = False):
+        """ Get a connection to a server. An idle keep-alive connection is
+        reused if possible, otherwise a new one is created.
+
+        Args:
+            server (str): the server domain
+            fresh (bool, optional): always create a new connection, e.g. for
+                requests that must not be sent twice. Defaults to False.
+
+        Returns:
+            connection, reused: the connection and whether it was reused
+        """
+        if fresh:
+            self.count("misses")
+            return self.new_connection(server), False
+        with self._lock:
+            connection, expired = self.take_idle(
+                self._idle.get(server, collections.deque()),
+                lambda conn: conn.sock is not None)
+        for conn in expired:
+            conn.close()
+        if connection is None:
+            self.logger.debug("no idle connection to %s, creating a new "
+                "one", server)
+            return self.new_connection(server), False
+        self.logger.debug("reusing idle connection to %s", server)
+        return connection, True
+
+    def acquire_async(self, server, fresh = False):
+        """ Get an asyncio connection of the running event loop to a server,
+        see acquire. A new connection is not connected yet.
+
+        Args:
+            server (str): the server domain
+            fresh (bool, optional): see acquire
+
+        Returns:
+            connection, reused: the asynchttp.Connection and whether it was
+                reused
+        """
+        if fresh:
+            self.count("misses")
+            return self.new_async_connection(server), False
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            connection, expired = self.take_idle(
+                self._async_idle.get(loop, {}).get(server,
+                    collections.deque()),
+                lambda conn: conn.connected)
+        for conn in expired:
+            conn.close()
+        if connection is None:
+            self.logger.debug("no idle asyncio connection to %s, creating a "
+                "new one", server)
+            return self.new_async_connection(server), False
+        self.logger.debug("reusing idle asyncio connection to %s", server)
+        return connection, True
+
+    def release(self, server, connection):
+        """ Put a connection back into the pool after its response has been
+        read completely. If the pool for this server is full or the connection
+        was closed, it is discarded instead.
+
+        Args:
+            server (str): the server domain
+            connection (http.client.HTTPConnection or asynchttp.Connection):
+                the connection
+        """
+        if isinstance(connection, asynchttp.Connection):
+            connected = connection.connected
+            loop = asyncio.get_running_loop()
+        else:
+            connected = connection.sock is not None
+            loop = None
+        with self._lock:
+            buckets = self._idle if loop is None \
+                else self._async_idle.setdefault(loop, {})
+            idle = buckets.setdefault(server, collections.deque())
+            if connected and len(idle) < self.maxsize:
+                idle.append((connection, time.time()))
+                return
+            self._statistics["discarded"] += 1
+        connection.close()
+
+    def discard(self, connection):
+        """ close a connection without putting it back into the pool
+
+        Args:
+            connection (http.client.HTTPConnection or asynchttp.Connection):
+                the connection
+        """
+        self.count("discarded")
+        connection.close()
+
+    def clear(self):
+        """ close all idle connections
+        """
+        with self._lock:
+            idle, self._idle = self._idle, {}
+            async_idle = list(self._async_idle.values())
+            self._async_idle = weakref.WeakKeyDictionary()
+        for buckets in [idle] + async_idle:
+            for connections in buckets.values():
+                for conn, released in connections:
+                    conn.close()
+
+    async def clear_async(self):
+        """ close the idle asyncio connections of the running event loop and
+        wait until they are closed. Await this before the event loop ends,
+        e.g. at the end of the coroutine passed to asyncio.run, afterwards the
+        connections can't be closed cleanly anymore.
+        """
+        with self._lock:
+            buckets = self._async_idle.pop(asyncio.get_running_loop(), {})
+        for connections in buckets.values():
+            for conn, released in connections:
+                await conn.aclose()
+
+    def __repr__(self):
+        """ python representation of this object
+        """
+        reprstring = ("{classname}(\n"
+              "maxsize = {maxsize},\n"
+              "idle_timeout = {idle_timeout},\n"
+              "connection_class = {connection_class},\n"
+              "timeout = {timeout},\n"
+              ")").format(
+            classname="{module}.{name}".format(
+                name=self.__class__.__name__,module=self.__class__.__module__),
+            maxsize = self.maxsize.__repr__(),
+            idle_timeout = self.idle_timeout.__repr__(),
+            connection_class = "{}.{}".format(
+                self.connection_class.__module__,
+                self.connection_class.__name__),
+            timeout = self.timeout.__repr__(),
+            )
+        return reprstring
+
+
+# the connection pool all api requests use by default
+CONNECTION_POOL = ConnectionPool()
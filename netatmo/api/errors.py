@@ -1,6 +1,9 @@
 #!/usr/bin/env python3
 # module for api errors
 
+# system modules
+import copy
+
 ##############
 ### Errors ###
 ##############
@@ -10,6 +13,21 @@ class ApiResponseError(BaseException):
 class InvalidCredentialsError(ApiResponseError):
     pass
 
+class ApiThrottlingError(ApiResponseError):
+    retry_after = None # seconds the server asked to wait, if it did
+
+class ApiServerError(ApiResponseError):
+    def __init__(self, status, retry_after = None):
+        self.status = status
+        self.retry_after = retry_after
+        super().__init__("server responded with HTTP status {}".format(status))
+
+class InvalidApiResponseError(ApiResponseError):
+    pass
+
+class RateLimitTimeoutError(BaseException):
+    pass
+
 class InvalidApiInputError(BaseException):
     pass
 
@@ -40,7 +58,52 @@ API_ERRORS = {
 "invalid_request": ApiResponseError("invalid request"),
 "invalid_grant":   ApiResponseError("invalid grant"),
 "Device not found": ApiResponseError("Device not found - Check Device ID " 
-    "and permissions")
+    "and permissions"),
+"User usage reached": ApiThrottlingError("user usage reached - too many "
+    "requests, slow down"),
 }
 
+# api error codes that are mapped regardless of the message
+API_ERROR_CODES = {
+26: ApiThrottlingError,
+}
+
+#################
+### Functions ###
+#################
+def copy_error(error):
+    """ A new exception like a given one
+
+    Raising the same exception instance again and again makes its traceback
+    grow with every raise and keeps the frames of all raises alive. Also, the
+    instance would be shared between all threads raising it.
+
+    Args:
+        error (BaseException): the exception to copy
+
+    Returns:
+        BaseException: a new exception of the same class with the same
+            arguments and attributes but without a traceback, or 'error'
+            itself if it can't be copied
+    """
+    try:
+        return copy.copy(error).with_traceback(None)
+    except Exception:
+        return error
+
+def api_error(message, code = None):
+    """ A new exception for an api error
+
+    Args:
+        message (str): the error message the api responded with
+        code (int, optional): the error code the api responded with
 
+    Returns:
+        ApiResponseError or derivate: the new exception
+    """
+    if code in API_ERROR_CODES:
+        return API_ERROR_CODES[code](message or
+            "api error code {}".format(code))
+    if message in API_ERRORS:
+        return copy_error(API_ERRORS[message])
+    return ApiResponseError(message)
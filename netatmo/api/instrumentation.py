@@ -0,0 +1,382 @@
+#!/usr/bin/env python3
+# module for timing and byte instrumentation of api requests
+# system modules
+import time
+import bisect
+import logging
+import threading
+import contextlib
+import collections
+
+# internal modules
+from .variables import *
+
+# the observers notified about the events of all requests and clients that
+# have no observers of their own
+OBSERVERS = []
+
+# the phases of an attempt in the order they happen
+PHASES = [
+    "queue",   # waiting for the rate limiter
+    "connect", # DNS lookup, TCP connect and TLS handshake of new connections
+    "send",    # sending the request
+    "wait",    # waiting for the response headers
+    "read",    # reading the response body from the socket
+    "decode",  # decompressing and decoding the response body
+    ]
+
+# get a logger
+logger = logging.getLogger(__name__)
+
+
+def notify(event, observers = None):
+    """ Notify observers about an event. Failing observers are logged and do
+    not disturb the request.
+
+    Args:
+        event (RequestEvent): the event
+        observers (list, optional): Observer objects or callables taking the
+            event. Defaults to None which means the shared OBSERVERS.
+    """
+    if observers is None:
+        observers = OBSERVERS
+    for observer in list(observers):
+        try:
+            getattr(observer, "observe", observer)(event)
+        except Exception:
+            logger.exception("observer %s failed", observer)
+
+@contextlib.contextmanager
+def observed(kind, endpoint, server = "", observers = None):
+    """ Context manager yielding a new RequestEvent which is finished with the
+    outcome and passed to the observers when the context is left
+
+    Args:
+        kind, endpoint, server: see RequestEvent
+        observers (list, optional): see notify
+    """
+    event = RequestEvent(kind = kind, endpoint = endpoint, server = server)
+    try:
+        yield event
+    except BaseException as e:
+        event.finish(error = e)
+        raise
+    else:
+        event.finish()
+    finally:
+        notify(event, observers)
+
+
+class RequestEvent(object):
+    """ The timings, byte counts and outcome of an api call or of a single
+    attempt to send a request
+
+    Args:
+        kind (str): 'attempt' for a single request sent to the server or
+            'call' for a client call including the token handling, the
+            retries and the cache
+        endpoint (str): the url of the request, e.g. '/api/getmeasure'
+        server (str, optional): the api server
+    """
+    def __init__(self, kind, endpoint, server = ""):
+        self.kind = kind
+        self.endpoint = endpoint
+        self.server = server
+        self.start = time.time()       # UNIX time of the start
+        self.phases = {}               # phase -> seconds
+        self.request_bytes = None      # request body bytes sent
+        self.response_bytes = None     # response body bytes received
+        self.decoded_bytes = None      # response body bytes after decompression
+        self.outcome = None            # 'ok', 'cached' or the error class name
+        self.duration = None           # seconds from start to finish
+        self._perf_start = time.perf_counter()
+
+    ###############
+    ### Methods ###
+    ###############
+    def add(self, phase, seconds):
+        """ add seconds to a phase
+        """
+        self.phases[phase] = self.phases.get(phase, 0) + seconds
+
+    @contextlib.contextmanager
+    def timer(self, phase, exclude = None):
+        """ Context manager adding the time spent in it to a phase
+
+        Args:
+            phase (str): the phase
+            exclude (str, optional): a phase that is timed separately inside
+                this context, its time is not added to phase
+        """
+        excluded = self.phases.get(exclude, 0)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(phase, time.perf_counter() - start -
+                (self.phases.get(exclude, 0) - excluded))
+
+    def timed(self, chunks, phase = "read"):
+        """ Add the time spent fetching chunks to a phase
+
+        Args:
+            chunks (iterable): e.g. the chunks read from a socket
+            phase (str, optional): the phase. Defaults to 'read'.
+
+        Returns:
+            generator: the chunks
+        """
+        chunks = iter(chunks)
+        while True:
+            start = time.perf_counter()
+            try:
+                chunk = next(chunks)
+            except StopIteration:
+                return
+            finally:
+                self.add(phase, time.perf_counter() - start)
+            yield chunk
+
+    def count_bytes(self, received, decoded):
+        """ count response body bytes, usable as 'count' callback of
+        jsonstream.decompressed
+        """
+        self.response_bytes = (self.response_bytes or 0) + received
+        self.decoded_bytes = (self.decoded_bytes or 0) + decoded
+
+    def finish(self, error = None, outcome = None):
+        """ set the duration and the outcome
+
+        Args:
+            error (BaseException, optional): the error the call failed with
+            outcome (str, optional): the outcome. Defaults to the name of the
+                error class or 'ok' if there is no error. An outcome set
+                before (e.g. 'cached') is kept if there is no error.
+        """
+        self.duration = time.perf_counter() - self._perf_start
+        if error is not None:
+            self.outcome = error.__class__.__name__
+        elif outcome is not None or self.outcome is None:
+            self.outcome = outcome or "ok"
+
+    def as_dict(self):
+        """ the event as dict, e.g. to log it as JSON
+        """
+        return {k: getattr(self, k) for k in ("kind", "endpoint", "server",
+            "start", "phases", "request_bytes", "response_bytes",
+            "decoded_bytes", "outcome", "duration")}
+
+    def __repr__(self):
+        """ python representation of this object
+        """
+        return "{module}.{name}(kind = {kind}, endpoint = {endpoint}, " \
+            "outcome = {outcome}, duration = {duration})".format(
+            name=self.__class__.__name__,module=self.__class__.__module__,
+            kind=repr(self.kind),endpoint=repr(self.endpoint),
+            outcome=repr(self.outcome),duration=self.duration)
+
+
+class Observer(object):
+    """ Base class for observers of RequestEvents. Plain callables taking the
+    event can be used as observers, too.
+    """
+    def observe(self, event):
+        """ called with every finished RequestEvent
+
+        Args:
+            event (RequestEvent): the event
+        """
+        pass
+
+
+class Histogram(object):
+    """ Histogram with fixed buckets
+
+    Args:
+        bounds (list of float): the inclusive upper bounds of the buckets. A
+            bucket for larger values is added.
+    """
+    def __init__(self, bounds):
+        self.bounds = sorted(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def add(self, value):
+        """ add a value
+        """
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """ The upper bound of the bucket containing the q-quantile
+
+        Args:
+            q (float): the quantile in [0;1]
+
+        Returns:
+            float or None: the bound, infinity for the overflow bucket or None
+                if there are no values
+        """
+        if not self.count:
+            return None
+        cumulative = 0
+        for bound, count in zip(self.bounds + [float("inf")], self.counts):
+            cumulative += count
+            if cumulative >= q * self.count:
+                return bound
+
+    def as_dict(self):
+        """ the histogram with cumulative bucket counts like Prometheus
+        """
+        buckets, cumulative = [], 0
+        for bound, count in zip(self.bounds + ["+Inf"], self.counts):
+            cumulative += count
+            buckets.append([bound, cumulative])
+        return {"buckets": buckets, "sum": self.sum, "count": self.count}
+
+
+class HistogramAggregator(Observer):
+    """ Observer aggregating the events in memory into histograms of the
+    durations, the phase timings and the byte counts and into counts of the
+    outcomes per kind and endpoint
+
+    Args:
+        time_buckets (list of float, optional): the bucket bounds in seconds.
+            Defaults to INSTRUMENTATION_TIME_BUCKETS.
+        byte_buckets (list of int, optional): the bucket bounds in bytes.
+            Defaults to INSTRUMENTATION_BYTE_BUCKETS.
+    """
+    def __init__(self, time_buckets = INSTRUMENTATION_TIME_BUCKETS,
+        byte_buckets = INSTRUMENTATION_BYTE_BUCKETS):
+        self.time_buckets = list(time_buckets)
+        self.byte_buckets = list(byte_buckets)
+        self._lock = threading.Lock()
+        self.reset()
+
+    ##################
+    ### Properties ###
+    ##################
+    @property
+    def histograms(self):
+        """ [read only] (metric, kind, endpoint, phase) -> Histogram.as_dict()
+        with the metrics 'duration_seconds', 'phase_seconds', 'request_bytes'
+        and 'response_bytes'. The phase is None except for 'phase_seconds'.
+        """
+        with self._lock:
+            return {key: histogram.as_dict()
+                for key, histogram in self._histograms.items()}
+
+    @property
+    def outcomes(self):
+        """ [read only] (kind, endpoint, outcome) -> number of events
+        """
+        with self._lock:
+            return dict(self._outcomes)
+
+    ###############
+    ### Methods ###
+    ###############
+    def reset(self):
+        """ forget all events
+        """
+        with self._lock:
+            self._histograms = {}
+            self._outcomes = collections.Counter()
+
+    def histogram(self, metric, kind, endpoint, phase = None):
+        """ the Histogram of a metric, created if necessary. Call with the lock.
+        """
+        key = (metric, kind, endpoint, phase)
+        try:
+            return self._histograms[key]
+        except KeyError:
+            bounds = self.byte_buckets if metric.endswith("_bytes") \
+                else self.time_buckets
+            histogram = self._histograms[key] = Histogram(bounds)
+            return histogram
+
+    def observe(self, event):
+        """ add an event to the histograms
+        """
+        kind, endpoint = event.kind, event.endpoint
+        with self._lock:
+            self._outcomes[(kind, endpoint, event.outcome)] += 1
+            if event.duration is not None:
+                self.histogram("duration_seconds", kind, endpoint).add(
+                    event.duration)
+            for phase, seconds in event.phases.items():
+                self.histogram("phase_seconds", kind, endpoint, phase).add(
+                    seconds)
+            for metric in ("request_bytes", "response_bytes"):
+                value = getattr(event, metric)
+                if value is not None:
+                    self.histogram(metric, kind, endpoint).add(value)
+
+    def export(self):
+        """ Flat records of the histograms and outcomes, e.g. to feed them
+        into a metrics system
+
+        Returns:
+            list of dict: records with the keys 'metric', 'kind', 'endpoint',
+                and 'phase' and 'buckets', 'sum' and 'count' for histograms or
+                'outcome' and 'count' for the outcome counts
+        """
+        records = []
+        for (metric, kind, endpoint, phase), histogram in \
+            sorted(self.histograms.items(), key = lambda i: str(i[0])):
+            record = {"metric": metric, "kind": kind, "endpoint": endpoint,
+                "phase": phase}
+            record.update(histogram)
+            records.append(record)
+        for (kind, endpoint, outcome), count in \
+            sorted(self.outcomes.items(), key = str):
+            records.append({"metric": "outcomes", "kind": kind,
+                "endpoint": endpoint, "outcome": outcome, "count": count})
+        return records
+
+    def prometheus(self, prefix = "netatmo_api"):
+        """ The histograms and outcomes in the Prometheus text format
+
+        Args:
+            prefix (str, optional): the metric name prefix. Defaults to
+                'netatmo_api'.
+
+        Returns:
+            str: the exposition text
+        """
+        lines, types = [], set()
+        def labels(**kwargs):
+            return ",".join('{}="{}"'.format(k, str(v).replace('"', '\\"'))
+                for k, v in sorted(kwargs.items()) if v is not None)
+        for record in self.export():
+            name = "{}_{}".format(prefix, record["metric"])
+            if record["metric"] == "outcomes":
+                name += "_total"
+                if name not in types:
+                    lines.append("# TYPE {} counter".format(name))
+                    types.add(name)
+                lines.append("{}{{{}}} {}".format(name, labels(
+                    kind = record["kind"], endpoint = record["endpoint"],
+                    outcome = record["outcome"]), record["count"]))
+                continue
+            if name not in types:
+                lines.append("# TYPE {} histogram".format(name))
+                types.add(name)
+            common = dict(kind = record["kind"], endpoint = record["endpoint"],
+                phase = record["phase"])
+            for bound, count in record["buckets"]:
+                lines.append("{}_bucket{{{}}} {}".format(name,
+                    labels(le = bound, **common), count))
+            lines.append("{}_sum{{{}}} {}".format(name, labels(**common),
+                record["sum"]))
+            lines.append("{}_count{{{}}} {}".format(name, labels(**common),
+                record["count"]))
+        return "\n".join(lines) + "\n"
+
+    def __repr__(self):
+        """ python representation of this object
+        """
+        return "{module}.{name}()".format(
+            name=self.__class__.__name__,module=self.__class__.__module__)
@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+# module for decoding JSON api responses incrementally
+# system modules
+import json
+import zlib
+import codecs
+import functools
+
+# bytes read from the socket at once
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# the decoder for the single values
+DECODER = json.JSONDecoder()
+
+WHITESPACE = " \t\n\r"
+NUMBER_CHARACTERS = "0123456789+-.eE"
+
+# zlib window bits for the supported HTTP content encodings
+CONTENT_ENCODING_WBITS = {
+    "gzip":    16 + zlib.MAX_WBITS,
+    "x-gzip":  16 + zlib.MAX_WBITS,
+    "deflate": zlib.MAX_WBITS,
+    }
+
+
+def chunks_of(data, size = STREAM_CHUNK_SIZE):
+    """ split bytes into chunks without copying them
+
+    Args:
+        data (bytes): the data
+        size (int, optional): the chunk size. Defaults to STREAM_CHUNK_SIZE.
+
+    Returns:
+        generator of memoryview: the chunks
+    """
+    view = memoryview(data)
+    return (view[i:i+size] for i in range(0, len(view), size))
+
+def chunks_from(readable, size = STREAM_CHUNK_SIZE):
+    """ read chunks from a file-like object until it is exhausted
+
+    Args:
+        readable: object with a read(size) method, e.g. a
+            http.client.HTTPResponse
+        size (int, optional): the chunk size. Defaults to STREAM_CHUNK_SIZE.
+
+    Returns:
+        iterator of bytes: the chunks
+    """
+    return iter(functools.partial(readable.read, size), b"")
+
+def decompressed(chunks, encoding = None, count = None):
+    """ decompress chunks of a HTTP body on the fly. Each decompressed chunk
+    is at most STREAM_CHUNK_SIZE bytes, so highly compressed data does not
+    expand all at once.
+
+    Args:
+        chunks (iterable of bytes): the body as received
+        encoding (str, optional): the Content-Encoding of the body. 'gzip' and
+            'deflate' (with or without zlib header) are supported. Defaults
+            to None which means no compression.
+        count (callable, optional): called with the number of bytes received
+            and decoded for every chunk, e.g. for statistics
+
+    Returns:
+        generator of bytes: the decompressed chunks
+    """
+    encoding = (encoding or "identity").strip().lower()
+    if encoding == "identity":
+        for chunk in chunks:
+            if count: count(len(chunk), len(chunk))
+            yield chunk
+        return
+    try: wbits = CONTENT_ENCODING_WBITS[encoding]
+    except KeyError:
+        raise ValueError("unsupported content encoding '{}'".format(encoding))
+    decompressor = zlib.decompressobj(wbits)
+    first = True
+    for chunk in chunks:
+        data, received = chunk, len(chunk)
+        while data:
+            try:
+                output = decompressor.decompress(data, STREAM_CHUNK_SIZE)
+            except zlib.error:
+                if not (first and encoding == "deflate"):
+                    raise ValueError("invalid {} data".format(encoding))
+                # some servers send deflate data without zlib header
+                decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+                output = decompressor.decompress(data, STREAM_CHUNK_SIZE)
+            first = False
+            data = decompressor.unconsumed_tail
+            if count: count(received, len(output))
+            received = 0
+            if output:
+                yield output
+    output = decompressor.flush()
+    if count and output: count(0, len(output))
+    if output:
+        yield output
+
+
+class JSONObjectStream(object):
+    """ Incremental decoder for a JSON object read in chunks of UTF-8 bytes.
+    Only a small window of the text is decoded at a time, so neither the
+    whole bytes nor the whole str have to be in memory. If the value of the
+    'stream_key' member is a list, its items can be iterated one by one with
+    items() without collecting them.
+
+    Args:
+        chunks (iterable of bytes): the JSON document in chunks
+        stream_key (str, optional): the member whose list items are streamed.
+            Defaults to 'body'.
+    """
+    def __init__(self, chunks, stream_key = "body"):
+        self.stream_key = stream_key
+        self._chunks = iter(chunks)
+        self._decoder = codecs.getincrementaldecoder("UTF-8")()
+        self._buffer = ""
+        self._pos = 0
+        self._eof = False
+        self._started = False
+        self._streamed = False
+        self._members = {}
+
+    ##################
+    ### Properties ###
+    ##################
+    @property
+    def members(self):
+        """ [read only] dict of the decoded members except for the streamed
+        items. Complete once items() is exhausted.
+        """
+        return self._members
+
+    @property
+    def streamed(self):
+        """ [read only] whether the 'stream_key' member was a streamed list
+        """
+        return self._streamed
+
+    ###############
+    ### Methods ###
+    ###############
+    def fill(self):
+        """ append the next chunk to the buffer
+
+        Returns:
+            bool: False if there was nothing left to read, True otherwise
+        """
+        if self._eof:
+            return False
+        if self._pos: # drop the consumed text
+            self._buffer = self._buffer[self._pos:]
+            self._pos = 0
+        for chunk in self._chunks:
+            text = self._decoder.decode(chunk)
+            if text:
+                self._buffer += text
+                return True
+        self._buffer += self._decoder.decode(b"", final = True)
+        self._eof = True
+        return True
+
+    def fill_more(self):
+        """ at least double the unconsumed text in the buffer (so that
+        retrying to decode a long value takes linear time)
+
+        Returns:
+            bool: False if there was nothing left to read, True otherwise
+        """
+        target = 2 * (len(self._buffer) - self._pos) + 1
+        grown = False
+        while len(self._buffer) - self._pos < target and self.fill():
+            grown = True
+        return grown
+
+    def peek(self):
+        """ skip whitespace and return the next character
+
+        Returns:
+            str: the next character or '' at the end
+        """
+        while True:
+            while self._pos < len(self._buffer) and \
+                self._buffer[self._pos] in WHITESPACE:
+                self._pos += 1
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self.fill():
+                return ""
+
+    def expect(self, characters):
+        """ consume one of the given characters
+
+        Returns:
+            str: the consumed character
+
+        Raises:
+            ValueError if another character follows
+        """
+        c = self.peek()
+        if not c or c not in characters:
+            raise ValueError("expected one of {} at position {} of the "
+                "current JSON window but got {}".format(
+                repr(characters), self._pos, repr(c)))
+        self._pos += 1
+        return c
+
+    def value(self):
+        """ decode the next complete JSON value
+
+        Returns:
+            the decoded value
+        """
+        self.peek()
+        while True:
+            try:
+                value, end = DECODER.raw_decode(self._buffer, self._pos)
+            except ValueError:
+                if self.fill_more(): # value incomplete, read more
+                    continue
+                raise
+            if not self._eof and isinstance(value, (int, float)) \
+                and len(self._buffer) - end < 3 \
+                and not self._buffer[end:].strip(NUMBER_CHARACTERS):
+                # a number might continue in the next chunk
+                self.fill_more()
+                continue
+            self._pos = end
+            return value
+
+    def items(self):
+        """ Decode the object, yielding the items of the 'stream_key' list
+        one by one. The other members are collected in the members property.
+
+        Returns:
+            generator: the items of the 'stream_key' list
+        """
+        assert not self._started, "the JSON object can only be decoded once"
+        self._started = True
+        self.expect("{")
+        if self.peek() == "}": # empty object
+            self._pos += 1
+        else:
+            while True:
+                key = self.value()
+                if not isinstance(key, str):
+                    raise ValueError("JSON object key is no string")
+                self.expect(":")
+                if key == self.stream_key and self.peek() == "[":
+                    self._streamed = True
+                    self._pos += 1
+                    if self.peek() == "]": # empty list
+                        self._pos += 1
+                    else:
+                        while True:
+                            yield self.value()
+                            if self.expect(",]") == "]":
+                                break
+                else:
+                    self._members[key] = self.value()
+                if self.expect(",}") == "}":
+                    break
+        if self.peek():
+            raise ValueError("extra data after JSON object")
+
+    def load(self):
+        """ Decode the whole object including the 'stream_key' items
+
+        Returns:
+            dict: the decoded object
+        """
+        items = list(self.items())
+        if self.streamed:
+            self._members[self.stream_key] = items
+        return self._members
+
+
+def loads(chunks):
+    """ Decode a JSON object from chunks of UTF-8 bytes without joining them
+
+    Args:
+        chunks (iterable of bytes): the JSON document in chunks
+
+    Returns:
+        dict: the decoded object
+    """
+    return JSONObjectStream(chunks).load()
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+# module for polling regions for new public measurements
+# system modules
+import time
+import array
+import logging
+
+# internal modules
+from . import responsetypes
+from .variables import *
+from .errors import *
+
+
+def module_timestamp(measure):
+    """ The time of the latest measurement of a Getpublicdata module
+
+    Args:
+        measure (dict): the module's entry in the station's 'measures'
+
+    Returns:
+        int or None: the UNIX timestamp or None if it is unknown
+    """
+    res = measure.get("res")
+    if isinstance(res, dict) and len(res) == 1: # thermometer, hygrometer, ...
+        try: return int(next(iter(res)))
+        except ValueError: return None
+    # rain gauge and anemometer report the time separately
+    times = [v for k,v in measure.items() if k.endswith("timeutc")]
+    try: return int(max(times)) if times else None
+    except (TypeError, ValueError): return None
+
+
+class GetpublicdataPoller(object):
+    """ Poll a region with Getpublicdata and emit only the measurements that
+    are new since the last poll. The time of the latest measurement of each
+    station's module and the time it was last seen are remembered in two
+    arrays, indexed by a dict mapping 'station id/module id' to the row.
+    Modules not seen for forget_after seconds are forgotten, so the memory
+    stays flat when stations come and go.
+
+    Args:
+        client (NetatmoClient): the client to issue the requests with
+        region (dict): the region, see NetatmoClient.Getpublicdata
+        required_data, filter: see NetatmoClient.Getpublicdata
+        scan (bool, optional): use NetatmoClient.GetpublicdataScan to cover
+            dense regions completely. Defaults to False.
+        forget_after (float, optional): seconds after which modules that were
+            not seen anymore are forgotten. Defaults to
+            GETPUBLICDATA_POLL_FORGET_AFTER.
+    """
+    def __init__(self, client, region, required_data = None, filter = False,
+        scan = False, forget_after = GETPUBLICDATA_POLL_FORGET_AFTER):
+        self.client = client
+        self.region = region
+        self.required_data = required_data
+        self.filter = filter
+        self.scan = scan
+        self.forget_after = forget_after
+        self.reset()
+
+    ##################
+    ### Properties ###
+    ##################
+    @property
+    def logger(self):
+        """ the logging.Logger used for logging.
+        Defaults to logging.getLogger(__name__).
+        """
+        try: # try to return the internal property
+            return self._logger
+        except AttributeError: # didn't work
+            return logging.getLogger(__name__) # return default logger
+
+    @logger.setter
+    def logger(self, logger):
+        assert isinstance(logger, logging.Logger), \
+            "logger property has to be a logging.Logger"
+        self._logger = logger
+
+    @property
+    def tracked(self):
+        """ [read only] number of station modules remembered
+        """
+        return len(self._rows)
+
+    ###############
+    ### Methods ###
+    ###############
+    def reset(self):
+        """ Forget everything, so the next poll emits all measurements
+        """
+        self._rows = {}                        # 'station/module' -> row
+        self._timestamps = array.array("q")    # time of latest measurement
+        self._seen = array.array("d")          # time last seen
+
+    def changes(self, stations, now = None):
+        """ Filter stations for new measurements and remember them. All
+        stations are processed before returning, so the remembered times are
+        consistent however much of the returned iterator is consumed.
+
+        Args:
+            stations (iterable of dict): the 'body' part of a Getpublicdata
+                response
+            now (float, optional): the current time. Defaults to time.time().
+
+        Returns:
+            iterator of dict: the stations with new measurements, with only
+                the modules with new measurements in their 'measures'
+        """
+        now = time.time() if now is None else now
+        rows, timestamps, seen = self._rows, self._timestamps, self._seen
+        changed = []
+        for station in stations:
+            station_id = station.get("_id")
+            measures = {}
+            for module_id, measure in station.get("measures",{}).items():
+                timestamp = module_timestamp(measure)
+                if timestamp is None: # don't know whether it is new
+                    continue
+                key = "{}/{}".format(station_id, module_id)
+                row = rows.get(key)
+                if row is None:
+                    rows[key] = len(timestamps)
+                    timestamps.append(timestamp)
+                    seen.append(now)
+                    measures[module_id] = measure
+                    continue
+                # an older response does not make older measurements new
+                if timestamp > timestamps[row]:
+                    timestamps[row] = timestamp
+                    measures[module_id] = measure
+                seen[row] = now
+            if measures:
+                station = station.copy()
+                station["measures"] = measures
+                changed.append(station)
+        self.forget(now)
+        return iter(changed)
+
+    def forget(self, now = None):
+        """ Forget the modules not seen for forget_after seconds
+
+        Args:
+            now (float, optional): the current time. Defaults to time.time().
+        """
+        now = time.time() if now is None else now
+        limit = now - self.forget_after
+        seen = self._seen
+        if not seen or min(seen) >= limit:
+            return
+        # compact the arrays and renumber the rows
+        rows, timestamps = {}, array.array("q")
+        kept = array.array("d")
+        for key, row in self._rows.items():
+            if seen[row] >= limit:
+                rows[key] = len(timestamps)
+                timestamps.append(self._timestamps[row])
+                kept.append(seen[row])
+        forgotten = len(self._rows) - len(rows)
+        self._rows, self._timestamps, self._seen = rows, timestamps, kept
+        self.logger.debug("forgot %d modules not seen for %s seconds",
+            forgotten, self.forget_after)
+
+    def fetch(self):
+        """ Request the stations in the region
+
+        Returns:
+            list of dict: the 'body' part of the Getpublicdata response
+        """
+        method = self.client.GetpublicdataScan if self.scan \
+            else self.client.Getpublicdata
+        apiresponse = method(region = self.region,
+            required_data = self.required_data, filter = self.filter)
+        stations = apiresponse.response.get("body")
+        if not isinstance(stations, list):
+            raise ApiResponseError("'body' part of response does not "
+                "exist or is no list.")
+        return stations
+
+    def poll_stations(self):
+        """ Poll the region once
+
+        Returns:
+            iterator of dict: the stations with new measurements, see changes
+        """
+        return self.changes(self.fetch())
+
+    def poll(self):
+        """ Poll the region once
+
+        Returns:
+            pandas.DataFrame: the new measurements in the format of
+                GetpublicdataResponse.dataframe, one row per station with new
+                measurements. Columns of modules without new measurements
+                are NaN. Stations with only new rain or wind measurements are
+                left out, these are not part of the DataFrame.
+        """
+        df = responsetypes.stations_to_dataframe(self.poll_stations())
+        times = [c for c in df.columns if c.startswith("time_")]
+        return df.dropna(how = "all", subset = times).reset_index(drop = True)\
+            if times else df.iloc[0:0]
+
+    def run(self, interval = GETPUBLICDATA_POLL_INTERVAL, count = None):
+        """ Poll the region regularly
+
+        Args:
+            interval (float, optional): seconds from the start of one poll to
+                the start of the next. Defaults to GETPUBLICDATA_POLL_INTERVAL.
+            count (int, optional): the number of polls. Defaults to None which
+                means forever.
+
+        Returns:
+            generator of pandas.DataFrame: the new measurements of every poll,
+                see poll
+        """
+        n = 0
+        while count is None or n < count:
+            start = time.monotonic()
+            yield self.poll()
+            n += 1
+            if count is None or n < count:
+                time.sleep(max(0, start + interval - time.monotonic()))
+
+    def __repr__(self):
+        """ python representation of this object
+        """
+        return ("{module}.{name}(region = {region}, required_data = "
+            "{required_data}, filter = {filter}, scan = {scan}, "
+            "forget_after = {forget_after})").format(
+            name=self.__class__.__name__,module=self.__class__.__module__,
+            region=self.region, required_data=repr(self.required_data),
+            filter=self.filter, scan=self.scan, forget_after=self.forget_after)
@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+# module for client-side rate limiting of api requests
+# system modules
+import json
+import time
+import heapq
+import asyncio
+import logging
+import itertools
+import threading
+try: # POSIX only
+    import fcntl
+except ImportError: # pragma: no cover
+    fcntl = None
+
+# internal modules
+from .variables import *
+from .errors import *
+
+# request priorities, lower values go first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_NORMAL = 10
+PRIORITY_BACKFILL = 20
+
+# the rate limiter requests use by default, None means no limit
+RATE_LIMITER = None
+
+EMPTY_RATE_LIMITER_STATISTICS = {
+    "acquired":0,  # requests that were let through
+    "waited":0,    # requests that had to wait
+    "wait_time":0, # total seconds waited
+    "timeouts":0,  # requests that gave up waiting
+    }
+
+
+def wake(future):
+    """ resolve a future if it is not done yet
+    """
+    if not future.done():
+        future.set_result(None)
+
+
+class RateLimiter(object):
+    """ Thread-safe token bucket rate limiter with one bucket per budget.
+    A request may pass if every bucket has a token left. Waiting requests are
+    let through in the order of their priority (lower first), requests with
+    equal priority in the order of arrival.
+
+    Args:
+        budgets (dict, optional): window seconds -> requests allowed in that
+            window. Defaults to RATE_LIMIT_BUDGETS.
+    """
+    def __init__(self, budgets = None):
+        self.budgets = RATE_LIMIT_BUDGETS if budgets is None else budgets
+        self._condition = threading.Condition()
+        self._waiters = [] # heap of (priority, arrival)
+        self._wakeups = {} # (priority, arrival) -> (loop, future) of coroutines
+        self._arrivals = itertools.count()
+        self._buckets = {} # window -> [tokens, time of last refill]
+        self.reset_statistics()
+
+    ##################
+    ### Properties ###
+    ##################
+    @property
+    def logger(self):
+        """ the logging.Logger used for logging.
+        Defaults to logging.getLogger(__name__).
+        """
+        try: # try to return the internal property
+            return self._logger
+        except AttributeError: # didn't work
+            return logging.getLogger(__name__) # return default logger
+
+    @logger.setter
+    def logger(self, logger):
+        assert isinstance(logger, logging.Logger), \
+            "logger property has to be a logging.Logger"
+        self._logger = logger
+
+    @property
+    def budgets(self):
+        """ dict: window seconds -> requests allowed in that window
+        """
+        return self._budgets
+
+    @budgets.setter
+    def budgets(self, value):
+        assert isinstance(value, dict) and all(
+            float(w) > 0 and int(n) > 0 for w, n in value.items()), \
+            "budgets has to be a dict of positive window -> positive requests"
+        self._budgets = {float(w):int(n) for w, n in value.items()}
+
+    @property
+    def statistics(self):
+        """ [read only] copy of the statistics
+        """
+        with self._condition:
+            return self._statistics.copy()
+
+    @property
+    def waiting(self):
+        """ [read only] number of requests waiting
+        """
+        with self._condition:
+            return len(self._waiters)
+
+    ###############
+    ### Methods ###
+    ###############
+    def reset_statistics(self):
+        """ reset all statistics counters to 0
+        """
+        with self._condition:
+            self._statistics = EMPTY_RATE_LIMITER_STATISTICS.copy()
+
+    def refill(self, buckets, now):
+        """ refill token buckets and take a token from each if possible
+
+        Args:
+            buckets (dict): window -> [tokens, time of last refill]. Missing
+                buckets are created full. Modified in place.
+            now (float): the current time
+
+        Returns:
+            float: 0 if a token was taken, otherwise the seconds until every
+                bucket has a token again
+        """
+        wait = 0
+        for window, budget in self.budgets.items():
+            tokens, last = buckets.setdefault(window, [budget, now])
+            tokens = min(budget, tokens + (now - last) * budget / window)
+            buckets[window] = [tokens, now]
+            if tokens < 1:
+                wait = max(wait, (1 - tokens) * window / budget)
+        for window in [w for w in buckets if w not in self.budgets]:
+            del buckets[window] # stale bucket of a former budget
+        if wait == 0: # all buckets have a token
+            for bucket in buckets.values():
+                bucket[0] -= 1
+        return wait
+
+    def take(self):
+        """ take a token from each bucket if possible. Subclasses may keep the
+        buckets elsewhere.
+
+        Returns:
+            float: 0 if a token was taken, otherwise the seconds until every
+                bucket has a token again
+        """
+        return self.refill(self._buckets, time.monotonic())
+
+    def notify_waiters(self):
+        """ wake up the waiting threads and the waiting coroutine whose turn it
+        is. Call this holding the condition.
+        """
+        self._condition.notify_all()
+        if self._waiters:
+            wakeup = self._wakeups.get(self._waiters[0])
+            if wakeup is not None:
+                loop, future = wakeup
+                try:
+                    loop.call_soon_threadsafe(wake, future)
+                except RuntimeError: # the loop is closed
+                    pass
+
+    def leave(self, entry, start):
+        """ remove a waiter from the queue, let the next one in and count it.
+        Call this holding the condition.
+
+        Args:
+            entry (tuple): the waiter's (priority, arrival)
+            start (float): the time.monotonic() the waiter arrived or None if
+                it did not acquire
+        """
+        self._waiters.remove(entry)
+        heapq.heapify(self._waiters)
+        self.notify_waiters()
+        if start is not None:
+            waited = time.monotonic() - start
+            self._statistics["acquired"] += 1
+            if waited > 0.001:
+                self._statistics["waited"] += 1
+                self._statistics["wait_time"] += waited
+
+    def remaining(self, start, timeout):
+        """ the seconds left until the timeout
+
+        Raises:
+            RateLimitTimeoutError if the timeout passed
+        """
+        if timeout is None:
+            return None
+        remaining = start + timeout - time.monotonic()
+        if remaining <= 0:
+            self._statistics["timeouts"] += 1
+            raise RateLimitTimeoutError("waited more than {} "
+                "seconds for the rate limit".format(timeout))
+        return remaining
+
+    def acquire(self, priority = PRIORITY_NORMAL, timeout = None):
+        """ Wait until a request may be issued
+
+        Args:
+            priority (int, optional): the request priority, lower goes first.
+                Defaults to PRIORITY_NORMAL.
+            timeout (float, optional): maximum seconds to wait. Defaults to
+                None which means no limit.
+
+        Raises:
+            RateLimitTimeoutError if the timeout passed
+        """
+        start = time.monotonic()
+        entry = (priority, next(self._arrivals))
+        with self._condition:
+            heapq.heappush(self._waiters, entry)
+            acquired = None
+            try:
+                while True:
+                    wait = None # wait until the next waiter is done
+                    if self._waiters[0] == entry: # my turn
+                        wait = self.take()
+                        if wait == 0:
+                            acquired = start
+                            break
+                    remaining = self.remaining(start, timeout)
+                    if remaining is not None:
+                        wait = remaining if wait is None \
+                            else min(wait, remaining)
+                    self._condition.wait(wait)
+            finally:
+                self.leave(entry, acquired)
+
+    async def acquire_async(self, priority = PRIORITY_NORMAL, timeout = None):
+        """ Awaitable version of acquire. Threads and coroutines share the same
+        queue. A waiting coroutine waits for a future which is resolved when
+        it is its turn or, with loop.call_later, when the buckets have a token
+        again. A cancelled coroutine leaves the queue without a token.
+        """
+        loop = asyncio.get_running_loop()
+        start = time.monotonic()
+        entry = (priority, next(self._arrivals))
+        with self._condition:
+            heapq.heappush(self._waiters, entry)
+        acquired = None
+        try:
+            while True:
+                with self._condition:
+                    wait = None # wait until the next waiter is done
+                    if self._waiters[0] == entry: # my turn
+                        wait = self.take()
+                        if wait == 0:
+                            acquired = start
+                            break
+                    remaining = self.remaining(start, timeout)
+                    if remaining is not None:
+                        wait = remaining if wait is None \
+                            else min(wait, remaining)
+                    future = loop.create_future()
+                    self._wakeups[entry] = (loop, future)
+                timer = None if wait is None \
+                    else loop.call_later(wait, wake, future)
+                try:
+                    await future
+                finally:
+                    if timer is not None:
+                        timer.cancel()
+                    with self._condition:
+                        del self._wakeups[entry]
+        finally:
+            with self._condition:
+                self.leave(entry, acquired)
+
+    def __repr__(self):
+        """ python representation of this object
+        """
+        return "{module}.{name}(budgets = {budgets})".format(
+            name=self.__class__.__name__,module=self.__class__.__module__,
+            budgets=self.budgets)
+
+
+class FileRateLimiter(RateLimiter):
+    """ Rate limiter whose token buckets are kept in a file so that all
+    processes using the same file share the budgets. The file is locked with
+    fcntl while the buckets are updated. Where fcntl is not available, the
+    budgets are only shared within the current process. The priority queue
+    orders the requests within each process.
+
+    Args:
+        filename (str): the file for the token buckets
+        budgets (dict, optional): see RateLimiter
+    """
+    def __init__(self, filename, budgets = None):
+        super().__init__(budgets = budgets)
+        self.filename = filename
+
+    @property
+    def filename(self):
+        """ the file for the token buckets
+        """
+        return self._filename
+
+    @filename.setter
+    def filename(self, value):
+        assert isinstance(value, str), "filename has to be a str"
+        self._filename = value
+
+    def take(self):
+        with open(self.filename, "a+") as f:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                f.seek(0)
+                try:
+                    buckets = {float(w):b for w,b in json.load(f).items()}
+                except (ValueError, AttributeError): # new or broken file
+                    buckets = {}
+                wait = self.refill(buckets, time.time())
+                f.seek(0)
+                f.truncate()
+                json.dump(buckets, f)
+                f.flush()
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+        return wait
+
+    def __repr__(self):
+        """ python representation of this object
+        """
+        return "{module}.{name}(filename = {filename}, budgets = {budgets})"\
+            .format(name=self.__class__.__name__,
+            module=self.__class__.__module__,
+            filename=json.dumps(self.filename), budgets=self.budgets)
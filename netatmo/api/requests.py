@@ -1,21 +1,127 @@
 #!/usr/bin/env python3
 # system modules
+import time
 import logging
 import http.client
+import email.utils
 import urllib
 import json
+import warnings
+import functools
 import contextlib
 
 # internal modules
 from .. import utils
 from . import responsetypes
+from . import connectionpool
+from . import asynchttp
+from . import jsonstream
+from . import ratelimit
+from . import retry
+from . import instrumentation
 from .variables import *
 from .errors import *
 
 
+def retry_after_seconds(value):
+    """ Parse the value of a Retry-After header
+
+    Args:
+        value (str or None): the header value, seconds or an HTTP date
+
+    Returns:
+        float or None: the seconds to wait or None if the value is missing
+            or invalid
+    """
+    if value is None:
+        return None
+    try:
+        return max(0, float(value))
+    except ValueError:
+        pass
+    try:
+        date = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0, date.timestamp() - time.time())
+
+def status_error(status, retry_after = None):
+    """ The error for an HTTP status whose response is not the api's answer
+
+    Args:
+        status (int): the HTTP status code
+        retry_after (str, optional): the value of the Retry-After header
+
+    Returns:
+        ApiResponseError derivate or None: ApiThrottlingError for 429,
+            ApiServerError for 5xx, None otherwise. Their retry_after is the
+            seconds the server asked to wait.
+    """
+    if status == 429:
+        error = ApiThrottlingError("server responded with HTTP status 429 - "
+            "too many requests, slow down")
+        error.retry_after = retry_after_seconds(retry_after)
+        return error
+    if status >= 500:
+        return ApiServerError(status,
+            retry_after = retry_after_seconds(retry_after))
+    return None
+
+def decode(chunks, consume = None):
+    """ Decode a JSON response body
+
+    Args:
+        chunks (iterable of bytes): the decompressed body
+        consume (callable, optional): called with a JSONObjectStream of the
+            chunks to decode them incrementally, its result is returned.
+            Defaults to None which means joining the chunks and decoding them
+            with json.loads, which is faster.
+
+    Returns:
+        dict: the decoded JSON or the result of consume
+    """
+    if consume is None:
+        return json.loads(b"".join(chunks))
+    return consume(jsonstream.JSONObjectStream(chunks))
+
+def warn_deprecated(name, stacklevel = 3):
+    """ Warn that a part of ApiRequest's former connection handling is used
+
+    Args:
+        name (str): the deprecated attribute or method
+        stacklevel (int, optional): see warnings.warn. Defaults to 3, the
+            caller of the deprecated attribute or method.
+    """
+    warnings.warn("ApiRequest.{} is deprecated, requests acquire their "
+        "connections from their connection_pool".format(name),
+        DeprecationWarning, stacklevel = stacklevel)
+
+def throttling_error(response):
+    """ The error for a throttling api response
+
+    Args:
+        response (dict): the api response
+
+    Returns:
+        ApiThrottlingError or None: the error if the response says that the
+            request budget is used up, None otherwise
+    """
+    error = (response or {}).get("error")
+    if isinstance(error, dict) and error.get("code") in API_ERROR_CODES:
+        return api_error(error.get("message"), error["code"])
+    return None
+
+
 class ApiRequest(object):
-    """ Class for api requests
+    """ Class for api requests. The attributes are slotted, so keeping many
+    requests is cheap. Derivates have to define __slots__, too.
     """
+    # the settings with shared module-wide defaults (connection_pool,
+    # rate_limiter, retry_policy) and the response stay unset until needed
+    __slots__ = ("_logger", "_connection_pool", "_rate_limiter", "_priority",
+        "_retry_policy", "_observers", "_server", "_url", "_payload",
+        "_compression", "_stream_body", "_response", "_api_connection")
+
     def __init__(self, server, url, payload = {}):
         """ class constructor
         Args:
@@ -23,6 +129,11 @@ class ApiRequest(object):
             url (str): the url relative to the server
             payload [Optional(dict)]: the payload
         """
+        self._logger = None
+        self._priority = ratelimit.PRIORITY_NORMAL
+        self._observers = None
+        self._compression = True
+        self._stream_body = False
         self.server = server
         self.url = url
         self.payload = payload
@@ -35,10 +146,7 @@ class ApiRequest(object):
         """ the logging.Logger used for logging.
         Defaults to logging.getLogger(__name__).
         """
-        try: # try to return the internal property
-            return self._logger 
-        except AttributeError: # didn't work
-            return logging.getLogger(__name__) # return default logger
+        return self._logger or logging.getLogger(__name__)
     
     @logger.setter
     def logger(self, logger):
@@ -47,37 +155,84 @@ class ApiRequest(object):
         self._logger = logger
     
     @property
-    def api_connection(self):
-        """ The http.client.HTTPSConnection used for server communication.
-        You may set this, otherwise a new instance is created automatically on
-        first use.
+    def connection_pool(self):
+        """ The ConnectionPool the connections for server communication are
+        drawn from. Defaults to the shared connectionpool.CONNECTION_POOL.
         """
         try: # try to return the internal attribute
-            return self._api_connection
+            return self._connection_pool
         except AttributeError: # didn't work
-            # set it to new instance
-            self._api_connection = http.client.HTTPSConnection(
-                NETATMO_API_SERVER)
-        # return internal attribute
-        return self._api_connection
+            return connectionpool.CONNECTION_POOL # return shared pool
 
-    @api_connection.setter
-    def api_connection(self, newconn):
-        if not isinstance(newconn, http.client.HTTPSConnection):
-            self.logger.debug("authentication property needs to be of " 
-                "class HTTPSConnection. Using empty instance instead " 
-                "of {}.".format(newauth))
-            self._api_connection = http.client.HTTPSConnection(
-                NETATMO_API_SERVER)
-        else:
-            self._api_connection = newconn
+    @connection_pool.setter
+    def connection_pool(self, newpool):
+        assert isinstance(newpool, connectionpool.ConnectionPool), \
+            "connection_pool property has to be a ConnectionPool"
+        self._connection_pool = newpool
+
+    @property
+    def rate_limiter(self):
+        """ The RateLimiter this request waits for before it is sent or None
+        for no limit. Defaults to the shared ratelimit.RATE_LIMITER.
+        """
+        try: # try to return the internal attribute
+            return self._rate_limiter
+        except AttributeError: # didn't work
+            return ratelimit.RATE_LIMITER # return shared limiter
+
+    @rate_limiter.setter
+    def rate_limiter(self, newlimiter):
+        assert newlimiter is None or \
+            isinstance(newlimiter, ratelimit.RateLimiter), \
+            "rate_limiter property has to be None or a RateLimiter"
+        self._rate_limiter = newlimiter
+
+    @property
+    def priority(self):
+        """ The priority of this request at the rate_limiter, lower values go
+        first. Defaults to ratelimit.PRIORITY_NORMAL.
+        """
+        return self._priority
+
+    @priority.setter
+    def priority(self, value):
+        self._priority = int(value)
+
+    @property
+    def retry_policy(self):
+        """ The RetryPolicy for transient failures or None for no retries.
+        Defaults to the shared retry.RETRY_POLICY.
+        """
+        try: # try to return the internal attribute
+            return self._retry_policy
+        except AttributeError: # didn't work
+            return retry.RETRY_POLICY # return shared policy
+
+    @retry_policy.setter
+    def retry_policy(self, newpolicy):
+        assert newpolicy is None or isinstance(newpolicy, retry.RetryPolicy), \
+            "retry_policy property has to be None or a RetryPolicy"
+        self._retry_policy = newpolicy
+
+    @property
+    def observers(self):
+        """ The observers notified with an instrumentation.RequestEvent about
+        every attempt to send this request or None for the shared
+        instrumentation.OBSERVERS. Defaults to None.
+        """
+        return self._observers
+
+    @observers.setter
+    def observers(self, newobservers):
+        assert newobservers is None or isinstance(newobservers, list), \
+            "observers property has to be None or a list"
+        self._observers = newobservers
 
     @property
     def server(self):
         """ the api server domain
         """
-        try: return self._server
-        except AttributeError: return ""
+        return self._server
 
     @server.setter
     def server(self, newserver):
@@ -87,8 +242,7 @@ class ApiRequest(object):
     def url(self):
         """ the url relative to the server for this api request
         """
-        try: return self._url
-        except AttributeError: return ""
+        return self._url
 
     @url.setter
     def url(self, newurl):
@@ -98,8 +252,7 @@ class ApiRequest(object):
     def payload(self):
         """ the payload to send to the api
         """
-        try: return self._payload
-        except AttributeError: return {}
+        return self._payload
         
     @payload.setter
     def payload(self, newpayload):
@@ -111,6 +264,48 @@ class ApiRequest(object):
             raise InvalidPayloadError("payload has to be a simple dict")
         self._payload = newpayload
 
+    @property
+    def compression(self):
+        """ Whether to ask the server for a gzip or deflate compressed response.
+        The response is decompressed while it is read. Defaults to True.
+        """
+        return self._compression
+
+    @compression.setter
+    def compression(self, value):
+        self._compression = bool(value)
+
+    @property
+    def headers(self):
+        """ [read only] the HTTP headers to send with this request
+        """
+        headers = PLAIN_URLENCODED_HEADERS.copy()
+        if self.compression:
+            headers.update(COMPRESSED_RESPONSE_HEADERS)
+        return headers
+
+    @property
+    def stream_body(self):
+        """ Whether the items of the response's 'body' list are streamed into
+        the DataFrame conversion while the response is read, instead of being
+        kept in the response. Only supported by response classes that can
+        convert a stream, e.g. GetpublicdataResponse. Defaults to False.
+        """
+        return self._stream_body
+
+    @stream_body.setter
+    def stream_body(self, value):
+        self._stream_body = bool(value)
+
+    @property
+    def resendable(self):
+        """ [read only] Whether this request may be sent again. If True, a
+        request that failed on a reused keep-alive connection before any
+        response bytes arrived is repeated on a new connection and transient
+        failures are retried according to the retry_policy.
+        """
+        return True
+
     @property
     def payload_urlencoded(self):
         """ [read only] return the urlencoded payload (UTF-8)
@@ -138,75 +333,334 @@ class ApiRequest(object):
                 "ApiResponse or derivates.")
         self._response = newresponse
 
+    @property
+    def api_connection(self):
+        """ [deprecated] A connection to the server acquired from the
+        connection_pool on first use. The requests don't use it, they acquire
+        their connections from the pool themselves.
+        """
+        warn_deprecated("api_connection")
+        return self.acquire_api_connection()
+
+    @api_connection.setter
+    def api_connection(self, newconn):
+        warn_deprecated("api_connection")
+        self._api_connection = newconn
+
     ########################
     ### context managers ###
     ########################
     @contextlib.contextmanager
     def connection_to_api(self):
-        self.connect_to_api()
+        """ [deprecated] Connect api_connection and close it afterwards
+        """
+        warn_deprecated("connection_to_api")
+        self.acquire_api_connection().connect()
         try:
             yield
         finally:
-            self.close_api_connection()
+            self.release_api_connection()
 
     ###############
     ### methods ###
     ###############
+    def acquire_api_connection(self):
+        """ Acquire the connection of the deprecated api_connection from the
+        connection_pool if there is none yet
+
+        Returns:
+            http.client.HTTPConnection: the connection
+        """
+        try:
+            return self._api_connection
+        except AttributeError:
+            self._api_connection, reused = \
+                self.connection_pool.acquire(self.server)
+        return self._api_connection
+
+    def release_api_connection(self):
+        """ Close the connection of the deprecated api_connection through the
+        connection_pool and forget it
+        """
+        try:
+            connection = self._api_connection
+        except AttributeError:
+            return
+        del self._api_connection
+        self.connection_pool.discard(connection)
+
     def connect_to_api(self):
-        """ Connect to the api server 
+        """ [deprecated] Connect api_connection to the api server
         """
-        self.logger.debug("connecting to api server...")
-        self.api_connection.connect() # connect to server
-        self.logger.debug("connected to api server.")
+        warn_deprecated("connect_to_api")
+        self.acquire_api_connection().connect()
 
     def close_api_connection(self):
-        """ Disconnect from the api server 
+        """ [deprecated] Close api_connection
         """
-        self.logger.debug("closing connection to api server...")
-        self.api_connection.close() # close the connection
-        self.logger.debug("connection to api server closed")
+        warn_deprecated("close_api_connection")
+        self.release_api_connection()
 
-    def post_request(self):
+    def post_request(self, consume = None, event = None):
         """ Issue a POST request to the api server on the given url with the
-        specified payload.
+        specified payload. The connection is drawn from the connection_pool
+        and put back afterwards for reuse. If a reused keep-alive connection
+        turns out to have been closed by the server before any response bytes
+        arrived, a resendable request is repeated on a new connection.
+        Requests that are not resendable always use a new connection.
+
+        Args:
+            consume (callable, optional): called with the JSONObjectStream of
+                the response to decode it incrementally while it is read, its
+                result is returned. Defaults to reading the whole body and
+                decoding it with json.loads.
+            event (instrumentation.RequestEvent, optional): the event to
+                record the phase timings and byte counts in
+
         Returns:
-            response (dict): JSON decoded response data
-        """
-        with self.connection_to_api(): # connect to api
-            self.logger.debug("issuing post request to {u} on server {s} with " 
-                "payload {p}".format(s=self.server,u=self.url,
-                p=self.payload_urlencoded))
-            # POST request to oauth/token
-            self.api_connection.request(
-                method  = "POST",                  # a POST request
-                url     = self.url,                # to this relative url
-                body    = self.payload_urlencoded, # with this payload
-                headers = PLAIN_URLENCODED_HEADERS # and this header
-                )
-
-            # evaluate output
-            response  = self.api_connection.getresponse() # get the responsse
-            data      = response.read().decode()          # read and decode
-            data_json = json.loads(data)                  # load the JSON
-
-            self.logger.debug("api responeded: {}".format(data_json))
-
-        return data_json # return the json data
+            response (dict): JSON decoded response data or the result of
+                consume
+
+        Raises:
+            ApiServerError for 5xx responses, ApiThrottlingError for 429
+            responses, InvalidApiResponseError if the response is no JSON
+        """
+        if event is None: # record, but don't tell anybody
+            event = instrumentation.RequestEvent(kind = "attempt",
+                endpoint = self.url, server = self.server)
+        payload = self.payload_urlencoded
+        self.logger.debug("issuing post request to %s on server %s with " 
+            "payload %s", self.url, self.server, payload)
+        pool = self.connection_pool
+        body = payload.encode("UTF-8")
+        def count(received, decoded): # count the bytes for pool and event
+            pool.count_bytes(received, decoded)
+            event.count_bytes(received, decoded)
+        while True:
+            connection, reused = pool.acquire(self.server,
+                fresh = not self.resendable)
+            responded = False # whether bytes of the response may have arrived
+            try:
+                # connect explicitly to time it, http.client would do it lazily
+                if getattr(connection, "sock", True) is None:
+                    with event.timer("connect"):
+                        connection.connect()
+                # POST request to the url
+                with event.timer("send"):
+                    connection.request(
+                        method  = "POST",          # a POST request
+                        url     = self.url,        # to this relative url
+                        body    = body,            # with this payload
+                        headers = self.headers     # and these headers
+                        )
+                event.request_bytes = (event.request_bytes or 0) + len(body)
+
+                # evaluate output
+                with event.timer("wait"):
+                    # http.client can't tell whether other errors happened
+                    # before the first byte of the response
+                    responded = True
+                    try: response = connection.getresponse()
+                    except http.client.RemoteDisconnected: # nothing arrived
+                        responded = False
+                        raise
+                error = status_error(response.status,
+                    retry_after = response.getheader("Retry-After"))
+                if error is None: # decompress and decode
+                    with event.timer("decode", exclude = "read"):
+                        data = decode(jsonstream.decompressed(
+                            event.timed(jsonstream.chunks_from(response)),
+                            encoding = response.getheader("Content-Encoding"),
+                            count = count), consume = consume)
+                with event.timer("read"):
+                    response.read() # the connection can only be reused empty
+            except connectionpool.STALE_CONNECTION_ERRORS:
+                pool.discard(connection)
+                if not reused or responded: # no stale connection
+                    raise
+                self.logger.debug("reused connection to %s was closed by the "
+                    "server. Reconnecting...", self.server)
+                pool.count("reconnects")
+                continue
+            except ValueError as e:
+                pool.discard(connection)
+                raise InvalidApiResponseError("invalid JSON response: "
+                    "{}".format(e))
+            except:
+                pool.discard(connection)
+                raise
+            pool.release(self.server, connection) # keep connection alive
+            break
+        if error is not None:
+            raise error
+
+        self.logger.debug("api responded: %s", data)
+
+        return data # return the json data
         
+    async def post_request_async(self, consume = None, event = None):
+        """ Awaitable version of post_request using a non-blocking asyncio
+        transport. The keep-alive connections are pooled in the
+        connection_pool for every event loop. The response is read completely
+        before it is decoded.
+
+        Args:
+            consume (callable, optional): called with the JSONObjectStream of
+                the response, its result is returned. Defaults to decoding the
+                body with json.loads.
+            event (instrumentation.RequestEvent, optional): see post_request
+
+        Returns:
+            response (dict): JSON decoded response data or the result of
+                consume
+
+        Raises:
+            see post_request
+        """
+        if event is None: # record, but don't tell anybody
+            event = instrumentation.RequestEvent(kind = "attempt",
+                endpoint = self.url, server = self.server)
+        pool = self.connection_pool
+        def count(received, decoded): # count the bytes for pool and event
+            pool.count_bytes(received, decoded)
+            event.count_bytes(received, decoded)
+        payload = self.payload_urlencoded
+        self.logger.debug("issuing async post request to %s on server %s "
+            "with payload %s", self.url, self.server, payload)
+        body = payload.encode("UTF-8")
+        while True:
+            connection, reused = pool.acquire_async(self.server,
+                fresh = not self.resendable)
+            try:
+                if not connection.connected:
+                    with event.timer("connect"):
+                        await connection.connect()
+                # POST request to the url
+                status, headers, data = await connection.request(
+                    url     = self.url,        # to this relative url
+                    body    = body,            # with this payload
+                    headers = self.headers,    # and these headers
+                    timer   = event.timer,     # timing the phases
+                    )
+            except connectionpool.STALE_CONNECTION_ERRORS:
+                pool.discard(connection)
+                if not reused or connection.responded: # no stale connection
+                    raise
+                self.logger.debug("reused connection to %s was closed by the "
+                    "server. Reconnecting...", self.server)
+                pool.count("reconnects")
+                continue
+            except:
+                pool.discard(connection)
+                raise
+            pool.release(self.server, connection) # keep connection alive
+            break
+        event.request_bytes = len(body)
+
+        error = status_error(status,
+            retry_after = headers.get("retry-after"))
+        if error is not None:
+            raise error
+        # decompress and decode
+        try:
+            with event.timer("decode"):
+                data = decode(jsonstream.decompressed(
+                    jsonstream.chunks_of(data),
+                    encoding = headers.get("content-encoding"),
+                    count = count), consume = consume)
+        except ValueError as e:
+            raise InvalidApiResponseError("invalid JSON response: {}".format(e))
+
+        self.logger.debug("api responded: %s", data)
+
+        return data # return the json data
+
+    @property
+    def response_class(self):
+        """ [read only] the ApiResponse derivate the response is packed into.
+        Subclasses may override this property to use specific derivates of
+        ApiResponse.
+        """
+        return responsetypes.ApiResponse
+
     def issue(self):
         """ Issue a POST request to the api server on the given url with the
-        specified payload and set the 'response' property to an ApiResponse
-        object. Subclasses may override this class to use specific derivates
-        of ApiResponse.
-        """
-        # post the request
-        res_data = self.post_request()
-        # pack the response into an ApiResponse object
-        response = responsetypes.ApiResponse(
-            response = res_data, request = self)
+        specified payload and set the 'response' property to an instance of
+        the response_class. Transient failures are retried according to the
+        retry_policy if the request is resendable.
+        """
+        if self.retry_policy is None or not self.resendable:
+            self.attempt()
+        else:
+            self.retry_policy.call(self.attempt, endpoint = self.url)
+
+    async def issue_async(self):
+        """ Awaitable version of issue. Issue a POST request to the api server
+        without blocking and set the 'response' property to an instance of
+        the response_class.
+
+        Returns:
+            ApiResponse or derivate: the response
+        """
+        if self.retry_policy is None or not self.resendable:
+            return await self.attempt_async()
+        return await self.retry_policy.call_async(self.attempt_async,
+            endpoint = self.url)
+
+    def attempt(self):
+        """ Issue the request once, see issue
+
+        Raises:
+            ApiThrottlingError if the api says the request budget is used up
+        """
+        with instrumentation.observed(kind = "attempt", endpoint = self.url,
+            server = self.server, observers = self.observers) as event:
+            # wait for the rate limit
+            if self.rate_limiter is not None:
+                with event.timer("queue"):
+                    self.rate_limiter.acquire(self.priority)
+            # post the request and pack the response into an ApiResponse object
+            if self.stream_body: # convert the response while it is read
+                response = self.post_request(consume = functools.partial(
+                    self.response_class.from_stream, self), event = event)
+            else:
+                response = self.response_class(request = self,
+                    response = self.post_request(event = event))
+            response.nbytes = event.decoded_bytes
+            error = throttling_error(response.response)
+            if error is not None:
+                raise error
         # set the response property
         self.response = response
 
+    async def attempt_async(self):
+        """ Awaitable version of attempt
+
+        Returns:
+            ApiResponse or derivate: the response
+        """
+        with instrumentation.observed(kind = "attempt", endpoint = self.url,
+            server = self.server, observers = self.observers) as event:
+            # wait for the rate limit
+            if self.rate_limiter is not None:
+                with event.timer("queue"):
+                    await self.rate_limiter.acquire_async(self.priority)
+            # post the request and pack the response into an ApiResponse object
+            if self.stream_body: # convert the response while it is decoded
+                response = await self.post_request_async(
+                    consume = functools.partial(
+                        self.response_class.from_stream, self), event = event)
+            else:
+                response = self.response_class(request = self,
+                    response = await self.post_request_async(event = event))
+            response.nbytes = event.decoded_bytes
+            error = throttling_error(response.response)
+            if error is not None:
+                raise error
+        # set the response property
+        self.response = response
+        return response
+
     def __repr__(self):
         """ python representation of this object
         """
@@ -228,6 +682,8 @@ class ApiRequest(object):
 class TokenRequest(ApiRequest):
     """ base class for token requests
     """
+    __slots__ = ()
+
     def __init__(self, payload = {}):
         """ class constructor
         Args:
@@ -239,22 +695,24 @@ class TokenRequest(ApiRequest):
             payload = payload
             )
 
-    def issue(self):
-        """ Issue a POST request to the api server on the Oauth2 endpoint
-        with the specified payload and set the 'response' property to an
-        TokenResponse object.
-        """
-        # post the request
-        res_data = self.post_request()
-        # pack the response into an ApiResponse object
-        response = responsetypes.TokenResponse(response = res_data,
-            request = self)
-        # set the response property
-        self.response = response
+    @property
+    def response_class(self):
+        """ [read only] the ApiResponse derivate the response is packed into
+        """
+        return responsetypes.TokenResponse
+
+    @property
+    def resendable(self):
+        """ [read only] Token requests are never sent twice, the first one
+        might have been processed and invalidated the refresh token already.
+        """
+        return False
 
 class GetpublicdataRequest(ApiRequest):
     """ class for Getpublicdata requests
     """
+    __slots__ = ()
+
     def __init__(self, payload = {}):
         """ class constructor
         Args:
@@ -266,23 +724,18 @@ class GetpublicdataRequest(ApiRequest):
             payload = payload
             )
 
-    def issue(self):
-        """ Issue a POST request to the api server on the Getpublicdata endpoint
-        with the specified payload and set the 'response' property to an
-        GetpublicdataResponse object.
-        """
-        # post the request
-        res_data = self.post_request()
-        # pack the response into an ApiResponse object
-        response = responsetypes.GetpublicdataResponse(response = res_data,
-            request = self)
-        # set the response property
-        self.response = response
+    @property
+    def response_class(self):
+        """ [read only] the ApiResponse derivate the response is packed into
+        """
+        return responsetypes.GetpublicdataResponse
         
 
 class GetmeasureRequest(ApiRequest):
     """ class for Getmeasure requests
     """
+    __slots__ = ()
+
     def __init__(self, payload = {}):
         """ class constructor
         Args:
@@ -294,24 +747,19 @@ class GetmeasureRequest(ApiRequest):
             payload = payload
             )
 
-    def issue(self):
-        """ Issue a POST request to the api server on the Getmeasure endpoint
-        with the specified payload and set the 'response' property to an
-        GetmeasureResponse object.
-        """
-        # post the request
-        res_data = self.post_request()
-        # pack the response into an ApiResponse object
-        response = responsetypes.GetmeasureResponse(response = res_data,
-            request = self)
-        # set the response property
-        self.response = response
+    @property
+    def response_class(self):
+        """ [read only] the ApiResponse derivate the response is packed into
+        """
+        return responsetypes.GetmeasureResponse
 
 
 
 class GetstationsdataRequest(ApiRequest):
     """ class for Getstationsdata requests
     """
+    __slots__ = ()
+
     def __init__(self, payload = {}):
         """ class constructor
         Args:
@@ -323,15 +771,8 @@ class GetstationsdataRequest(ApiRequest):
             payload = payload
             )
 
-    def issue(self):
-        """ Issue a POST request to the api server on the Getstationsdata 
-        endpoint with the specified payload and set the 'response' property to
-        an GetstationsdataResponse object.
-        """
-        # post the request
-        res_data = self.post_request()
-        # pack the response into an ApiResponse object
-        response = responsetypes.GetstationsdataResponse(response = res_data,
-            request = self)
-        # set the response property
-        self.response = response
+    @property
+    def response_class(self):
+        """ [read only] the ApiResponse derivate the response is packed into
+        """
+        return responsetypes.GetstationsdataResponse
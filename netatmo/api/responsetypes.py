@@ -1,6 +1,8 @@
 #!/usr/bin/env python3
 # system modules
 import logging
+import operator
+import collections
 
 # external modules
 import pandas as pd
@@ -11,17 +13,127 @@ import numpy as np
 from .errors import *
 from . import requests
 
+# whether responses cache their DataFrame conversion by default
+CACHE_DATAFRAMES = True
+
+# whether responses keep a reference to their request by default
+KEEP_REQUESTS = True
+
+def stations_to_dataframe(stations):
+    """ Convert Getpublicdata stations to a pandas.DataFrame in a single pass.
+    Every column is a NumPy array pre-sized to the number of stations (grown on
+    demand if the stations come from an iterator of unknown length), so every
+    value is written exactly once and the DataFrame is built only once at the
+    end.
+
+    Args:
+        stations (iterable of dict): the 'body' part of a Getpublicdata
+            response
+
+    Returns:
+        df = pandas.DataFrame: one row per station
+    """
+    # the number of stations if known, e.g. for a list or its iterator
+    capacity = max(operator.length_hint(stations, 1024), 1)
+
+    # the general and positional columns
+    ids       = np.full(capacity, np.nan, dtype = object)
+    timezones = np.full(capacity, np.nan, dtype = object)
+    altitudes, longitudes, latitudes = np.full((3, capacity), np.nan)
+    # the measurement columns in order of appearance
+    columns = collections.OrderedDict()
+
+    def column(name):
+        try: return columns[name]
+        except KeyError: # first appearance, create it
+            values = columns[name] = np.full(capacity, np.nan)
+            return values
+
+    def grow(values):
+        grown = np.full(2 * len(values), np.nan, dtype = values.dtype)
+        grown[:len(values)] = values
+        return grown
+
+    n = 0 # number of stations so far
+    for station in stations:
+        if n == capacity: # iterator with more stations than expected
+            ids, timezones = grow(ids), grow(timezones)
+            altitudes, longitudes = grow(altitudes), grow(longitudes)
+            latitudes = grow(latitudes)
+            for name, values in columns.items():
+                columns[name] = grow(values)
+            capacity *= 2
+
+        ### gather general information ###
+        ids[n] = station.get("_id",np.nan)
+
+        ### gather positional information ###
+        place = station.get("place",{})
+        longitudes[n], latitudes[n] = place.get("location",[np.nan,np.nan])
+        altitudes[n] = place.get("altitude",np.nan)
+        timezones[n] = place.get("timezone",np.nan)
+
+        ### gather measurement information ###
+        for module_id, measure in station.get("measures",{}).items():
+            types = measure.get("type",[])
+            res   = measure.get("res",{}) # the time and values
+            if len(res) == 1:
+                (timestamp, measurements), = res.items()
+                timestamp = int(timestamp)
+            else: # something is wrong, leave the module out
+                timestamp, measurements = np.nan, ()
+            for t, value in zip(types, measurements):
+                column(t)[n] = np.nan if value is None else value
+            for t in types:
+                column("time_{}".format(t))[n] = timestamp
+        n += 1
+
+    # create DataFrame
+    data = collections.OrderedDict([
+        ("id",        ids[:n]),
+        ("altitude",  altitudes[:n]),
+        ("longitude", longitudes[:n]),
+        ("latitude",  latitudes[:n]),
+        ("timezone",  pd.Categorical(timezones[:n])),
+        ])
+    for name, values in columns.items():
+        values = values[:n]
+        # convert times to datetime
+        if name.startswith("time_"):
+            values = pd.to_datetime(values, unit="s", utc=True)
+        data[name] = values
+    df = DataFrame(data)
+    # reset index
+    df.reset_index(inplace = True)
+    # return the resulting DataFrame
+    return df
+
+
 class ApiResponse(object):
-    """ Base class for Netatmo api response datasets
+    """ Base class for Netatmo api response datasets. The attributes are
+    slotted, so keeping many responses is cheap. Derivates have to define
+    __slots__, too.
     """
-    def __init__(self, request, response):
+    __slots__ = ("_logger", "_response", "_request", "_dataframe",
+        "_cache_dataframe", "_nbytes")
+
+    def __init__(self, request, response, keep_request = None):
         """ Class constructor
         Args:
             request (instance of ApiRequest or derivate): the api request
             response (dict): The raw api response
+            keep_request (bool, optional): whether to keep the reference to
+                the request. Defaults to None which means the module-wide
+                KEEP_REQUESTS. See drop_request.
         """
+        self._logger = None
+        self._dataframe = None
+        self._cache_dataframe = None
+        self._nbytes = None
         self.response = response
         self.request = request
+        if not (KEEP_REQUESTS if keep_request is None else keep_request):
+            self.drop_request()
 
     ##################
     ### Properties ###
@@ -31,10 +143,7 @@ class ApiResponse(object):
         """ the logging.Logger used for logging.
         Defaults to logging.getLogger(__name__).
         """
-        try: # try to return the internal property
-            return self._logger 
-        except AttributeError: # didn't work
-            return logging.getLogger(__name__) # return default logger
+        return self._logger or logging.getLogger(__name__)
     
     @logger.setter
     def logger(self, logger):
@@ -46,21 +155,63 @@ class ApiResponse(object):
     def response(self):
         """ The raw api response dict.
         """
-        try: # try to return internal attribute
-            return self._response
-        except AttributeError: # didn't work
-            self._response = {}
-        return self._response # return internal attribute
+        return self._response
 
     @response.setter
     def response(self, newresponse):
         assert isinstance(newresponse, dict), \
             "reponse property has to be of class dict"
         self._response = newresponse
+        self._nbytes = None # unknown for the new response
+        self.clear_dataframe_cache() # the cached conversion is outdated
+
+    @property
+    def nbytes(self):
+        """ Size of the JSON the response was decoded from in bytes or None
+        if unknown. Set when the response is received from the server.
+        """
+        return self._nbytes
+
+    @nbytes.setter
+    def nbytes(self, value):
+        self._nbytes = None if value is None else int(value)
+
+    @property
+    def cache_dataframe(self):
+        """ Whether the dataframe property caches the conversion. Defaults to
+        the module-wide CACHE_DATAFRAMES. Set this to False to save memory.
+        """
+        if self._cache_dataframe is None:
+            return CACHE_DATAFRAMES
+        return self._cache_dataframe
+
+    @cache_dataframe.setter
+    def cache_dataframe(self, value):
+        self._cache_dataframe = bool(value)
+        if not self._cache_dataframe:
+            self.clear_dataframe_cache()
+
+    @property
+    def dataframe(self):
+        """ [read only] The response converted to a pandas.DataFrame
+
+        The conversion is cached until the response property is set again,
+        unless cache_dataframe is False. As the same DataFrame is returned on
+        every access then, copy it before modifying it.
+
+        Returns:
+            df = pandas.DataFrame: The response converted to a DataFrame
+        """
+        if self._dataframe is not None: # return the cached conversion
+            return self._dataframe
+        df = self.to_dataframe()
+        if self.cache_dataframe:
+            self._dataframe = df
+        return df
 
     @property
     def request(self):
-        """ The raw api request dict.
+        """ The api request or None if it was dropped
         """
         return self._request # return internal attribute
 
@@ -70,6 +221,45 @@ class ApiResponse(object):
             "reponse property has to be of class ApiRequest or derivates"
         self._request = newrequest
     
+    ###############
+    ### methods ###
+    ###############
+    @classmethod
+    def from_stream(cls, request, stream):
+        """ Create the response while it is decoded. Subclasses supporting the
+        request's stream_body option override this.
+
+        Args:
+            request (instance of ApiRequest or derivate): the api request
+            stream (JSONObjectStream): the response being decoded
+
+        Returns:
+            instance of this class
+        """
+        return cls(request = request, response = stream.load())
+
+    def to_dataframe(self):
+        """ Convert the response to a pandas.DataFrame. Subclasses override
+        this. Use the cached dataframe property instead of calling this.
+
+        Returns:
+            df = pandas.DataFrame: The response converted to a DataFrame
+        """
+        raise NotImplementedError("{} can't be converted to a " 
+            "DataFrame".format(self.__class__.__name__))
+
+    def clear_dataframe_cache(self):
+        """ Drop the cached DataFrame conversion
+        """
+        self._dataframe = None
+
+    def drop_request(self):
+        """ Drop the reference to the request and with it the payload, e.g.
+        to keep many responses in memory. What the DataFrame conversion needs
+        from the request is kept. Afterwards, the request property is None.
+        """
+        self._request = None
+
     def __repr__(self):
         """ python representation of this object
         """
@@ -93,141 +283,141 @@ class ApiResponse(object):
 class TokenResponse(ApiResponse):
     """ Class that holds the responded data of a Oauth2 token request
     """
-    pass
+    __slots__ = ()
 
 
 class GetpublicdataResponse(ApiResponse):
     """ Class that holds the responded data of a Getstationdata request
     """
-    @property
-    def dataframe(self):
-        """ [read only] Convert the response to a pandas.DataFrame
+    __slots__ = ("_streamed_dataframe",)
+
+    def __init__(self, request, response, keep_request = None):
+        self._streamed_dataframe = None # set by from_stream
+        super().__init__(request = request, response = response,
+            keep_request = keep_request)
+
+    @classmethod
+    def from_stream(cls, request, stream):
+        """ Create the response while it is decoded. If the request's
+        stream_body option is set, the stations are converted to the
+        DataFrame one by one while they are read and the 'body' is not kept in
+        the response. The DataFrame is then kept regardless of
+        cache_dataframe.
+
+        Args:
+            request (instance of ApiRequest or derivate): the api request
+            stream (JSONObjectStream): the response being decoded
+
+        Returns:
+            GetpublicdataResponse: the response
+        """
+        if not request.stream_body:
+            return super().from_stream(request, stream)
+        df = stations_to_dataframe(stream.items())
+        if not stream.streamed and not stream.members.get("error"):
+            raise ApiResponseError("'body' part of response does not " 
+                "exist or is no list.")
+        response = cls(request = request, response = stream.members)
+        response._streamed_dataframe = response._dataframe = df
+        return response
+
+    @ApiResponse.response.setter
+    def response(self, newresponse):
+        ApiResponse.response.fset(self, newresponse)
+        self._streamed_dataframe = None # belongs to the former response
+
+    def to_dataframe(self):
+        """ Convert the response to a pandas.DataFrame
         Returns:
             df = pandas.DataFrame: The response converted to a DataFrame
         """
         # get the list of stations
         stations = self.response.get("body")
+        if stations is None and self._streamed_dataframe is not None:
+            return self._streamed_dataframe # the stations were streamed
         if not isinstance(stations,list):
             raise ApiResponseError("'body' part of response does not " 
                 "exist or is no list.")
-
-        # start with basic dict
-        stationdict = { 
-            "id": [],
-            "altitude": [],
-            "longitude": [],
-            "latitude": [],
-            "timezone": [],
-            }
-        # loop over all stations
-        for station in stations:
-            station_df = DataFrame() # start with empty DataFrame
-            
-            ### gather general information ###
-            station_id = station.get("_id",np.nan)
-            # add id to dict
-            stationdict["id"].append(station_id)
-
-            ### gather positional information ###
-            place = station.get("place",{})
-            location = place.get("location",[np.nan,np.nan])
-            longitude,latitude = location # get longitude and latitude
-            altitude = place.get("altitude",np.nan)
-            timezone = place.get("timezone",np.nan)
-            # add position to dict
-            stationdict["altitude"].append(altitude)
-            stationdict["longitude"].append(longitude)
-            stationdict["latitude"].append(latitude)
-            stationdict["timezone"].append(timezone)
-
-            ### gather measurement information ###
-            # loop over all measurements
-            measdict = {}
-            for module_id, measure in station.get("measures",{}).items():
-                types = measure.get("type",[])
-                res   = measure.get("res",{}) # the time and values
-                if not len(res) == 1: # something is wrong
-                    # self.logger.warning("module '{}' has not exactly one time! " 
-                    #     "Leaving it out.".format(module_id))
-                    res = {np.nan:[np.nan] * len(types)}
-                timestamp = list(res.keys())[0]
-                measurements = res.get(timestamp)
-                measdict.update( zip(types,measurements) )
-                timedict = { "time_{}".format(t): int(timestamp) for t in types }
-                measdict.update( timedict  )
-                # self.logger.debug("measdict after update: {}".format(measdict))
-
-            # add measurements to stationdict
-            for key,val in measdict.items():
-                try:    stationdict[key].append(val)
-                except: stationdict[key] = [val]
-                
-            # fill the remaining values
-            length = max([len(x) for x in stationdict.values()])
-            for key,val in stationdict.items():
-                while len(val) < length: val.append(np.nan)
-                
-            
-        # create DataFrame
-        df = DataFrame(stationdict)
-        # convert times to datetime
-        for col in df.columns:
-            if col.startswith("time_"):
-                df[col] = pd.to_datetime(df[col], unit="s", utc=True)
-        # reset index
-        df.reset_index(inplace = True)
-        # return the resulting DataFrame
-        return df
+        return stations_to_dataframe(stations)
     
 
 class GetmeasureResponse(ApiResponse):
     """ Class that holds the responded data of a Getmeasure request
     """
+    __slots__ = ("_types",)
+
+    def __init__(self, request, response, keep_request = None):
+        self._types = None # taken from the request when it is dropped
+        super().__init__(request = request, response = response,
+            keep_request = keep_request)
+
     @property
-    def dataframe(self):
-        """ [read only] Convert the response to a pandas.DataFrame
+    def types(self):
+        """ [read only] the list of requested measure types
+        """
+        if self._types is not None:
+            return self._types
+        try:
+            return self.request.payload.get("type").split(",") # the types
+        except AttributeError:
+            raise InvalidApiInputError("There is no sensible 'type' " 
+                "section in the request's payload. Strange...")
+
+    def drop_request(self):
+        """ Drop the reference to the request, but keep the types
+        """
+        try: self._types = self.types
+        except InvalidApiInputError: pass # no types to keep
+        super().drop_request()
+
+    def to_dataframe(self):
+        """ Convert the response to a pandas.DataFrame. Both the optimized
+        (list) and the unoptimized (dict) response format are parsed directly
+        into NumPy arrays.
         Returns:
             df = pandas.DataFrame: The response converted to a DataFrame
         """
+        types = self.types
         body = self.response.get("body")
         if isinstance(body,list): # optimized
-            raise NotImplementedError("converting 'optimized' Getmeasure " 
-                "response is not yet implemented")
+            times, values = [], []
+            for block in body:
+                try:
+                    value = np.array(block.get("value",[]), dtype = float)
+                    beg_time = int(block["beg_time"])
+                    step_time = int(block.get("step_time",0))
+                except (AttributeError, KeyError, TypeError, ValueError):
+                    raise ApiResponseError("invalid block in optimized " 
+                        "Getmeasure response")
+                if len(value) and not value.shape[1:] == (len(types),):
+                    raise ApiResponseError("number of requested types does " 
+                        "not match number of responded types")
+                # compute the time of every value
+                times.append(beg_time + step_time * np.arange(len(value)))
+                values.append(value.reshape(len(value),len(types)))
         elif isinstance(body,dict): # unoptimized
+            times = [np.array(list(body.keys()), dtype = np.int64)]
             try:
-                types = self.request.payload.get("type").split(",") # the types
-            except AttributeError:
-                raise InvalidApiInputError("There is no sensible 'type' " 
-                    "section in the request's payload. Strange...")
-                    
-            # start with empty measurement dict
-            measdict = {"time":[]}
-            # loop over all time-measurement pairs
-            for timestamp, measurements in body.items():
-                if not len(types) == len(measurements):
-                    raise ApiResponseError("number of requested types does not " 
-                        "match number of responded types")
-                d = dict(zip(types, measurements))
-                d.update({"time":int(timestamp)})
-                # add measurements to measdict
-                for key,val in d.items():
-                    try:    measdict[key].append(val)
-                    except: measdict[key] = [val]
-
+                values = [np.array(list(body.values()), dtype = float
+                    ).reshape(len(body),len(types))]
+            except ValueError:
+                raise ApiResponseError("number of requested types does not " 
+                    "match number of responded types")
         else: # bullshit
             raise ApiResponseError("'body' part of response does not " 
                 "exist or is neither list not dict.")
 
         # create DataFrame
-        df = DataFrame(measdict)
-        # convert times to datetime
-        for col in df.columns:
-            if col.startswith("time"):
-                df[col] = pd.to_datetime(df[col], unit="s", utc=True)
+        df = DataFrame(
+            np.concatenate(values) if values else np.empty((0,len(types))),
+            columns = types,
+            # convert times to datetime
+            index = pd.DatetimeIndex(pd.to_datetime(
+                np.concatenate(times) if times else np.array([],dtype=int),
+                unit="s", utc=True), name = "time"),
+            )
         # sort the data frame by time
-        df = df.sort_values(by = "time")
-        # index
-        df.set_index("time",inplace=True)
+        df.sort_index(inplace = True, kind = "stable")
         # return the resulting DataFrame
         return df
 
@@ -235,9 +425,10 @@ class GetmeasureResponse(ApiResponse):
 class GetstationsdataResponse(ApiResponse):
     """ Class that holds the responded data of a Getstationsdata request
     """
-    @property
-    def dataframe(self):
-        """ [read only] Convert the response to a pandas.DataFrame
+    __slots__ = ()
+
+    def to_dataframe(self):
+        """ Convert the response to a pandas.DataFrame
         Returns:
             df = pandas.DataFrame: The response converted to a DataFrame
         """
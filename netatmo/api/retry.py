@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+# module for retrying api requests after transient failures
+# system modules
+import time
+import random
+import asyncio
+import logging
+import threading
+import http.client
+
+# internal modules
+from .variables import *
+from .errors import *
+
+# the retry policy requests use by default, None means no retries
+RETRY_POLICY = None
+
+# errors worth another attempt: network errors, 5xx and throttling responses
+# and bodies that are no JSON (e.g. error pages of a load balancer)
+RETRYABLE_ERRORS = (
+    OSError,                   # includes ConnectionError and timeouts
+    http.client.HTTPException, # e.g. a broken status line
+    ApiServerError,
+    ApiThrottlingError,
+    InvalidApiResponseError,
+    )
+
+EMPTY_RETRY_STATISTICS = {
+    "attempts":0, # requests sent
+    "retries":0,  # requests sent again after a failure
+    "failures":0, # requests that failed in the end
+    }
+
+
+class RetryPolicy(object):
+    """ Policy to repeat requests after transient failures with exponential
+    backoff and jitter. Throttled requests wait at least for a rate limit
+    window and as long as the server asks to in a Retry-After header. The
+    statistics are counted per endpoint.
+
+    Args:
+        max_attempts (int, optional): attempts in total, including the first.
+            Defaults to RETRY_MAX_ATTEMPTS.
+        backoff (float, optional): seconds to wait before the first retry,
+            doubled for every further retry. Defaults to RETRY_BACKOFF.
+        max_backoff (float, optional): maximum seconds to wait before a retry.
+            Defaults to RETRY_MAX_BACKOFF.
+        throttling_backoff (float, optional): seconds to wait before the
+            first retry of a throttled request, doubled for every further
+            retry up to max_backoff. Defaults to RETRY_THROTTLING_BACKOFF.
+        jitter (float, optional): fraction [0;1] of the backoff that is
+            randomized to spread the retries of many clients. It shortens
+            the backoff, except for throttled requests which it lengthens.
+            Defaults to RETRY_JITTER.
+        deadline (float, optional): seconds after the first attempt after
+            which no retry is started. None means no deadline. Defaults to
+            RETRY_DEADLINE.
+        retryable (tuple, optional): the error classes to retry. Defaults to
+            RETRYABLE_ERRORS.
+    """
+    def __init__(self, max_attempts = RETRY_MAX_ATTEMPTS,
+        backoff = RETRY_BACKOFF, max_backoff = RETRY_MAX_BACKOFF,
+        throttling_backoff = RETRY_THROTTLING_BACKOFF,
+        jitter = RETRY_JITTER, deadline = RETRY_DEADLINE,
+        retryable = RETRYABLE_ERRORS):
+        assert int(max_attempts) >= 1, "max_attempts has to be at least 1"
+        assert 0 <= jitter <= 1, "jitter has to be in [0;1]"
+        self.max_attempts = int(max_attempts)
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.throttling_backoff = throttling_backoff
+        self.jitter = jitter
+        self.deadline = deadline
+        self.retryable = tuple(retryable)
+        self._lock = threading.Lock()
+        self.reset_statistics()
+
+    ##################
+    ### Properties ###
+    ##################
+    @property
+    def logger(self):
+        """ the logging.Logger used for logging.
+        Defaults to logging.getLogger(__name__).
+        """
+        try: # try to return the internal property
+            return self._logger
+        except AttributeError: # didn't work
+            return logging.getLogger(__name__) # return default logger
+
+    @logger.setter
+    def logger(self, logger):
+        assert isinstance(logger, logging.Logger), \
+            "logger property has to be a logging.Logger"
+        self._logger = logger
+
+    @property
+    def statistics(self):
+        """ [read only] copy of the statistics per endpoint
+        """
+        with self._lock:
+            return {endpoint:counts.copy()
+                for endpoint,counts in self._statistics.items()}
+
+    ###############
+    ### Methods ###
+    ###############
+    def reset_statistics(self):
+        """ reset all statistics
+        """
+        with self._lock:
+            self._statistics = {}
+
+    def count(self, endpoint, event):
+        """ count an event of an endpoint in the statistics
+        """
+        with self._lock:
+            self._statistics.setdefault(endpoint,
+                EMPTY_RETRY_STATISTICS.copy())[event] += 1
+
+    def is_retryable(self, error):
+        """ Whether an error is worth another attempt
+        """
+        return isinstance(error, self.retryable)
+
+    def delay(self, retry, error = None):
+        """ The seconds to wait before a retry
+
+        Args:
+            retry (int): the number of the retry, starting at 1
+            error (BaseException, optional): the error of the failed attempt
+
+        Returns:
+            float: the backoff with jitter, at least the error's retry_after
+        """
+        retry_after = getattr(error, "retry_after", None) or 0
+        if isinstance(error, ApiThrottlingError): # wait for the rate limit
+            backoff = min(max(self.max_backoff, self.throttling_backoff),
+                self.throttling_backoff * 2 ** (retry - 1))
+            backoff = max(backoff, retry_after)
+            return backoff * (1 + self.jitter * random.random())
+        backoff = min(self.max_backoff, self.backoff * 2 ** (retry - 1))
+        return max(retry_after, backoff * (1 - self.jitter * random.random()))
+
+    def next_delay(self, error, attempt, start, endpoint):
+        """ Decide whether to retry after a failed attempt
+
+        Args:
+            error (BaseException): the error of the attempt
+            attempt (int): the number of the failed attempt, starting at 1
+            start (float): time.monotonic() of the first attempt
+            endpoint (str): the endpoint for the statistics
+
+        Returns:
+            float or None: the seconds to wait before the retry or None to
+                give up
+        """
+        if not self.is_retryable(error) or attempt >= self.max_attempts:
+            delay = None
+        else:
+            delay = self.delay(attempt, error)
+            if self.deadline is not None and \
+                time.monotonic() + delay - start > self.deadline:
+                delay = None
+        if delay is None:
+            self.count(endpoint, "failures")
+        else:
+            self.count(endpoint, "retries")
+            self.logger.debug("attempt %d to %s failed (%s: %s). Retrying in "
+                "%.2f seconds...", attempt, endpoint,
+                error.__class__.__name__, error, delay)
+        return delay
+
+    def call(self, function, endpoint = ""):
+        """ Call a function until it succeeds or the policy gives up
+
+        Args:
+            function (callable): called without arguments for every attempt
+            endpoint (str, optional): the endpoint for the statistics
+
+        Returns:
+            the result of function
+        """
+        start = time.monotonic()
+        attempt = 0
+        while True:
+            attempt += 1
+            self.count(endpoint, "attempts")
+            try:
+                return function()
+            # the api errors are no Exceptions, interrupts aren't retried
+            except (Exception, ApiResponseError) as e:
+                delay = self.next_delay(e, attempt, start, endpoint)
+                if delay is None:
+                    raise
+            time.sleep(delay)
+
+    async def call_async(self, function, endpoint = ""):
+        """ Awaitable version of call
+
+        Args:
+            function (callable): returns an awaitable for every attempt
+            endpoint (str, optional): the endpoint for the statistics
+
+        Returns:
+            the result of the awaited function
+        """
+        start = time.monotonic()
+        attempt = 0
+        while True:
+            attempt += 1
+            self.count(endpoint, "attempts")
+            try:
+                return await function()
+            # the api errors are no Exceptions, interrupts aren't retried
+            except (Exception, ApiResponseError) as e:
+                delay = self.next_delay(e, attempt, start, endpoint)
+                if delay is None:
+                    raise
+            await asyncio.sleep(delay)
+
+    def __repr__(self):
+        """ python representation of this object
+        """
+        return ("{module}.{name}(max_attempts = {max_attempts}, "
+            "backoff = {backoff}, max_backoff = {max_backoff}, "
+            "throttling_backoff = {throttling_backoff}, "
+            "jitter = {jitter}, deadline = {deadline})").format(
+            name=self.__class__.__name__,module=self.__class__.__module__,
+            max_attempts=self.max_attempts, backoff=self.backoff,
+            max_backoff=self.max_backoff,
+            throttling_backoff=self.throttling_backoff, jitter=self.jitter,
+            deadline=self.deadline)
@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+# module for the places where Authentication persists its tokens
+# system modules
+import os
+import json
+import logging
+import threading
+import contextlib
+import sqlite3
+try: # POSIX only
+    import fcntl
+except ImportError: # pragma: no cover
+    fcntl = None
+
+# internal modules
+from .. import utils
+
+# seconds SQLite waits for a locked database
+SQLITE_TIMEOUT = 30
+
+
+class TokenStore(object):
+    """ Base class for token stores. A token store persists the tokens of an
+    Authentication and provides a lock that all processes using the same store
+    share, so that only one of them updates the tokens at a time.
+    Subclasses override read, write and locked.
+    """
+    ##################
+    ### Properties ###
+    ##################
+    @property
+    def logger(self):
+        """ the logging.Logger used for logging.
+        Defaults to logging.getLogger(__name__).
+        """
+        try: # try to return the internal property
+            return self._logger
+        except AttributeError: # didn't work
+            return logging.getLogger(__name__) # return default logger
+
+    @logger.setter
+    def logger(self, logger):
+        assert isinstance(logger, logging.Logger), \
+            "logger property has to be a logging.Logger"
+        self._logger = logger
+
+    ###############
+    ### Methods ###
+    ###############
+    def read(self):
+        """ Read the stored tokens
+
+        Returns:
+            dict: the stored tokens, empty dict if there are none
+        """
+        return {}
+
+    def write(self, tokens):
+        """ Store the tokens
+
+        Args:
+            tokens (dict): the tokens to store
+
+        Returns:
+            bool: True on success, False otherwise
+        """
+        return False
+
+    @contextlib.contextmanager
+    def locked(self):
+        """ Context manager holding the store's exclusive lock. It is
+        reentrant within a thread.
+        """
+        yield
+
+    def __repr__(self):
+        """ python representation of this object
+        """
+        return "{module}.{name}()".format(
+            name=self.__class__.__name__,module=self.__class__.__module__)
+
+
+class JSONFileTokenStore(TokenStore):
+    """ Token store in a JSON file. The file is replaced atomically so that
+    readers never see a half-written file. The lock is an fcntl lock on
+    a separate lock file next to it. Where fcntl is not available, the lock
+    only works within the current process.
+
+    Args:
+        filename (str): the JSON file
+    """
+    def __init__(self, filename):
+        self.filename = filename
+        self._lock = threading.RLock()
+        self._lock_depth = 0
+        self._lock_fd = None
+
+    ##################
+    ### Properties ###
+    ##################
+    @property
+    def filename(self):
+        """ The path of the JSON file
+        """
+        return self._filename
+
+    @filename.setter
+    def filename(self, value):
+        assert isinstance(value, str), "filename has to be a str"
+        self._filename = value
+
+    @property
+    def lockfile(self):
+        """ [read only] The path of the lock file
+        """
+        return "{}.lock".format(self.filename)
+
+    ###############
+    ### Methods ###
+    ###############
+    def read(self):
+        """ Read the stored tokens
+
+        Returns:
+            dict: the stored tokens, empty dict if there are none
+        """
+        return utils.read_json_from_file(self.filename)
+
+    def write(self, tokens):
+        """ Store the tokens by writing a temporary file and renaming it
+
+        Args:
+            tokens (dict): the tokens to store
+
+        Returns:
+            bool: True on success, False otherwise
+        """
+        success = utils.write_json_to_file(tokens, self.filename,
+            atomic = True, fsync = True)
+        if not success:
+            self.logger.debug("could not write tokens to '%s'",
+                self.filename)
+        return success
+
+    @contextlib.contextmanager
+    def locked(self):
+        """ Context manager holding the exclusive lock on the lock file. It is
+        reentrant within a thread.
+        """
+        with self._lock:
+            if self._lock_depth == 0 and fcntl is not None:
+                self._lock_fd = os.open(self.lockfile, os.O_RDWR | os.O_CREAT)
+                fcntl.flock(self._lock_fd, fcntl.LOCK_EX)
+            self._lock_depth += 1
+            try:
+                yield
+            finally:
+                self._lock_depth -= 1
+                if self._lock_depth == 0 and self._lock_fd is not None:
+                    fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+                    os.close(self._lock_fd)
+                    self._lock_fd = None
+
+    def __repr__(self):
+        """ python representation of this object
+        """
+        return "{module}.{name}(filename = {filename})".format(
+            name=self.__class__.__name__,module=self.__class__.__module__,
+            filename=json.dumps(self.filename))
+
+
+class SQLiteTokenStore(TokenStore):
+    """ Token store in an SQLite database. The tokens are stored as one JSON
+    row, the lock is an immediate transaction on the database.
+
+    Args:
+        filename (str): the SQLite database file
+        table (str, optional): the table name. Defaults to 'tokens'.
+    """
+    def __init__(self, filename, table = "tokens"):
+        self.filename = filename
+        self.table = table
+        self._lock = threading.RLock()
+        self._lock_depth = 0
+        self._connection = None
+
+    ##################
+    ### Properties ###
+    ##################
+    @property
+    def filename(self):
+        """ The path of the SQLite database
+        """
+        return self._filename
+
+    @filename.setter
+    def filename(self, value):
+        assert isinstance(value, str), "filename has to be a str"
+        self._filename = value
+
+    @property
+    def table(self):
+        """ The name of the table holding the tokens
+        """
+        return self._table
+
+    @table.setter
+    def table(self, value):
+        assert isinstance(value, str) and value.isidentifier(), \
+            "table has to be a valid identifier"
+        self._table = value
+
+    ###############
+    ### Methods ###
+    ###############
+    def connect(self):
+        """ Open a connection to the database and create the table if needed
+
+        Returns:
+            sqlite3.Connection: the connection in autocommit mode
+        """
+        connection = sqlite3.connect(self.filename, timeout = SQLITE_TIMEOUT,
+            isolation_level = None, check_same_thread = False)
+        connection.execute("CREATE TABLE IF NOT EXISTS {} "
+            "(key TEXT PRIMARY KEY, value TEXT)".format(self.table))
+        return connection
+
+    @contextlib.contextmanager
+    def connection(self):
+        """ Context manager yielding the connection of the current lock or a
+        new one
+        """
+        with self._lock:
+            if self._connection is not None: # locked by this thread
+                yield self._connection
+                return
+        connection = self.connect()
+        try:
+            yield connection
+        finally:
+            connection.close()
+
+    def read(self):
+        """ Read the stored tokens
+
+        Returns:
+            dict: the stored tokens, empty dict if there are none
+        """
+        try:
+            with self.connection() as connection:
+                row = connection.execute("SELECT value FROM {} "
+                    "WHERE key = 'tokens'".format(self.table)).fetchone()
+            return json.loads(row[0]) if row else {}
+        except (sqlite3.Error, ValueError) as e:
+            self.logger.debug("could not read tokens from '%s': %s",
+                self.filename, e)
+            return {}
+
+    def write(self, tokens):
+        """ Store the tokens
+
+        Args:
+            tokens (dict): the tokens to store
+
+        Returns:
+            bool: True on success, False otherwise
+        """
+        try:
+            with self.connection() as connection:
+                connection.execute("INSERT OR REPLACE INTO {} (key, value) "
+                    "VALUES ('tokens', ?)".format(self.table),
+                    (json.dumps(tokens,sort_keys=True),))
+            return True
+        except (sqlite3.Error, TypeError, ValueError) as e:
+            self.logger.debug("could not write tokens to '%s': %s",
+                self.filename, e)
+            return False
+
+    @contextlib.contextmanager
+    def locked(self):
+        """ Context manager holding an immediate transaction on the database.
+        Other processes can still read the committed tokens, but not write or
+        lock. It is reentrant within a thread, nested levels are savepoints.
+        If the body raises, its writes are rolled back.
+        """
+        with self._lock:
+            depth = self._lock_depth
+            if depth == 0:
+                self._connection = self.connect()
+                self._connection.execute("BEGIN IMMEDIATE")
+            else:
+                self._connection.execute("SAVEPOINT level{}".format(depth))
+            self._lock_depth += 1
+            try:
+                try:
+                    yield
+                except BaseException:
+                    if depth == 0:
+                        self._connection.execute("ROLLBACK")
+                    else:
+                        self._connection.execute(
+                            "ROLLBACK TO level{}".format(depth))
+                        self._connection.execute(
+                            "RELEASE level{}".format(depth))
+                    raise
+                if depth == 0:
+                    self._connection.execute("COMMIT")
+                else:
+                    self._connection.execute("RELEASE level{}".format(depth))
+            finally:
+                self._lock_depth -= 1
+                if depth == 0:
+                    self._connection.close()
+                    self._connection = None
+
+    def __repr__(self):
+        """ python representation of this object
+        """
+        return "{module}.{name}(filename = {filename}, table = {table})".format(
+            name=self.__class__.__name__,module=self.__class__.__module__,
+            filename=json.dumps(self.filename),table=json.dumps(self.table))
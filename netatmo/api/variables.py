@@ -6,6 +6,11 @@ PLAIN_URLENCODED_HEADERS = {
     "Content-type": "application/x-www-form-urlencoded;charset=UTF-8",
     }
 
+# headers to ask for a compressed response
+COMPRESSED_RESPONSE_HEADERS = {
+    "Accept-Encoding": "gzip, deflate",
+    }
+
 NETATMO_API_SERVER = "api.netatmo.com"
 
 NETATMO_API_TOKEN_URL           = "/oauth2/token"
@@ -42,6 +47,28 @@ GETMEASURE_ALLOWED_TYPES_BY_SCALE = {
 "1month" : GETMEASURE_ALLOWED_TYPES_UPTO_1MONTH,
 }
 
+# maximum number of measures returned by a single Getmeasure request
+GETMEASURE_MAX_MEASURES = 1024
+
+# seconds between two measures at the Getmeasure scales
+GETMEASURE_SCALE_SECONDS = {
+"max" :    300,
+"30min" :  1800,
+"1hour" :  3600,
+"3hours" : 10800,
+"1day" :   86400,
+"1week" :  604800,
+"1month" : 2678400,
+}
+
+# number of concurrent requests when fetching Getmeasure time windows
+GETMEASURE_RANGE_WORKERS = 1
+# number of concurrent requests when fetching a batch of Getmeasure specs
+GETMEASURE_BATCH_WORKERS = 4
+# the keys a Getmeasure batch spec may contain
+GETMEASURE_BATCH_SPEC_KEYS = ["device_id", "module_id", "type", "scale",
+    "date_begin", "date_end", "real_time"]
+
 GETPUBLICDATA_REGION_BOUNDS = {
     "lat_ne": [-85,85],
     "lat_sw": [-85,85],
@@ -49,4 +76,57 @@ GETPUBLICDATA_REGION_BOUNDS = {
     "lon_sw": [-180,180],
     }
 
+# a Getpublicdata tile with at least this many stations is considered saturated
+# and is subdivided when scanning a region
+GETPUBLICDATA_SCAN_SATURATION = 500
+# tiles are not subdivided further than this size (degrees)
+GETPUBLICDATA_SCAN_MIN_TILE_SIZE = 0.01
+# number of concurrent requests when scanning a region
+GETPUBLICDATA_SCAN_WORKERS = 8
+
+# seconds between the polls of a GetpublicdataPoller
+GETPUBLICDATA_POLL_INTERVAL = 600
+# seconds after which a GetpublicdataPoller forgets modules not seen anymore
+GETPUBLICDATA_POLL_FORGET_AFTER = 86400
+
+# seconds responses are cached per endpoint url when a response cache is used
+# endpoints not listed here are not cached
+RESPONSE_CACHE_TTLS = {
+    NETATMO_API_GETPUBLICDATA_URL:   60,
+    NETATMO_API_GETMEASURE_URL:      300,
+    NETATMO_API_GETSTATIONSDATA_URL: 60,
+    }
+# maximum size of a response cache (bytes of the JSON responses)
+RESPONSE_CACHE_MAXBYTES = 64 * 2**20
+# seconds after which a disk response cache scans its directory again to
+# notice the files of other processes, in between it keeps a running total
+RESPONSE_CACHE_RESCAN_SECONDS = 60
+# fraction of maxbytes a disk response cache frees beyond maxbytes when it
+# evicts, so that the following stores don't scan the directory again
+RESPONSE_CACHE_EVICTION_HEADROOM = 0.1
+
+# request budgets of the netatmo api per user and application
+# window seconds -> requests allowed in that window
+RATE_LIMIT_BUDGETS = {
+    10:   50,
+    3600: 500,
+    }
+
+# default retry policy for transient failures
+RETRY_MAX_ATTEMPTS = 4  # attempts in total, including the first one
+RETRY_BACKOFF = 0.5     # seconds to wait before the first retry, doubled
+                        # for every further retry
+RETRY_MAX_BACKOFF = 30  # maximum seconds to wait before a retry
+RETRY_THROTTLING_BACKOFF = min(RATE_LIMIT_BUDGETS) # seconds to wait before
+                        # the first retry of a throttled request, the shortest
+                        # rate limit window, doubled for every further retry
+RETRY_JITTER = 0.5      # fraction of the backoff that is randomized
+RETRY_DEADLINE = 120    # seconds after which no further attempt is started
+
+# upper bounds of the instrumentation histogram buckets
+INSTRUMENTATION_TIME_BUCKETS = [0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+    0.25, 0.5, 1, 2.5, 5, 10, 30] # seconds
+INSTRUMENTATION_BYTE_BUCKETS = [256, 1024, 4096, 16384, 65536, 262144,
+    1048576, 4194304, 16777216] # bytes
+
 MAC_ADDRESS_REGEX = re.compile(":".join(["[0-9a-f]{2}"] * 6))
@@ -0,0 +1,439 @@
+#!/usr/bin/env python3
+# System modules
+import os
+import json
+import logging
+import datetime
+import threading
+import urllib.parse
+
+# External modules
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+# Internal modules
+from . import utils
+
+
+# Variables
+# seconds per partition
+PARTITION_SECONDS = 86400
+
+# the index file in the store directory
+INDEX_FILENAME = "index.json"
+
+# the log of index updates since the index file was written and the size it
+# has to reach (and the size of the index file) before it is merged into the
+# index file
+INDEX_LOG_FILENAME = "index.log"
+INDEX_LOG_COMPACT_BYTES = 1024 * 1024
+
+# file name and dtype of the time column and the file extension and dtype of
+# the measurement columns (little endian, so the files are portable)
+TIME_FILENAME = "time.i8"
+TIME_DTYPE = np.dtype("<i8")
+COLUMN_EXTENSION = ".f8"
+COLUMN_DTYPE = np.dtype("<f8")
+
+EPOCH = pd.Timestamp(0, tz = "UTC")
+
+
+def to_seconds(index):
+    """ Convert times to UNIX seconds
+
+    Args:
+        index (DatetimeIndex or array-like): the times. Naive times are UTC.
+
+    Returns:
+        numpy.ndarray of int64: the UNIX timestamps
+    """
+    times = pd.DatetimeIndex(pd.to_datetime(index, utc = True))
+    return np.asarray((times - EPOCH) // pd.Timedelta(seconds = 1),
+        dtype = np.int64)
+
+def partition_name(day):
+    """ The directory name of a partition
+
+    Args:
+        day (int): days since 1970-01-01
+
+    Returns:
+        str: the date as YYYY-MM-DD
+    """
+    return (datetime.date(1970,1,1) + datetime.timedelta(days = int(day))
+        ).isoformat()
+
+def quote(name):
+    """ Make a station or column name safe to use as a file name
+    """
+    return urllib.parse.quote(str(name), safe = "")
+
+
+class MeasurementStore(object):
+    """ Local time-series store for measurements. The measurements are kept in
+    one directory per station and day (the partitions) with one append-only
+    binary file per column, which can be memory-mapped. An index file records
+    the number of rows, the time range and the columns of every partition, so
+    range queries only touch the partitions they need. Appends don't rewrite
+    the index file but add the changed entries to an index log, which is
+    merged into the index file once it is larger than it. The index is only
+    updated after the column files were written, so rows of an interrupted
+    append are ignored and overwritten by the next append.
+
+    Args:
+        directory (str): the store directory. It is created if necessary.
+    """
+    def __init__(self, directory):
+        self.directory = directory
+        self._lock = threading.RLock()
+        # station -> partition name -> {"n","start","end","sorted","columns"}
+        self._index = utils.read_json_from_file(self.index_file, cache = False)
+        # (station, partition name) of the entries not written yet
+        self._unwritten = set()
+        self.replay_index_log()
+
+    ##################
+    ### Properties ###
+    ##################
+    @property
+    def logger(self):
+        """ the logging.Logger used for logging.
+        Defaults to logging.getLogger(__name__).
+        """
+        try: # try to return the internal property
+            return self._logger
+        except AttributeError: # didn't work
+            return logging.getLogger(__name__) # return default logger
+
+    @logger.setter
+    def logger(self, logger):
+        assert isinstance(logger, logging.Logger), \
+            "logger property has to be a logging.Logger"
+        self._logger = logger
+
+    @property
+    def directory(self):
+        """ the store directory
+        """
+        return self._directory
+
+    @directory.setter
+    def directory(self, value):
+        assert isinstance(value, str), "directory has to be a str"
+        os.makedirs(value, exist_ok = True)
+        self._directory = value
+
+    @property
+    def index_file(self):
+        """ [read only] the path of the index file
+        """
+        return os.path.join(self.directory, INDEX_FILENAME)
+
+    @property
+    def index_log_file(self):
+        """ [read only] the path of the index log file
+        """
+        return os.path.join(self.directory, INDEX_LOG_FILENAME)
+
+    @property
+    def stations(self):
+        """ [read only] sorted list of the stored stations
+        """
+        with self._lock:
+            return sorted(self._index)
+
+    ###############
+    ### Methods ###
+    ###############
+    def partition_directory(self, station, name):
+        """ The directory of a partition
+        """
+        return os.path.join(self.directory, quote(station), name)
+
+    def partitions(self, station, start = None, end = None):
+        """ The partitions of a station overlapping a time range
+
+        Args:
+            station (str): the station
+            start, end (int, optional): UNIX timestamps of the range
+                (inclusive). Default to no limit.
+
+        Returns:
+            list of (name, entry): the partition names and their index
+                entries in order of time
+        """
+        with self._lock:
+            partitions = self._index.get(station, {})
+            return [(name, entry.copy()) for name, entry in
+                sorted(partitions.items()) if
+                (start is None or entry["end"] >= start) and
+                (end is None or entry["start"] <= end)]
+
+    def append(self, station, df):
+        """ Append measurements of a station and write the index
+
+        Args:
+            station (str): the station, e.g. a device id, 'device_id/module_id'
+                or a public station id
+            df (pandas.DataFrame): the measurements with a DatetimeIndex and
+                numeric columns, e.g. GetmeasureResponse.dataframe
+        """
+        with self._lock:
+            self.append_arrays(station, to_seconds(df.index),
+                {c: np.asarray(df[c], dtype = float) for c in df.columns})
+            self.write_index()
+
+    def append_arrays(self, station, times, values):
+        """ Append measurements of a station without writing the index. The
+        rows are ignored after a restart until write_index is called.
+
+        Args:
+            station (str): see append
+            times (numpy.ndarray): UNIX timestamps of the rows
+            values (dict): column name -> numpy.ndarray of the row values
+        """
+        station = str(station)
+        values = {str(c): v for c, v in values.items()}
+        days = times // PARTITION_SECONDS
+        with self._lock:
+            for day in np.unique(days):
+                rows = days == day
+                self.append_partition(station, partition_name(day),
+                    times[rows], {c: v[rows] for c, v in values.items()})
+
+    def write_index(self):
+        """ Write the index entries changed since the last call to the index
+        log. This costs about the size of the changes, not of the whole
+        index. The log is merged into the index file with compact_index once
+        it is larger than INDEX_LOG_COMPACT_BYTES and the index file.
+
+        Raises:
+            OSError: if the index could not be written
+        """
+        with self._lock:
+            if not self._unwritten:
+                return
+            changes = {}
+            for station, name in self._unwritten:
+                changes.setdefault(station, {})[name] = \
+                    self._index[station][name]
+            line = json.dumps(changes, sort_keys = True,
+                separators = (",",":")) + "\n"
+            with open(self.index_log_file, "ab") as f:
+                f.write(line.encode())
+                f.flush()
+                os.fsync(f.fileno())
+                size = f.tell()
+            self._unwritten.clear()
+            try: index_size = os.path.getsize(self.index_file)
+            except OSError: index_size = 0
+            if size > max(INDEX_LOG_COMPACT_BYTES, index_size):
+                self.compact_index()
+
+    def compact_index(self):
+        """ Write the whole index atomically to the index file and empty the
+        index log
+
+        Raises:
+            OSError: if the index could not be written
+        """
+        with self._lock:
+            if not utils.write_json_to_file(self._index, self.index_file,
+                atomic = True, fsync = True):
+                raise OSError("could not write the index '{}'".format(
+                    self.index_file))
+            self._unwritten.clear()
+            # replaying the log again would not change the index
+            with open(self.index_log_file, "wb"):
+                pass
+
+    def replay_index_log(self):
+        """ Apply the index log to the index read from the index file. An
+        incomplete last line of an interrupted write_index is dropped.
+        """
+        with self._lock:
+            try:
+                f = open(self.index_log_file, "rb+")
+            except FileNotFoundError:
+                return
+            with f:
+                valid = 0
+                for line in iter(f.readline, b""):
+                    try:
+                        changes = json.loads(line)
+                    except ValueError:
+                        break
+                    if not line.endswith(b"\n"):
+                        break
+                    for station, partitions in changes.items():
+                        self._index.setdefault(station, {}).update(partitions)
+                    valid = f.tell()
+                f.truncate(valid)
+
+    def append_partition(self, station, name, times, values):
+        """ Append rows to the column files of a partition and update its
+        index entry (in memory)
+
+        Args:
+            station (str): the station
+            name (str): the partition name
+            times (numpy.ndarray): UNIX timestamps of the rows
+            values (dict): column name -> numpy.ndarray of the row values
+        """
+        directory = self.partition_directory(station, name)
+        os.makedirs(directory, exist_ok = True)
+        entry = self._index.get(station, {}).get(name, {"n":0,
+            "start":int(times.min()), "end":int(times.max()), "sorted":True,
+            "columns":[]})
+        n = entry["n"]
+        columns = entry["columns"] + [c for c in values
+            if c not in entry["columns"]]
+        def write(filename, data, dtype, keep = n):
+            with open(os.path.join(directory, filename), "ab") as f:
+                # drop the rows of an interrupted append
+                f.truncate(keep * dtype.itemsize)
+                np.asarray(data, dtype = dtype).tofile(f)
+        for column in columns:
+            data = values.get(column)
+            if data is None: # column not in this append
+                data = np.full(len(times), np.nan)
+            if column in entry["columns"]:
+                write(quote(column) + COLUMN_EXTENSION, data, COLUMN_DTYPE)
+            else: # new column, fill the previous rows with NaN
+                write(quote(column) + COLUMN_EXTENSION, np.concatenate(
+                    [np.full(n, np.nan), data]), COLUMN_DTYPE, keep = 0)
+        write(TIME_FILENAME, times, TIME_DTYPE)
+        entry["sorted"] = bool(entry["sorted"] and (n == 0 or
+            times[0] >= entry["end"]) and np.all(np.diff(times) >= 0))
+        entry.update(n = n + len(times), columns = columns,
+            start = min(entry["start"], int(times.min())),
+            end = max(entry["end"], int(times.max())))
+        self._index.setdefault(station, {})[name] = entry
+        self._unwritten.add((station, name))
+
+    def append_getmeasure(self, apiresponse, station = None):
+        """ Append the measurements of a Getmeasure response
+
+        Args:
+            apiresponse (GetmeasureResponse): the response
+            station (str, optional): the station. Defaults to
+                'device_id/module_id' or 'device_id' from the request. It is
+                required if the response's request was dropped.
+        """
+        if station is None:
+            if apiresponse.request is None:
+                raise ValueError("the request of the response was dropped, "
+                    "the station has to be given")
+            payload = apiresponse.request.payload
+            station = "/".join(str(payload[k]) for k in
+                ("device_id", "module_id") if payload.get(k))
+        self.append(station, apiresponse.dataframe)
+
+    def append_getpublicdata(self, apiresponse):
+        """ Append the measurements of a Getpublicdata response. Every station
+        is stored separately, every measurement at its own time.
+
+        Args:
+            apiresponse (GetpublicdataResponse): the response
+        """
+        self.append_publicdata(apiresponse.dataframe)
+
+    def append_publicdata(self, df):
+        """ Append the measurements of a Getpublicdata DataFrame. The index is
+        written once for all stations.
+
+        Args:
+            df (pandas.DataFrame): e.g. GetpublicdataResponse.dataframe or
+                GetpublicdataPoller.poll()
+        """
+        parts = []
+        for column in df.columns:
+            timecolumn = "time_{}".format(column)
+            if timecolumn not in df.columns:
+                continue
+            part = DataFrame({"station": df["id"], "time": df[timecolumn],
+                column: df[column]}).dropna(subset = ["time"])
+            part = part.set_index(["station", "time"])
+            # a station can appear twice in merged responses
+            parts.append(part[~part.index.duplicated(keep = "last")])
+        if not parts:
+            return
+        measurements = pd.concat(parts, axis = 1).sort_index(level = "station",
+            kind = "stable")
+        # convert once and split the arrays, pandas per station is slow
+        stations = measurements.index.get_level_values("station")
+        times = to_seconds(measurements.index.get_level_values("time"))
+        values = {c: np.asarray(measurements[c], dtype = float)
+            for c in measurements.columns}
+        starts = np.flatnonzero(np.r_[True, stations[1:] != stations[:-1]])
+        ends = np.r_[starts[1:], len(stations)]
+        with self._lock:
+            for start, end in zip(starts, ends):
+                rows = slice(start, end)
+                self.append_arrays(stations[start], times[rows],
+                    {c: v[rows] for c, v in values.items()})
+            self.write_index()
+
+    def query(self, station, start = None, end = None, columns = None):
+        """ Read the measurements of a station in a time range. Only the
+        partitions overlapping the range are read.
+
+        Args:
+            station (str): the station
+            start, end (datetime-like, optional): the time range (inclusive).
+                Naive times are UTC. Default to no limit.
+            columns (list of str, optional): the columns to read. Defaults to
+                all columns.
+
+        Returns:
+            pandas.DataFrame: the measurements with a DatetimeIndex in UTC
+                sorted by time
+        """
+        start = None if start is None else int(to_seconds([start])[0])
+        end = None if end is None else int(to_seconds([end])[0])
+        partitions = self.partitions(station, start = start, end = end)
+        if columns is None:
+            columns = []
+            for name, entry in partitions:
+                columns += [c for c in entry["columns"] if c not in columns]
+        times, values = [], {c: [] for c in columns}
+        for name, entry in partitions:
+            directory = self.partition_directory(station, name)
+            t = np.memmap(os.path.join(directory, TIME_FILENAME),
+                dtype = TIME_DTYPE, mode = "r", shape = (entry["n"],))
+            if entry["sorted"]:
+                lo = 0 if start is None else np.searchsorted(t, start, "left")
+                hi = len(t) if end is None else \
+                    np.searchsorted(t, end, "right")
+                rows = slice(lo, hi)
+            else:
+                rows = np.ones(len(t), dtype = bool)
+                if start is not None: rows &= t >= start
+                if end is not None: rows &= t <= end
+            times.append(np.array(t[rows]))
+            for column in columns:
+                if column in entry["columns"]:
+                    v = np.memmap(os.path.join(directory,
+                        quote(column) + COLUMN_EXTENSION),
+                        dtype = COLUMN_DTYPE, mode = "r",
+                        shape = (entry["n"],))
+                    values[column].append(np.array(v[rows]))
+                else:
+                    values[column].append(np.full(len(times[-1]), np.nan))
+        times = np.concatenate(times) if times else np.array([], dtype=int)
+        df = DataFrame(
+            {c: np.concatenate(v) if v else np.array([], dtype = float)
+                for c, v in values.items()},
+            columns = columns,
+            index = pd.DatetimeIndex(pd.to_datetime(times, unit = "s",
+                utc = True), name = "time"))
+        df.sort_index(inplace = True, kind = "stable")
+        return df
+
+    def __repr__(self):
+        """ python representation of this object
+        """
+        return "{module}.{name}(directory = {directory})".format(
+            name=self.__class__.__name__,module=self.__class__.__module__,
+            directory=json.dumps(self.directory))
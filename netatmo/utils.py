@@ -1,6 +1,11 @@
 #!/usr/bin/env python3
 # System modules
+import os
 import json
+import copy
+import tempfile
+import threading
+import collections
 
 # External modules
 
@@ -10,37 +15,106 @@ import json
 # Variables
 EMPTY_JSON = {}
 
+# number of files read_json_from_file keeps parsed in memory
+JSON_READ_CACHE_SIZE = 32
+
+# cache of read_json_from_file
+# absolute filename -> ((mtime_ns, size, inode), parsed content)
+JSON_READ_CACHE = collections.OrderedDict()
+JSON_READ_CACHE_LOCK = threading.Lock()
+
 # read json from a filename
-def read_json_from_file(filename):
+def read_json_from_file(filename, cache = True):
     """
     read json from a file given then filename
     args:
         filename (str): The path to the file to read
+        cache (bool, optional): keep the parsed content in memory and only
+            parse the file again if its modification time, size or inode
+            changed. A cache hit only stats the file and doesn't open it.
+            Rewrites in place that keep the size within the resolution of
+            the modification time go unnoticed, atomic writes with
+            write_json_to_file always change the inode. A copy is returned,
+            so the cache can't be modified. Defaults to True.
     returns:
         dict, empty dict if error occured during read
     """
     try: # open and read, return result
-        with open(filename, "r") as f:
-            return json.load(f)
-    except: # didn't work, return empty dict
+        if not cache:
+            with open(filename, "r") as f:
+                return json.load(f)
+        key = os.path.abspath(filename)
+        stat = os.stat(filename)
+        version = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+        with JSON_READ_CACHE_LOCK:
+            cached = JSON_READ_CACHE.get(key)
+        if cached is None or cached[0] != version: # (re)read
+            with open(filename, "r") as f:
+                # the version of what is actually parsed
+                stat = os.fstat(f.fileno())
+                cached = ((stat.st_mtime_ns, stat.st_size, stat.st_ino),
+                    json.load(f))
+            with JSON_READ_CACHE_LOCK:
+                JSON_READ_CACHE[key] = cached
+                JSON_READ_CACHE.move_to_end(key)
+                while len(JSON_READ_CACHE) > JSON_READ_CACHE_SIZE:
+                    JSON_READ_CACHE.popitem(last = False)
+        return copy.deepcopy(cached[1])
+    except (OSError, ValueError): # didn't work, return empty dict
         return {}
 
 # write json to file
-def write_json_to_file(data, filename):
+def write_json_to_file(data, filename, atomic = False, fsync = False,
+    compact = False):
     """
     write data to json file
     args:
         filename (str): the json file to write the data to
         data (dict): the data to write to the file
+        atomic (bool, optional): write to a temporary file in the same
+            directory first and rename it to filename, so that readers never
+            see a half-written file. The mode of an existing file is kept, a
+            new file is only readable and writable by the owner (0600).
+            Defaults to False.
+        fsync (bool, optional): flush the data to disk before returning.
+            Defaults to False.
+        compact (bool, optional): write compact instead of pretty-printed
+            JSON. Defaults to False.
     returns:
         True on success, False otherwise
     """
     try:
-        jsonstr = json.dumps(data,sort_keys=True,indent=4) # try to convert
-        # write to file
-        with open(filename, "w") as f: f.write(jsonstr)
+        if compact:
+            jsonstr = json.dumps(data,sort_keys=True,separators=(",",":"))
+        else:
+            jsonstr = json.dumps(data,sort_keys=True,indent=4) # try to convert
+        if atomic:
+            directory = os.path.dirname(os.path.abspath(filename))
+            fd, tmpname = tempfile.mkstemp(dir = directory,
+                prefix = ".{}.".format(os.path.basename(filename)))
+            try:
+                with os.fdopen(fd, "w") as f:
+                    f.write(jsonstr)
+                    if fsync:
+                        f.flush()
+                        os.fsync(f.fileno())
+                try: # keep the mode of the file that is replaced
+                    os.chmod(tmpname, os.stat(filename).st_mode & 0o7777)
+                except FileNotFoundError:
+                    pass
+                os.replace(tmpname, filename)
+            except BaseException:
+                os.unlink(tmpname)
+                raise
+        else:
+            # write to file
+            with open(filename, "w") as f:
+                f.write(jsonstr)
+                if fsync:
+                    f.flush()
+                    os.fsync(f.fileno())
         return True
-    except:
+    except (OSError, TypeError, ValueError):
         return False
 
 # do nothing
@@ -24,7 +24,8 @@ setup(
     url = 'https://github.com/nobodyinperson/python3-netatmo',
     classifiers = [
 	'License :: OSI Approved :: GNU General Public License v3 (GPLv3)',
-	'Programming Language :: Python :: 3.5',
+	'Programming Language :: Python :: 3.7',
+	'Programming Language :: Python :: 3.8',
 	'Operating System :: OS Independent',
 	'Topic :: Home Automation',
 	'Topic :: Internet',
@@ -32,6 +33,7 @@ setup(
 	'Topic :: Software Development :: Libraries :: Python Modules',
 	'Topic :: Utilities',
         ],
+    python_requires = '>=3.7',
     test_suite = 'tests',
     tests_require = [ 'pandas', 'numpy' ],
     install_requires = [ 'pandas', 'numpy' ],
@@ -8,13 +8,25 @@ import os
 # Internal modules
 
 from . import authentication
+from . import cache
 from . import client
+from . import instrumentation
+from . import jsonstream
+from . import poller
+from . import ratelimit
+from . import requests
+from . import responsetypes
+from . import retry
+from . import storage
+from . import tokenstores
 from . import utils
 
 from . import test_data
 from . import test_flow
 
-__all__ = ['authentication','client','utils']
+__all__ = ['authentication','cache','client','instrumentation','jsonstream',
+    'poller','ratelimit','requests','responsetypes','retry','storage',
+    'tokenstores','utils']
 
 def runtest(module, verbose=False, offline=False):
     if verbose:
@@ -31,7 +43,9 @@ def runtest(module, verbose=False, offline=False):
 
 # run all tests
 def runall(verbose=False, offline=False):
-    for module in [authentication,client,utils]:
+    for module in [authentication,cache,client,instrumentation,jsonstream,
+        poller,ratelimit,requests,responsetypes,retry,storage,tokenstores,
+        utils]:
         runtest(module=module,verbose=verbose,offline=offline)
         print()
 
@@ -6,9 +6,12 @@ import os
 import shutil
 import json
 import time
+import asyncio
+import threading
 
 # import authentication module
 from netatmo.api import authentication
+from netatmo.api import tokenstores
 # import test data
 from .test_data import *
 from .test_flow import *
@@ -681,6 +684,257 @@ class AuthenticationAutomaticRequestsTest(AuthenticationTest):
         # tokens should be outdated
         self.assertFalse(self.auth.tokens_are_up_to_date)
 
+    @testname("fresh tokens are returned without the full up-to-date check")
+    @unittest.skipIf(SKIPALL,"skipping all tests")
+    def test_FreshTokensFastPath(self):
+        tokens = EXAMPLE_TOKENS.copy()
+        tokens["token_request_time"] = time.time()
+        self.auth.tokens = tokens
+        self.assertEqual(self.auth.tokens, tokens) # determines validity
+        checks = []
+        self.auth.make_sure_tokens_are_up_to_date = lambda: checks.append(1)
+        for i in range(10):
+            self.assertEqual(self.auth.tokens, tokens)
+        self.assertEqual(checks, [])
+        self.assertAlmostEqual(self.auth.tokens_expire_at,
+            tokens["token_request_time"] + authentication.DEFAULT_EXPIRE_TIME)
+        # setting new tokens requires a full check again
+        self.auth.tokens = EXAMPLE_TOKENS_2.copy()
+        self.assertEqual(self.auth.tokens, EXAMPLE_TOKENS_2)
+        self.assertEqual(checks, [1])
+
+    @testname("tokens about to expire get the full up-to-date check")
+    @unittest.skipIf(SKIPALL,"skipping all tests")
+    def test_ExpiringTokensNoFastPath(self):
+        tokens = EXAMPLE_TOKENS.copy()
+        tokens["token_request_time"] = time.time() - \
+            authentication.DEFAULT_EXPIRE_TIME + 10 # expires in 10 seconds
+        self.auth.tokens = tokens
+        self.auth.token_expiry_margin = 60
+        self.auth.tokens
+        checks = []
+        self.auth.make_sure_tokens_are_up_to_date = lambda: checks.append(1)
+        self.auth.tokens
+        self.auth.tokens
+        self.assertEqual(checks, [1, 1])
+
+
+#####################################
+### test the background refresher ###
+#####################################
+class AuthenticationBackgroundRefreshTest(AuthenticationTest):
+    # execute this before each test method
+    def setUp(self):
+        self.auth = authentication.Authentication(
+            credentials = EXAMPLE_CREDENTIALS.copy())
+        tokens = EXAMPLE_TOKENS.copy()
+        # the tokens expire in 0.3 seconds
+        tokens["token_request_time"] = time.time() - \
+            authentication.DEFAULT_EXPIRE_TIME + 0.3
+        self.auth.tokens = tokens
+        # fake the refresh request
+        self.refreshs = []
+        def refresh():
+            self.refreshs.append(time.time())
+            tokens = EXAMPLE_TOKENS_2.copy()
+            tokens["token_request_time"] = time.time()
+            self.auth.tokens = tokens
+        self.auth.refresh_current_tokens = refresh
+
+    # execute this after each test method
+    def tearDown(self):
+        self.auth.stop_background_refresh()
+        self.auth = None
+
+    @testname("wait until margin before expiry")
+    def test_SecondsUntilBackgroundRefresh(self):
+        self.assertAlmostEqual(
+            self.auth.seconds_until_background_refresh(margin = 0.1),
+            0.2, places = 1)
+        self.assertEqual(
+            self.auth.seconds_until_background_refresh(margin = 10), 0)
+        self.auth = authentication.Authentication() # no credentials
+        self.assertIsNone(self.auth.seconds_until_background_refresh(1))
+
+    @testname("refresh thread renews tokens before they expire")
+    def test_BackgroundRefreshThread(self):
+        self.auth.start_background_refresh(margin = 0.2)
+        self.assertTrue(self.auth.background_refresh_running)
+        time.sleep(0.5)
+        self.assertEqual(len(self.refreshs), 1)
+        self.assertEqual(self.auth.tokens["access_token"],
+            EXAMPLE_TOKENS_2["access_token"])
+        self.auth.stop_background_refresh()
+        self.assertFalse(self.auth.background_refresh_running)
+
+    @testname("failed refresh is retried later")
+    def test_BackgroundRefreshFailure(self):
+        def refresh():
+            self.refreshs.append(time.time())
+            raise OSError("server down")
+        self.auth.refresh_current_tokens = refresh
+        wait = self.auth.background_refresh_step(margin = 1)
+        self.assertEqual(wait, authentication.BACKGROUND_REFRESH_RETRY)
+        self.assertEqual(len(self.refreshs), 1)
+
+    @testname("refresh task renews tokens before they expire")
+    def test_BackgroundRefreshTask(self):
+        async def refresh():
+            self.refreshs.append(time.time())
+            tokens = EXAMPLE_TOKENS_2.copy()
+            tokens["token_request_time"] = time.time()
+            self.auth.tokens = tokens
+        self.auth.refresh_current_tokens_async = refresh
+        async def run_task():
+            task = asyncio.ensure_future(
+                self.auth.refresh_in_background(margin = 0.2))
+            await asyncio.sleep(0.5)
+            task.cancel()
+        asyncio.run(run_task())
+        self.assertEqual(len(self.refreshs), 1)
+
+    @testname("refresh waits after renewing tokens expiring within the margin")
+    def test_BackgroundRefreshMinWait(self):
+        def refresh():
+            self.refreshs.append(time.time())
+            tokens = EXAMPLE_TOKENS_2.copy()
+            tokens["expires_in"] = 100 # shorter than the margin
+            tokens["token_request_time"] = time.time()
+            self.auth.tokens = tokens
+        async def refresh_async():
+            refresh()
+        self.auth.refresh_current_tokens = refresh
+        self.auth.refresh_current_tokens_async = refresh_async
+        self.assertGreaterEqual(self.auth.background_refresh_step(margin=300),
+            authentication.BACKGROUND_REFRESH_MIN_WAIT)
+        self.assertGreaterEqual(asyncio.run(
+            self.auth.background_refresh_step_async(margin = 300)),
+            authentication.BACKGROUND_REFRESH_MIN_WAIT)
+        self.assertEqual(len(self.refreshs), 2)
+
+
+######################################
+### test the single-flight refresh ###
+######################################
+class AuthenticationSingleFlightTest(AuthenticationTest):
+    # execute this before each test method
+    def setUp(self):
+        self.auth = authentication.Authentication(
+            credentials = EXAMPLE_CREDENTIALS.copy())
+        tokens = EXAMPLE_TOKENS.copy()
+        # the tokens have expired
+        tokens["token_request_time"] = time.time() - \
+            authentication.DEFAULT_EXPIRE_TIME - 1
+        self.auth.tokens = tokens
+        # fake a slow refresh request
+        self.refreshs = []
+        def refresh():
+            self.refreshs.append(threading.current_thread())
+            time.sleep(0.1)
+            if self.error:
+                raise self.error
+            tokens = EXAMPLE_TOKENS_2.copy()
+            tokens["token_request_time"] = time.time()
+            self.auth.tokens = tokens
+        self.error = None
+        self.auth.refresh_current_tokens = refresh
+
+    # execute this after each test method
+    def tearDown(self):
+        self.auth = None
+
+    # access the tokens from several threads at once
+    def get_tokens_concurrently(self, n = 8):
+        results = [None] * n
+        def get(i):
+            try: results[i] = self.auth.tokens
+            except BaseException as e: results[i] = e
+        threads = [threading.Thread(target = get, args = (i,))
+            for i in range(n)]
+        for thread in threads: thread.start()
+        for thread in threads: thread.join()
+        return results
+
+    @testname("concurrent token getters refresh only once")
+    def test_SingleRefresh(self):
+        results = self.get_tokens_concurrently()
+        self.assertEqual(len(self.refreshs), 1)
+        for tokens in results:
+            self.assertEqual(tokens["access_token"],
+                EXAMPLE_TOKENS_2["access_token"])
+        self.assertEqual(self.auth.token_update_state,
+            authentication.TOKEN_UPDATE_IDLE)
+
+    @testname("waiting token getters raise a copy of the refresh error")
+    def test_SharedError(self):
+        self.error = OSError("server down")
+        results = self.get_tokens_concurrently()
+        self.assertEqual(len(self.refreshs), 1)
+        for error in results:
+            self.assertIsInstance(error, OSError)
+            self.assertEqual(error.args, self.error.args)
+        # only the updating thread raises the original
+        self.assertEqual(sum(error is self.error for error in results), 1)
+        self.assertEqual(len(set(map(id, results))), len(results))
+        self.assertEqual(self.auth.token_update_state,
+            authentication.TOKEN_UPDATE_IDLE)
+
+    @testname("coroutines and threads refresh only once")
+    def test_SingleRefreshAsync(self):
+        async def refresh_async():
+            self.refreshs.append(threading.current_thread())
+            await asyncio.sleep(0.1)
+            tokens = EXAMPLE_TOKENS_2.copy()
+            tokens["token_request_time"] = time.time()
+            self.auth.tokens = tokens
+        self.auth.refresh_current_tokens_async = refresh_async
+        async def refresh_concurrently():
+            await asyncio.gather(*[
+                self.auth.make_sure_tokens_are_up_to_date_async()
+                for i in range(4)])
+        thread = threading.Thread(target = lambda: self.auth.tokens)
+        thread.start()
+        asyncio.run(refresh_concurrently())
+        thread.join()
+        self.assertEqual(len(self.refreshs), 1)
+        self.assertEqual(self.auth.token_update_state,
+            authentication.TOKEN_UPDATE_IDLE)
+
+    @testname("coroutines refresh with the token store locked")
+    def test_SingleRefreshAsyncTokenStore(self):
+        removeTMPAUTHFILE()
+        self.addCleanup(removeTMPAUTHFILE)
+        store = tokenstores.JSONFileTokenStore(TMPAUTHFILE)
+        locked = []
+        def refresh():
+            locked.append(store._lock_depth)
+            self.refreshs.append(threading.current_thread())
+            tokens = EXAMPLE_TOKENS_2.copy()
+            tokens["token_request_time"] = time.time()
+            self.auth.tokens = tokens
+        self.auth.refresh_current_tokens = refresh
+        self.auth.token_store = store
+        async def refresh_concurrently():
+            await asyncio.gather(*[
+                self.auth.make_sure_tokens_are_up_to_date_async()
+                for i in range(4)])
+        asyncio.run(refresh_concurrently())
+        self.assertEqual(locked, [1])
+        self.assertIsNot(self.refreshs[0], threading.current_thread())
+        self.assertEqual(store.read()["access_token"],
+            EXAMPLE_TOKENS_2["access_token"])
+
+    @testname("recursion preventer is local to the thread")
+    def test_ThreadLocalRecursionPreventer(self):
+        seen = []
+        with self.auth.no_token_getter_recursion():
+            thread = threading.Thread(target = lambda:
+                seen.append(self.auth.token_getter_in_progress))
+            thread.start()
+            thread.join()
+            self.assertTrue(self.auth.token_getter_in_progress)
+        self.assertEqual(seen, [False])
+
 
 def run():
     # run the tests
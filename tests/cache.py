@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+# system modules
+import unittest
+import logging
+import os
+import time
+import asyncio
+import http.client
+
+# import cache module
+from netatmo.api import cache
+from netatmo.api import client
+from netatmo.api import requests
+from netatmo.api import responsetypes
+from netatmo.api import authentication
+from netatmo.api import connectionpool
+from netatmo.api.variables import *
+# import test data
+from .test_data import *
+from .test_flow import *
+
+# get a logger
+logger = logging.getLogger(__name__)
+
+TMPCACHEDIR = os.path.join(TMPDIR,"cache")
+
+# a Getstationsdata request to a device
+def example_request(device_id = "70:ee:50:00:00:01", access_token = "a|b"):
+    return requests.GetstationsdataRequest(payload = {
+        "device_id": device_id, "get_favourites": "false",
+        "access_token": access_token})
+
+# a response to a request
+def example_response(apirequest, body = EXAMPLE_JSON):
+    return apirequest.response_class(request = apirequest,
+        response = {"status":"ok", "body":body})
+
+
+#####################
+### test the keys ###
+#####################
+class CacheKeyTest(BasicTest):
+    @testname("cache key ignores the access token")
+    def test_IgnoreAccessToken(self):
+        self.assertEqual(
+            cache.cache_key("/url", {"a":1, "access_token":"x"}),
+            cache.cache_key("/url", {"a":"1", "access_token":"y"}))
+
+    @testname("cache key depends on url and payload")
+    def test_UrlAndPayload(self):
+        keys = {cache.cache_key("/url", {"a":1}),
+            cache.cache_key("/other", {"a":1}),
+            cache.cache_key("/url", {"a":2}),
+            cache.cache_key("/url", {"a":1, "b":1})}
+        self.assertEqual(len(keys), 4)
+
+
+#########################
+### test the backends ###
+#########################
+class ResponseCacheTest(BasicTest):
+    # execute this before each test method
+    def setUp(self):
+        self.caches = [
+            cache.MemoryResponseCache(),
+            cache.DiskResponseCache(TMPCACHEDIR),
+            ]
+
+    # execute this after each test method
+    def tearDown(self):
+        for c in self.caches:
+            c.clear()
+
+    @testname("cached responses are returned")
+    def test_PutGet(self):
+        for c in self.caches:
+            apirequest = example_request()
+            self.assertIsNone(c.get(apirequest))
+            c.put(apirequest, example_response(apirequest))
+            # same request with another access token
+            cached = c.get(example_request(access_token = "c|d"))
+            self.assertIsInstance(cached,
+                responsetypes.GetstationsdataResponse)
+            self.assertEqual(cached.response["body"], EXAMPLE_JSON)
+            self.assertIsNone(c.get(example_request(
+                device_id = "70:ee:50:00:00:02")))
+            self.assertEqual(c.statistics["hits"], 1)
+            self.assertEqual(c.statistics["misses"], 2)
+
+    @testname("responses expire")
+    def test_Expiry(self):
+        for c in self.caches:
+            c.ttls = {NETATMO_API_GETSTATIONSDATA_URL: 0.01}
+            apirequest = example_request()
+            c.put(apirequest, example_response(apirequest))
+            self.assertIsNotNone(c.get(apirequest))
+            time.sleep(0.02)
+            self.assertIsNone(c.get(apirequest))
+
+    @testname("endpoints without ttl are not cached")
+    def test_NoTtl(self):
+        for c in self.caches:
+            c.ttls = {}
+            apirequest = example_request()
+            c.put(apirequest, example_response(apirequest))
+            self.assertIsNone(c.get(apirequest))
+            self.assertEqual(c.statistics["stores"], 0)
+
+    @testname("least recently used responses are evicted")
+    def test_Eviction(self):
+        for c in self.caches:
+            body = {"data":"x" * 1000}
+            apirequests = [example_request(device_id = 
+                "70:ee:50:00:00:0{}".format(i)) for i in range(4)]
+            for apirequest in apirequests[:3]:
+                c.put(apirequest, example_response(apirequest, body))
+                time.sleep(0.01) # distinct file times
+            # room for three and a half responses
+            nbytes = c.nbytes if hasattr(c, "nbytes") else \
+                sum(size for mtime, size, filename in c.files())
+            c.maxbytes = nbytes + nbytes // 6
+            c.get(apirequests[0]) # use the first one
+            time.sleep(0.01)
+            c.put(apirequests[3], example_response(apirequests[3], body))
+            self.assertIsNotNone(c.get(apirequests[0]))
+            self.assertIsNone(c.get(apirequests[1]))
+            self.assertIsNotNone(c.get(apirequests[3]))
+            self.assertEqual(c.statistics["evictions"], 1)
+
+    @testname("the received size of responses is used")
+    def test_ReceivedSize(self):
+        c = self.caches[0]
+        apirequest = example_request()
+        apiresponse = example_response(apirequest)
+        apiresponse.nbytes = 123
+        c.put(apirequest, apiresponse)
+        self.assertEqual(c.nbytes, 123)
+
+    @testname("disk cache keeps a running total instead of scanning")
+    def test_RunningTotal(self):
+        c = self.caches[1]
+        scans = []
+        files = c.files
+        def counted():
+            scans.append(1)
+            return files()
+        c.files = counted
+        try:
+            for i in range(20):
+                apirequest = example_request(
+                    device_id = "70:ee:50:00:00:{:02d}".format(i))
+                c.put(apirequest, example_response(apirequest))
+            self.assertLessEqual(len(scans), 1)
+        finally:
+            del c.files
+        self.assertEqual(c.nbytes,
+            sum(size for mtime, size, filename in c.files()))
+        c.discard(cache.cache_key(apirequest.url, apirequest.payload))
+        self.assertEqual(c.nbytes,
+            sum(size for mtime, size, filename in c.files()))
+
+    @testname("access token is not written to disk")
+    def test_NoTokenOnDisk(self):
+        c = self.caches[1]
+        apirequest = example_request(access_token = "secret|token")
+        c.put(apirequest, example_response(apirequest))
+        for name in os.listdir(TMPCACHEDIR):
+            with open(os.path.join(TMPCACHEDIR, name)) as f:
+                self.assertNotIn("secret", f.read())
+
+
+#####################################
+### test the cache in the clients ###
+#####################################
+class ClientCacheTest(BasicTest):
+    # execute this before each test method
+    def setUp(self):
+        self.server = LocalJSONServer(response = {"status":"ok",
+            "body":EXAMPLE_JSON}).__enter__()
+        tokens = EXAMPLE_TOKENS.copy()
+        tokens["token_request_time"] = time.time()
+        self.auth = authentication.Authentication(tokens = tokens)
+        self.pool = connectionpool.ConnectionPool(
+            connection_class = http.client.HTTPConnection)
+
+    # execute this after each test method
+    def tearDown(self):
+        self.pool.clear()
+        self.server.__exit__()
+
+    # create a request to the local server
+    def request(self):
+        apirequest = example_request()
+        del apirequest.payload["access_token"]
+        apirequest.server = self.server.address
+        apirequest.connection_pool = self.pool
+        return apirequest
+
+    @testname("client returns cached responses")
+    def test_Client(self):
+        c = client.NetatmoClient(authentication = self.auth,
+            cache = cache.MemoryResponseCache())
+        first = c.issue(self.request())
+        second = c.issue(self.request())
+        self.assertIs(first, second)
+        self.assertEqual(len(self.server.requests), 1)
+        # the received size was recorded
+        self.assertGreater(first.nbytes, 0)
+        self.assertEqual(c.cache.nbytes, first.nbytes)
+        # the access token was sent
+        self.assertIn("access_token", self.server.requests[0][1])
+
+    @testname("async client returns cached responses")
+    def test_AsyncClient(self):
+        c = client.AsyncNetatmoClient(authentication = self.auth,
+            cache = cache.MemoryResponseCache())
+        async def issue_twice():
+            first = await c.issue(self.request())
+            second = await c.issue(self.request())
+            return first, second
+        first, second = self.run_async(issue_twice(), self.pool)
+        self.assertIs(first, second)
+        self.assertEqual(len(self.server.requests), 1)
+
+    @testname("no caching by default")
+    def test_NoCache(self):
+        c = client.NetatmoClient(authentication = self.auth)
+        self.assertIsNone(c.cache)
+        c.issue(self.request())
+        c.issue(self.request())
+        self.assertEqual(len(self.server.requests), 2)
+
+
+def run():
+    # run the tests
+    logger.info("=== CACHE TESTS ===")
+    unittest.main(exit=False,module=__name__)
+    logger.info("=== END OF CACHE TESTS ===")
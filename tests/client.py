@@ -7,15 +7,20 @@ import shutil
 import json
 import time
 import http.client
+import asyncio
 import pandas
 
 # import authentication module
 from netatmo.api import authentication
 # import client module
 from netatmo.api import client
+# import requests modules
+from netatmo.api import requests
+from netatmo.api import connectionpool
 # import test data
 from .test_data import *
 from .test_flow import *
+from .test_server import *
 
 # test settings
 OFFLINE = False # set to True to run only non-network tests
@@ -105,6 +110,329 @@ class ClientConstructorTest(ClientTest):
         # attribute should be the same
         self.assertEqual(self.client.authentication, auth)
         
+###################################
+### test the AsyncNetatmoClient ###
+###################################
+class AsyncClientTest(ClientTest):
+    # execute this before each test method
+    def setUp(self):
+        # a local server
+        self.server = LocalJSONServer(response = {"body":[]}).__enter__()
+        # a client with valid tokens
+        auth = authentication.Authentication(tokens = EXAMPLE_TOKENS.copy())
+        self.pool = connectionpool.ConnectionPool(
+            connection_class = http.client.HTTPConnection)
+        self.client = client.AsyncNetatmoClient(authentication = auth,
+            max_concurrency = 2, connection_pool = self.pool)
+
+    # execute this after each test method
+    def tearDown(self):
+        self.client = None
+        self.server.__exit__()
+
+    # create a request to the local server
+    def request(self):
+        request = requests.GetpublicdataRequest(
+            payload = self.client.Getpublicdata_payload(
+                region = HAMBURG_COORDINATES_OUTLINE))
+        request.server = self.server.address
+        return request
+
+    @testname("async client issues requests with access token")
+    def test_Issue(self):
+        async def issue_all():
+            try:
+                return await asyncio.gather(
+                    *[self.client.issue(self.request()) for i in range(5)])
+            finally:
+                await self.client.close()
+        responses = asyncio.run(issue_all())
+        for response in responses:
+            self.assertIsInstance(response,
+                client.responsetypes.GetpublicdataResponse)
+            self.assertEqual(response.request.payload["access_token"],
+                EXAMPLE_TOKENS["access_token"])
+        self.assertEqual(len(self.server.requests), 5)
+
+    @testname("async client checks input like the blocking client")
+    def test_InvalidInput(self):
+        with self.assertRaises(client.InvalidRegionError):
+            asyncio.run(self.client.Getpublicdata(region = {}))
+        with self.assertRaises(client.InvalidApiInputError):
+            asyncio.run(self.client.Getmeasure(device_id = "no mac"))
+        with self.assertRaises(client.InvalidApiInputError):
+            asyncio.run(self.client.Getstationsdata(device_id = "no mac"))
+
+################################################
+### test scanning regions with Getpublicdata ###
+################################################
+# a client answering Getpublicdata from synthetic stations with an api-like
+# limit on the number of returned stations
+class FakeGetpublicdataClient(client.NetatmoClient):
+    limit = 50
+    stations = example_stations_grid(HAMBURG_COORDINATES_OUTLINE, 30)
+    def Getpublicdata(self, region, required_data=None, filter=False):
+        self.Getpublicdata_payload(region, required_data, filter)
+        body = [ s for s in self.stations
+            if region["lat_sw"] <= s["place"]["location"][1] <= region["lat_ne"]
+            and region["lon_sw"] <= s["place"]["location"][0] <= region["lon_ne"]
+            ][:self.limit]
+        apirequest = requests.GetpublicdataRequest(payload = region.copy())
+        return apirequest.response_class(request = apirequest,
+            response = {"status":"ok", "body":body})
+
+class FakeAsyncGetpublicdataClient(client.AsyncNetatmoClient):
+    async def Getpublicdata(self, *args, **kwargs):
+        await asyncio.sleep(0)
+        return FakeGetpublicdataClient.Getpublicdata(self, *args, **kwargs)
+
+class GetpublicdataScanTest(ClientTest):
+    # execute this before each test method
+    def setUp(self):
+        self.client = FakeGetpublicdataClient()
+
+    # check that the scan found all stations exactly once
+    def check_response(self, response):
+        ids = [s["_id"] for s in response.response["body"]]
+        self.assertEqual(len(ids), len(set(ids)))
+        self.assertEqual(set(ids),
+            set(s["_id"] for s in self.client.stations))
+        self.assertEqual(len(response.dataframe), len(ids))
+
+    @testname("scan finds all stations of a saturated region")
+    def test_Scan(self):
+        # a single request is saturated
+        self.assertEqual(len(self.client.Getpublicdata(
+            HAMBURG_COORDINATES_OUTLINE).response["body"]), self.client.limit)
+        response = self.client.GetpublicdataScan(HAMBURG_COORDINATES_OUTLINE,
+            saturation = self.client.limit, max_workers = 4)
+        self.check_response(response)
+
+    @testname("async scan finds all stations of a saturated region")
+    def test_ScanAsync(self):
+        self.client = FakeAsyncGetpublicdataClient(
+            authentication = authentication.Authentication(
+                tokens = EXAMPLE_TOKENS.copy()))
+        self.client.limit = FakeGetpublicdataClient.limit
+        self.client.stations = FakeGetpublicdataClient.stations
+        response = asyncio.run(self.client.GetpublicdataScan(
+            HAMBURG_COORDINATES_OUTLINE, saturation = self.client.limit))
+        self.check_response(response)
+
+    @testname("scan keeps stations without '_id'")
+    def test_ScanWithoutId(self):
+        self.client.stations = [{k:v for k,v in s.items() if k != "_id"}
+            for s in FakeGetpublicdataClient.stations]
+        response = self.client.GetpublicdataScan(HAMBURG_COORDINATES_OUTLINE,
+            saturation = self.client.limit, max_workers = 4)
+        self.assertEqual(len(response.response["body"]),
+            len(self.client.stations))
+        # without coordinates they can't be told apart but are kept
+        stations = [{}, {}, {"_id":"a"}, {"_id":"a"}]
+        self.assertEqual(len(set(map(client.station_key, stations))), 3)
+
+    @testname("scan does not split below the minimum tile size")
+    def test_ScanMinTileSize(self):
+        response = self.client.GetpublicdataScan(HAMBURG_COORDINATES_OUTLINE,
+            saturation = self.client.limit, min_tile_size = 1)
+        self.assertEqual(len(response.response["body"]), self.client.limit)
+
+    @testname("scan checks the region")
+    def test_ScanInvalidRegion(self):
+        with self.assertRaises(client.InvalidRegionError):
+            self.client.GetpublicdataScan({"lat_ne":100})
+
+################################################
+### test fetching time spans with Getmeasure ###
+################################################
+# a client answering Getmeasure with synthetic measures every 5 minutes and
+# the api limit on the number of returned measures
+class FakeGetmeasureClient(client.NetatmoClient):
+    step = 300 # seconds between the measures
+    def Getmeasure(self, device_id, module_id=None, type=None, scale=None,
+        date_begin=None, date_end=None, real_time=False, optimize=False):
+        payload = self.Getmeasure_payload(device_id = device_id,
+            module_id = module_id, type = type, scale = scale,
+            date_begin = date_begin, date_end = date_end,
+            real_time = real_time, optimize = optimize)
+        ntypes = len(payload["type"].split(","))
+        step = self.step
+        first = -(-date_begin // step) * step # first multiple of step
+        times = list(range(first, date_end + 1, step))[
+            :client.GETMEASURE_MAX_MEASURES]
+        if optimize: # one block with constant step
+            body = [{"beg_time": times[0], "step_time": step,
+                "value": [[float(t)] * ntypes for t in times]}] if times else []
+        else:
+            body = { str(t): [float(t)] * ntypes for t in times }
+        apirequest = requests.GetmeasureRequest(payload = payload)
+        return apirequest.response_class(request = apirequest,
+            response = {"status":"ok", "body":body})
+
+class FakeAsyncGetmeasureClient(client.AsyncNetatmoClient):
+    step = FakeGetmeasureClient.step
+    async def Getmeasure(self, *args, **kwargs):
+        await asyncio.sleep(0)
+        return FakeGetmeasureClient.Getmeasure(self, *args, **kwargs)
+
+class GetmeasureRangeTest(ClientTest):
+    # execute this before each test method
+    def setUp(self):
+        self.client = FakeGetmeasureClient()
+        self.begin = 1487000000
+        self.end = self.begin + 30 * 86400 # a month of 5-minute data
+
+    # check that the DataFrame contains every measure exactly once
+    def check_dataframe(self, df):
+        step = self.client.step
+        times = list(range(-(-self.begin // step) * step, self.end + 1, step))
+        self.assertEqual(len(df), len(times))
+        self.assertTrue(df.index.is_unique)
+        self.assertTrue(df.index.is_monotonic_increasing)
+        self.assertEqual(list(df["Temperature"]), [float(t) for t in times])
+
+    @testname("windows cover the time span")
+    def test_Windows(self):
+        windows = self.client.Getmeasure_windows(self.begin, self.end)
+        self.assertEqual(windows[0][0], self.begin)
+        self.assertEqual(windows[-1][1], self.end)
+        for (b1, e1), (b2, e2) in zip(windows[:-1], windows[1:]):
+            self.assertEqual(e1, b2)
+        for b, e in windows:
+            self.assertLessEqual(e - b, 1024 * 300)
+
+    @testname("time span beyond the measure limit")
+    def test_Range(self):
+        df = self.client.GetmeasureRange(device_id = "70:ee:50:00:00:01",
+            date_begin = self.begin, date_end = self.end,
+            type = ["Temperature", "Humidity"], max_workers = 4)
+        self.check_dataframe(df)
+
+    @testname("full responses are continued")
+    def test_RangeDense(self):
+        self.client.step = 60 # more measures than the scale suggests
+        df = self.client.GetmeasureRange(device_id = "70:ee:50:00:00:01",
+            date_begin = self.begin, date_end = self.end,
+            type = ["Temperature"], max_workers = 4)
+        self.check_dataframe(df)
+
+    @testname("async time span beyond the measure limit")
+    def test_RangeAsync(self):
+        self.client = FakeAsyncGetmeasureClient(
+            authentication = authentication.Authentication(
+                tokens = EXAMPLE_TOKENS.copy()))
+        df = asyncio.run(self.client.GetmeasureRange(
+            device_id = "70:ee:50:00:00:01", date_begin = self.begin,
+            date_end = self.end, type = ["Temperature"], max_workers = 4))
+        self.check_dataframe(df)
+
+    @testname("async full responses are continued")
+    def test_RangeDenseAsync(self):
+        self.client = FakeAsyncGetmeasureClient(
+            authentication = authentication.Authentication(
+                tokens = EXAMPLE_TOKENS.copy()))
+        self.client.step = 60
+        df = asyncio.run(self.client.GetmeasureRange(
+            device_id = "70:ee:50:00:00:01", date_begin = self.begin,
+            date_end = self.end, type = ["Temperature"], max_workers = 4))
+        self.check_dataframe(df)
+
+    @testname("time span range checks input")
+    def test_RangeInvalidInput(self):
+        with self.assertRaises(client.InvalidApiInputError):
+            self.client.GetmeasureRange(device_id = "70:ee:50:00:00:01",
+                date_begin = self.end, date_end = self.begin)
+        with self.assertRaises(client.InvalidApiInputError):
+            self.client.GetmeasureRange(device_id = "70:ee:50:00:00:01",
+                date_begin = self.begin, window = 0)
+
+class GetmeasureBatchTest(ClientTest):
+    # execute this before each test method
+    def setUp(self):
+        self.client = FakeGetmeasureClient()
+        self.begin = 1487000000
+        self.end = self.begin + 5 * 86400 # two windows of 5-minute data
+        self.specs = [
+            {"device_id":"70:ee:50:00:00:01"},
+            {"device_id":"70:ee:50:00:00:01", "module_id":"02:00:00:00:00:01",
+                "type":["Temperature", "Humidity"]},
+            {"device_id":"70:ee:50:00:00:02", "date_end":self.begin + 3600},
+            ]
+
+    # check the long DataFrame of a batch
+    def check_dataframe(self, df):
+        self.assertEqual(list(df.index.names),
+            ["device_id", "module_id", "time"])
+        self.assertEqual(list(df.index.unique(level = "module_id")),
+            ["70:ee:50:00:00:01", "02:00:00:00:00:01", "70:ee:50:00:00:02"])
+        first = df.loc[("70:ee:50:00:00:01", "70:ee:50:00:00:01")]
+        times = list(range(-(-self.begin // 300) * 300, self.end + 1, 300))
+        self.assertEqual(list(first["Temperature"]), [float(t) for t in times])
+        self.assertTrue(first["Humidity"].isnull().all()) # not requested
+        module = df.loc[("70:ee:50:00:00:01", "02:00:00:00:00:01")]
+        self.assertEqual(list(module["Humidity"]), [float(t) for t in times])
+        self.assertEqual(len(df.loc[("70:ee:50:00:00:02",
+            "70:ee:50:00:00:02")]), 12)
+
+    @testname("batch of devices and modules")
+    def test_Batch(self):
+        df = self.client.GetmeasureBatch(self.specs, type = ["Temperature"],
+            date_begin = self.begin, date_end = self.end, max_workers = 4)
+        self.check_dataframe(df)
+
+    @testname("async batch of devices and modules")
+    def test_BatchAsync(self):
+        self.client = FakeAsyncGetmeasureClient(
+            authentication = authentication.Authentication(
+                tokens = EXAMPLE_TOKENS.copy()))
+        df = asyncio.run(self.client.GetmeasureBatch(self.specs,
+            type = ["Temperature"], date_begin = self.begin,
+            date_end = self.end, max_workers = 4))
+        self.check_dataframe(df)
+
+    @testname("batch specs are all checked before the first request")
+    def test_BatchInvalidSpec(self):
+        calls = []
+        self.client.Getmeasure = lambda **kwargs: calls.append(kwargs)
+        for spec in ({"device_id":"no mac"}, {"module_id":"02:00:00:00:00:01"},
+            {"device_id":"70:ee:50:00:00:01", "optimize":True},
+            {"device_id":"70:ee:50:00:00:01", "scale":"1year"}, "no dict"):
+            with self.assertRaises(client.InvalidApiInputError):
+                self.client.GetmeasureBatch(self.specs + [spec],
+                    date_begin = self.begin, date_end = self.end)
+        self.assertEqual(calls, [])
+
+    @testname("batch requests are rate limited")
+    def test_BatchRateLimit(self):
+        specs = [{"device_id":"70:ee:50:00:00:0{}".format(i)}
+            for i in range(6)]
+        start = time.time()
+        df = self.client.GetmeasureBatch(specs, date_begin = self.begin,
+            date_end = self.begin + 3600, max_workers = 6, rate_limit = 50)
+        self.assertGreaterEqual(time.time() - start, 5 / 50)
+        self.assertEqual(len(df), 6 * 12)
+
+    @testname("async batch requests are rate limited")
+    def test_BatchRateLimitAsync(self):
+        self.client = FakeAsyncGetmeasureClient(
+            authentication = authentication.Authentication(
+                tokens = EXAMPLE_TOKENS.copy()))
+        specs = [{"device_id":"70:ee:50:00:00:0{}".format(i)}
+            for i in range(6)]
+        start = time.time()
+        df = asyncio.run(self.client.GetmeasureBatch(specs,
+            date_begin = self.begin, date_end = self.begin + 3600,
+            max_workers = 6, rate_limit = 50))
+        self.assertGreaterEqual(time.time() - start, 5 / 50)
+        self.assertEqual(len(df), 6 * 12)
+
+    @testname("empty batch")
+    def test_BatchEmpty(self):
+        df = self.client.GetmeasureBatch([])
+        self.assertEqual(len(df), 0)
+        self.assertEqual(list(df.index.names),
+            ["device_id", "module_id", "time"])
+
 ##########################################
 ### test the different Client requests ###
 ##########################################
@@ -202,6 +530,65 @@ class ClientRequestsTest(ClientTest):
 
         
 
+##########################################
+### test the client against a mock api ###
+##########################################
+class MockServerTest(BasicTest):
+    # execute this before each test method
+    def setUp(self):
+        self.server = MockNetatmoServer(stations = 50).__enter__()
+        self.pool = connectionpool.ConnectionPool(
+            connection_class = http.client.HTTPConnection)
+        self.auth = authentication.Authentication(
+            credentials = EXAMPLE_CREDENTIALS)
+        self.auth.server = self.server.address
+        self.auth.connection_pool = self.pool
+
+    # execute this after each test method
+    def tearDown(self):
+        self.pool.clear()
+        self.server.__exit__()
+
+    @testname("client requests tokens and data from the mock api")
+    def test_Client(self):
+        c = client.NetatmoClient(authentication = self.auth,
+            server = self.server.address, connection_pool = self.pool)
+        df = c.Getpublicdata(region = HAMBURG_COORDINATES_OUTLINE).dataframe
+        self.assertEqual(len(df), 50)
+        df = c.Getmeasure(device_id = "70:ee:50:00:00:01",
+            type = ["Temperature","Humidity"],
+            date_begin = 1487242771, date_end = 1487242771 + 3000,
+            optimize = True).dataframe
+        self.assertEqual(list(df.columns), ["Temperature","Humidity"])
+        self.assertEqual(len(df), 10)
+        df = c.Getstationsdata(device_id = "70:ee:50:00:00:01").dataframe
+        self.assertEqual(df["Temperature"].iloc[0], 21.5)
+        # one token request for all requests
+        self.assertEqual(self.server.requests[NETATMO_API_TOKEN_URL], 1)
+        self.assertEqual(sum(self.server.requests.values()), 4)
+
+    @testname("async client requests data from the mock api")
+    def test_AsyncClient(self):
+        c = client.AsyncNetatmoClient(authentication = self.auth,
+            server = self.server.address, connection_pool = self.pool)
+        async def fetch():
+            return await asyncio.gather(*[c.Getpublicdata(
+                region = HAMBURG_COORDINATES_OUTLINE) for i in range(3)])
+        for response in self.run_async(fetch(), self.pool):
+            self.assertEqual(len(response.dataframe), 50)
+        self.assertEqual(self.server.requests[NETATMO_API_GETPUBLICDATA_URL],
+            3)
+
+    @testname("mock api rejects unknown tokens")
+    def test_InvalidToken(self):
+        tokens = EXAMPLE_TOKENS.copy()
+        tokens["token_request_time"] = time.time()
+        c = client.NetatmoClient(
+            authentication = authentication.Authentication(tokens = tokens),
+            server = self.server.address, connection_pool = self.pool)
+        with self.assertRaises(client.ApiResponseError):
+            c.Getstationsdata(device_id = "70:ee:50:00:00:01")
+
 
 def run():
     # run the tests
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+# system modules
+import unittest
+import logging
+import time
+import asyncio
+import http.client
+
+# import instrumentation module
+from netatmo.api import instrumentation
+from netatmo.api import client
+from netatmo.api import authentication
+from netatmo.api import connectionpool
+from netatmo.api import retry
+from netatmo.api.variables import *
+from netatmo.api.errors import *
+# import test data
+from .test_data import *
+from .test_flow import *
+from .test_server import *
+
+# get a logger
+logger = logging.getLogger(__name__)
+
+# an event with given phase timings
+def example_event(duration, phases = {}, outcome = "ok",
+    endpoint = NETATMO_API_GETMEASURE_URL):
+    event = instrumentation.RequestEvent(kind = "attempt", endpoint = endpoint)
+    event.phases.update(phases)
+    event.request_bytes, event.response_bytes = 100, 5000
+    event.finish(outcome = outcome)
+    event.duration = duration
+    return event
+
+
+################################
+### test the instrumentation ###
+################################
+class HistogramTest(BasicTest):
+    @testname("values are sorted into inclusive buckets")
+    def test_Buckets(self):
+        histogram = instrumentation.Histogram([1, 10])
+        for value in (0.5, 1, 5, 100):
+            histogram.add(value)
+        self.assertEqual(histogram.counts, [2, 1, 1])
+        self.assertEqual(histogram.as_dict()["buckets"],
+            [[1, 2], [10, 3], ["+Inf", 4]])
+        self.assertEqual(histogram.sum, 106.5)
+        self.assertEqual(histogram.quantile(0.5), 1)
+        self.assertEqual(histogram.quantile(1), float("inf"))
+        self.assertIsNone(instrumentation.Histogram([1]).quantile(0.5))
+
+    @testname("the aggregator collects durations, phases, bytes and outcomes")
+    def test_Aggregator(self):
+        aggregator = instrumentation.HistogramAggregator()
+        aggregator.observe(example_event(0.02, {"wait": 0.015}))
+        aggregator.observe(example_event(0.3, outcome = "ApiServerError"))
+        url = NETATMO_API_GETMEASURE_URL
+        histograms = aggregator.histograms
+        self.assertEqual(histograms[("duration_seconds", "attempt", url,
+            None)]["count"], 2)
+        self.assertEqual(histograms[("phase_seconds", "attempt", url,
+            "wait")]["count"], 1)
+        self.assertEqual(histograms[("response_bytes", "attempt", url,
+            None)]["sum"], 10000)
+        self.assertEqual(aggregator.outcomes, {("attempt", url, "ok"): 1,
+            ("attempt", url, "ApiServerError"): 1})
+        text = aggregator.prometheus()
+        self.assertIn("# TYPE netatmo_api_duration_seconds histogram", text)
+        self.assertIn('netatmo_api_outcomes_total{endpoint="/api/getmeasure",'
+            'kind="attempt",outcome="ok"} 1', text)
+        aggregator.reset()
+        self.assertEqual(aggregator.export(), [])
+
+    @testname("failing observers do not disturb")
+    def test_FailingObserver(self):
+        events = []
+        def failing(event):
+            raise ValueError("observer bug")
+        with self.assertLogs(instrumentation.logger, level = "ERROR"):
+            instrumentation.notify(example_event(0.1),
+                observers = [failing, events.append])
+        self.assertEqual(len(events), 1)
+
+    @testname("errors are recorded as outcome")
+    def test_Observed(self):
+        events = []
+        with self.assertRaises(ApiServerError):
+            with instrumentation.observed("call", "/api/x",
+                observers = [events.append]) as event:
+                raise ApiServerError(502)
+        self.assertEqual(events[0].outcome, "ApiServerError")
+        self.assertGreaterEqual(events[0].duration, 0)
+
+
+class RequestInstrumentationTest(BasicTest):
+    # execute this before each test method
+    def setUp(self):
+        self.server = MockNetatmoServer(stations = 20).__enter__()
+        self.pool = connectionpool.ConnectionPool(
+            connection_class = http.client.HTTPConnection)
+        self.auth = authentication.Authentication(
+            credentials = EXAMPLE_CREDENTIALS)
+        self.auth.server = self.server.address
+        self.auth.connection_pool = self.pool
+        self.events = []
+
+    # execute this after each test method
+    def tearDown(self):
+        self.pool.clear()
+        self.server.__exit__()
+
+    def client(self, cls = client.NetatmoClient, **kwargs):
+        return cls(authentication = self.auth, server = self.server.address,
+            connection_pool = self.pool, observers = [self.events.append],
+            **kwargs)
+
+    def check_events(self, phases):
+        attempt, call = self.events
+        self.assertEqual(attempt.kind, "attempt")
+        self.assertEqual(attempt.endpoint, NETATMO_API_GETPUBLICDATA_URL)
+        self.assertEqual(attempt.outcome, "ok")
+        self.assertEqual(set(attempt.phases), phases)
+        self.assertGreater(attempt.request_bytes, 0)
+        self.assertGreater(attempt.decoded_bytes, attempt.response_bytes)
+        self.assertEqual(call.kind, "call")
+        self.assertEqual(set(call.phases), {"token","request"})
+        self.assertGreaterEqual(call.duration, attempt.duration)
+
+    @testname("client calls and attempts are observed")
+    def test_Client(self):
+        c = self.client()
+        self.auth.tokens # request the tokens first
+        before = self.server.bytes_sent
+        c.Getpublicdata(region = HAMBURG_COORDINATES_OUTLINE)
+        # the connection of the token request is reused
+        self.check_events({"send","wait","read","decode"})
+        self.assertEqual(self.events[0].response_bytes,
+            self.server.bytes_sent - before)
+
+    @testname("async client calls and attempts are observed")
+    def test_AsyncClient(self):
+        c = self.client(cls = client.AsyncNetatmoClient)
+        self.run_async(c.Getpublicdata(region = HAMBURG_COORDINATES_OUTLINE),
+            self.pool)
+        # the asyncio connection of the token request is reused, too
+        self.check_events({"send","wait","read","decode"})
+
+    @testname("every attempt of a retried call is observed")
+    def test_Retry(self):
+        server = LocalJSONServer(response = {"status":"ok",
+            "body":EXAMPLE_JSON}).__enter__()
+        try:
+            server.failures = [(503, b"")]
+            tokens = EXAMPLE_TOKENS.copy()
+            tokens["token_request_time"] = time.time()
+            c = client.NetatmoClient(authentication =
+                authentication.Authentication(tokens = tokens),
+                server = server.address, connection_pool = self.pool,
+                retry_policy = retry.RetryPolicy(backoff = 0.001),
+                observers = [self.events.append])
+            aggregator = instrumentation.HistogramAggregator()
+            c.observers.append(aggregator)
+            c.Getstationsdata(device_id = "70:ee:50:00:00:01")
+        finally:
+            server.__exit__()
+        self.assertEqual([(e.kind, e.outcome) for e in self.events],
+            [("attempt","ApiServerError"), ("attempt","ok"), ("call","ok")])
+        url = NETATMO_API_GETSTATIONSDATA_URL
+        self.assertEqual(aggregator.outcomes[("attempt", url, "ok")], 1)
+        self.assertEqual(aggregator.histograms[("duration_seconds", "call",
+            url, None)]["count"], 1)
+
+
+def run():
+    # run the tests
+    logger.info("=== INSTRUMENTATION TESTS ===")
+    unittest.main(exit=False,module=__name__)
+    logger.info("=== END OF INSTRUMENTATION TESTS ===")
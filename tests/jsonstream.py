@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+# system modules
+import unittest
+import logging
+import json
+import zlib
+import asyncio
+import http.client
+
+# import jsonstream module
+from netatmo.api import jsonstream
+from netatmo.api import requests
+from netatmo.api import connectionpool
+# import test data
+from .test_data import *
+from .test_flow import *
+
+# get a logger
+logger = logging.getLogger(__name__)
+
+# an example Getpublicdata response
+EXAMPLE_GETPUBLICDATA = {"status":"ok", "time_exec":0.1,
+    "body":[example_station(i, 53.5 + i / 1000, 10 + i / 1000)
+        for i in range(50)],
+    "time_server":1500000000}
+
+
+#######################################
+### test the JSONObjectStream class ###
+#######################################
+class JSONObjectStreamTest(BasicTest):
+    # split a document into chunks of the given size
+    def chunks(self, document, size):
+        data = json.dumps(document, ensure_ascii = False).encode("UTF-8")
+        return [data[i:i+size] for i in range(0, len(data), size)]
+
+    @testname("decoding in chunks of any size")
+    def test_Load(self):
+        documents = [EXAMPLE_JSON, EXAMPLE_GETPUBLICDATA, {},
+            {"body":[]}, {"body":{"1":[2]}}, {"body":[1, 22, 333.3, -4e10]},
+            {"ümlaut":"äöü €", "body":["ß", {"x":[None, True, False]}]}]
+        for document in documents:
+            for size in (1, 2, 3, 7, 64, 100000):
+                self.assertEqual(jsonstream.loads(
+                    self.chunks(document, size)), document)
+
+    @testname("streaming the body items")
+    def test_Items(self):
+        stream = jsonstream.JSONObjectStream(
+            self.chunks(EXAMPLE_GETPUBLICDATA, 100))
+        items = stream.items()
+        first = next(items)
+        self.assertEqual(first, EXAMPLE_GETPUBLICDATA["body"][0])
+        # the members before the body are already there
+        self.assertEqual(stream.members, {"status":"ok", "time_exec":0.1})
+        self.assertEqual([first] + list(items), EXAMPLE_GETPUBLICDATA["body"])
+        self.assertTrue(stream.streamed)
+        self.assertEqual(stream.members, {"status":"ok", "time_exec":0.1,
+            "time_server":1500000000})
+
+    @testname("invalid JSON raises ValueError")
+    def test_Invalid(self):
+        for data in (b"", b"[1,2]", b'{"a":1', b'{"a":1} x', b'{"body":[1,}',
+            b"no json"):
+            with self.assertRaises(ValueError):
+                jsonstream.loads([data])
+
+
+##############################
+### test the decompression ###
+##############################
+class DecompressedTest(BasicTest):
+    # compress data and split it into chunks
+    def chunks(self, data, wbits, size = 100):
+        compressor = zlib.compressobj(wbits = wbits)
+        data = compressor.compress(data) + compressor.flush()
+        return [data[i:i+size] for i in range(0, len(data), size)]
+
+    @testname("gzip and deflate are decompressed in chunks")
+    def test_Decompress(self):
+        data = json.dumps(EXAMPLE_GETPUBLICDATA).encode()
+        for encoding, wbits in (("gzip",31), ("deflate",15),
+            ("deflate",-15), ("x-gzip",31)):
+            counts = []
+            chunks = list(jsonstream.decompressed(self.chunks(data, wbits),
+                encoding = encoding, count = lambda r, d: counts.append((r,d))))
+            self.assertEqual(b"".join(chunks), data)
+            self.assertEqual(sum(d for r,d in counts), len(data))
+            self.assertEqual(sum(r for r,d in counts),
+                len(b"".join(self.chunks(data, wbits))))
+
+    @testname("decompressed chunks are bounded")
+    def test_BoundedChunks(self):
+        data = b" " * (10 * jsonstream.STREAM_CHUNK_SIZE) # compresses well
+        chunks = list(jsonstream.decompressed(self.chunks(data, 31, 10**6),
+            encoding = "gzip"))
+        self.assertEqual(b"".join(chunks), data)
+        self.assertTrue(all(len(c) <= jsonstream.STREAM_CHUNK_SIZE
+            for c in chunks))
+
+    @testname("no or identity encoding passes the chunks through")
+    def test_Identity(self):
+        for encoding in (None, "identity"):
+            counts = []
+            self.assertEqual(list(jsonstream.decompressed([b"ab", b"c"],
+                encoding = encoding, count = lambda *c: counts.append(c))),
+                [b"ab", b"c"])
+            self.assertEqual(counts, [(2,2), (1,1)])
+
+    @testname("unsupported or broken compression raises ValueError")
+    def test_Invalid(self):
+        with self.assertRaises(ValueError):
+            list(jsonstream.decompressed([b"abc"], encoding = "br"))
+        with self.assertRaises(ValueError):
+            list(jsonstream.decompressed([b"no gzip"], encoding = "gzip"))
+
+########################################
+### test streaming through a request ###
+########################################
+class StreamingRequestTest(BasicTest):
+    # execute this before each test method
+    def setUp(self):
+        self.server = LocalJSONServer(
+            response = EXAMPLE_GETPUBLICDATA).__enter__()
+        self.pool = connectionpool.ConnectionPool(
+            connection_class = http.client.HTTPConnection)
+
+    # execute this after each test method
+    def tearDown(self):
+        self.pool.clear()
+        self.server.__exit__()
+
+    # create a request to the local server
+    def request(self, stream_body = False):
+        request = requests.GetpublicdataRequest(payload = {"a":"b"})
+        request.server = self.server.address
+        request.connection_pool = self.pool
+        request.stream_body = stream_body
+        return request
+
+    @testname("responses are decoded")
+    def test_Decode(self):
+        for i in range(2): # also on the reused connection
+            self.assertEqual(self.request().post_request(),
+                EXAMPLE_GETPUBLICDATA)
+        self.assertEqual(self.pool.statistics["hits"], 1)
+
+    @testname("compressed responses are decompressed while reading")
+    def test_Compression(self):
+        for encoding in ("gzip", "deflate", "rawdeflate"):
+            self.server.encoding = encoding
+            self.pool.reset_statistics()
+            request = self.request()
+            self.assertEqual(request.post_request(), EXAMPLE_GETPUBLICDATA)
+            self.assertEqual(self.run_async(request.post_request_async(),
+                self.pool), EXAMPLE_GETPUBLICDATA)
+            statistics = self.pool.statistics
+            self.assertLess(statistics["bytes_received"],
+                statistics["bytes_decoded"] / 2)
+            self.assertEqual(statistics["bytes_decoded"], 2 * len(
+                json.dumps(EXAMPLE_GETPUBLICDATA).encode()))
+        self.assertIn("gzip", self.server.headers[-1]["Accept-Encoding"])
+
+    @testname("compression can be switched off")
+    def test_NoCompression(self):
+        self.server.encoding = "gzip"
+        request = self.request()
+        request.compression = False
+        self.assertEqual(request.post_request(), EXAMPLE_GETPUBLICDATA)
+        self.assertNotIn("gzip",
+            self.server.headers[-1].get("Accept-Encoding",""))
+        statistics = self.pool.statistics
+        self.assertEqual(statistics["bytes_received"],
+            statistics["bytes_decoded"])
+
+    @testname("only streamed responses use the incremental decoder")
+    def test_IncrementalOnlyForStreams(self):
+        streams = []
+        JSONObjectStream = jsonstream.JSONObjectStream
+        class RecordingStream(JSONObjectStream):
+            def __init__(self, *args, **kwargs):
+                streams.append(self)
+                super().__init__(*args, **kwargs)
+        jsonstream.JSONObjectStream = RecordingStream
+        try:
+            self.request().response
+            self.assertEqual(len(streams), 0)
+            self.request(stream_body = True).response
+            self.assertEqual(len(streams), 1)
+        finally:
+            jsonstream.JSONObjectStream = JSONObjectStream
+
+    @testname("stations are streamed into the DataFrame")
+    def test_StreamBody(self):
+        expected = self.request().response.dataframe
+        for issue in (lambda r: r.response,
+            lambda r: self.run_async(r.issue_async(), self.pool)):
+            response = issue(self.request(stream_body = True))
+            self.assertNotIn("body", response.response)
+            self.assertEqual(response.response["status"], "ok")
+            response.cache_dataframe = False # must not drop the DataFrame
+            self.assertTrue(response.dataframe.equals(expected))
+            # a new response replaces the streamed DataFrame
+            response.response = {"status":"ok"}
+            with self.assertRaises(requests.ApiResponseError):
+                response.dataframe
+
+
+def run():
+    # run the tests
+    logger.info("=== JSONSTREAM TESTS ===")
+    unittest.main(exit=False,module=__name__)
+    logger.info("=== END OF JSONSTREAM TESTS ===")
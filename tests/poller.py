@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# system modules
+import unittest
+import logging
+import copy
+
+# import poller module
+from netatmo.api import poller
+from netatmo.api import client
+from netatmo.api import requests
+# import test data
+from .test_data import *
+from .test_flow import *
+
+# get a logger
+logger = logging.getLogger(__name__)
+
+# a Getpublicdata station with a thermometer and a rain gauge
+def example_station(station_id, temperature_time, rain_time = 1000):
+    return {
+        "_id": station_id,
+        "place": {"location": [10.0, 53.5], "altitude": 10,
+            "timezone": "Europe/Berlin"},
+        "measures": {
+            "02:00:00:00:00:01": {
+                "res": {str(temperature_time): [20.5, 80]},
+                "type": ["temperature", "humidity"]},
+            "05:00:00:00:00:01": {
+                "rain_60min": 0, "rain_24h": 0, "rain_live": 0,
+                "rain_timeutc": rain_time},
+            },
+        }
+
+# a client answering Getpublicdata with the next of the given bodies
+class FakeGetpublicdataClient(client.NetatmoClient):
+    def __init__(self, bodies):
+        super().__init__()
+        self.bodies = list(bodies)
+
+    def Getpublicdata(self, region, required_data=None, filter=False):
+        payload = self.Getpublicdata_payload(region = region,
+            required_data = required_data, filter = filter)
+        apirequest = requests.GetpublicdataRequest(payload = payload)
+        return apirequest.response_class(request = apirequest,
+            response = {"status":"ok", "body":self.bodies.pop(0)})
+
+REGION = {"lat_ne":54, "lat_sw":53, "lon_ne":11, "lon_sw":10}
+
+
+#######################
+### test the poller ###
+#######################
+class PollerTest(BasicTest):
+    @testname("module timestamps from res and timeutc")
+    def test_ModuleTimestamp(self):
+        measures = example_station("a", 2000, 1500)["measures"]
+        self.assertEqual(
+            [poller.module_timestamp(m) for m in measures.values()],
+            [2000, 1500])
+        self.assertIsNone(poller.module_timestamp({}))
+
+    @testname("first poll emits everything, later polls only changes")
+    def test_Poll(self):
+        c = FakeGetpublicdataClient([
+            [example_station("a", 1000), example_station("b", 1000)],
+            [example_station("a", 1000), example_station("b", 1600)],
+            [example_station("a", 1000), example_station("b", 1600)],
+            ])
+        p = poller.GetpublicdataPoller(client = c, region = REGION)
+        df = p.poll()
+        self.assertEqual(list(df["id"]), ["a","b"])
+        self.assertEqual(p.tracked, 4)
+        df = p.poll()
+        self.assertEqual(list(df["id"]), ["b"])
+        self.assertEqual(df["temperature"].iloc[0], 20.5)
+        self.assertEqual(len(p.poll()), 0)
+
+    @testname("only changed modules are emitted")
+    def test_ChangedModules(self):
+        p = poller.GetpublicdataPoller(client = None, region = REGION)
+        list(p.changes([example_station("a", 1000, 1000)]))
+        changed = list(p.changes([example_station("a", 1000, 1300)]))
+        self.assertEqual(len(changed), 1)
+        self.assertEqual(list(changed[0]["measures"]), ["05:00:00:00:00:01"])
+
+    @testname("changes are remembered even if the result is not consumed")
+    def test_Eager(self):
+        p = poller.GetpublicdataPoller(client = None, region = REGION)
+        changed = p.changes([example_station("a", 1000)])
+        self.assertEqual(p.tracked, 2)
+        self.assertEqual(len(list(p.changes([example_station("a", 1000)]))),
+            0)
+        self.assertEqual(len(list(changed)), 1)
+
+    @testname("the input is not modified")
+    def test_NotModified(self):
+        p = poller.GetpublicdataPoller(client = None, region = REGION)
+        stations = [example_station("a", 1000)]
+        original = copy.deepcopy(stations)
+        list(p.changes(stations))
+        list(p.changes([example_station("a", 2000, 2000)]))
+        self.assertEqual(stations, original)
+
+    @testname("modules not seen anymore are forgotten")
+    def test_Forget(self):
+        p = poller.GetpublicdataPoller(client = None, region = REGION,
+            forget_after = 100)
+        list(p.changes([example_station("a", 1000)], now = 0))
+        list(p.changes([example_station("b", 1000)], now = 50))
+        self.assertEqual(p.tracked, 4)
+        list(p.changes([example_station("b", 1000)], now = 120))
+        self.assertEqual(p.tracked, 2)
+        # a is new again
+        changed = list(p.changes([example_station("a", 1000)], now = 130))
+        self.assertEqual(len(changed), 1)
+
+    @testname("older responses don't make measurements new again")
+    def test_OutOfOrder(self):
+        p = poller.GetpublicdataPoller(client = None, region = REGION)
+        emitted = [len(list(p.changes([example_station("a", t)])))
+            for t in (2000, 1900, 2000)]
+        self.assertEqual(emitted, [1, 0, 0])
+
+    @testname("stations with only rain or wind changes are not polled")
+    def test_RainOnly(self):
+        c = FakeGetpublicdataClient([[example_station("a", 1000, 1000)],
+            [example_station("a", 1000, 1300)]])
+        p = poller.GetpublicdataPoller(client = c, region = REGION)
+        self.assertEqual(len(p.poll()), 1)
+        self.assertEqual(len(p.poll()), 0)
+
+    @testname("run polls regularly")
+    def test_Run(self):
+        c = FakeGetpublicdataClient([[example_station("a", t)]
+            for t in (1000, 1000, 2000)])
+        p = poller.GetpublicdataPoller(client = c, region = REGION)
+        lengths = [len(df) for df in p.run(interval = 0, count = 3)]
+        self.assertEqual(lengths, [1, 0, 1])
+
+
+def run():
+    # run the tests
+    logger.info("=== POLLER TESTS ===")
+    unittest.main(exit=False,module=__name__)
+    logger.info("=== END OF POLLER TESTS ===")
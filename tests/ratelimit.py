@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+# system modules
+import unittest
+import logging
+import os
+import time
+import asyncio
+import threading
+import traceback
+import http.client
+
+# import ratelimit module
+from netatmo.api import ratelimit
+from netatmo.api import client
+from netatmo.api import requests
+from netatmo.api import authentication
+from netatmo.api import connectionpool
+from netatmo.api.errors import *
+# import test data
+from .test_data import *
+from .test_flow import *
+
+# get a logger
+logger = logging.getLogger(__name__)
+
+TMPBUDGETFILE = os.path.join(TMPDIR,"budget.json")
+
+
+###########################
+### test the rate limit ###
+###########################
+class RateLimiterTest(BasicTest):
+    @testname("requests within the budget pass immediately")
+    def test_WithinBudget(self):
+        limiter = ratelimit.RateLimiter(budgets = {1: 3})
+        start = time.monotonic()
+        for i in range(3):
+            limiter.acquire()
+        self.assertLess(time.monotonic() - start, 0.1)
+        self.assertEqual(limiter.statistics["acquired"], 3)
+        self.assertEqual(limiter.statistics["waited"], 0)
+
+    @testname("requests beyond the budget wait for a refill")
+    def test_BeyondBudget(self):
+        limiter = ratelimit.RateLimiter(budgets = {1: 3})
+        for i in range(3):
+            limiter.acquire()
+        start = time.monotonic()
+        limiter.acquire()
+        self.assertAlmostEqual(time.monotonic() - start, 1/3, delta = 0.1)
+        self.assertEqual(limiter.statistics["waited"], 1)
+
+    @testname("the strictest budget applies")
+    def test_SeveralBudgets(self):
+        limiter = ratelimit.RateLimiter(budgets = {0.1: 100, 60: 2})
+        limiter.acquire()
+        limiter.acquire()
+        self.assertAlmostEqual(limiter.take(), 30, delta = 0.1)
+
+    @testname("timeout raises RateLimitTimeoutError")
+    def test_Timeout(self):
+        limiter = ratelimit.RateLimiter(budgets = {60: 1})
+        limiter.acquire()
+        with self.assertRaises(RateLimitTimeoutError):
+            limiter.acquire(timeout = 0.05)
+        self.assertEqual(limiter.statistics["timeouts"], 1)
+        self.assertEqual(limiter.waiting, 0)
+
+    @testname("interactive requests go before backfill requests")
+    def test_Priority(self):
+        limiter = ratelimit.RateLimiter(budgets = {0.3: 1})
+        limiter.acquire() # use up the budget
+        order = []
+        def acquire(priority):
+            limiter.acquire(priority)
+            order.append(priority)
+        threads = []
+        for priority in (ratelimit.PRIORITY_BACKFILL,
+            ratelimit.PRIORITY_BACKFILL, ratelimit.PRIORITY_INTERACTIVE):
+            thread = threading.Thread(target = acquire, args = (priority,))
+            thread.start()
+            threads.append(thread)
+            while limiter.waiting < len(threads): # wait until queued
+                time.sleep(0.001)
+        for thread in threads:
+            thread.join()
+        self.assertEqual(order, [ratelimit.PRIORITY_INTERACTIVE,
+            ratelimit.PRIORITY_BACKFILL, ratelimit.PRIORITY_BACKFILL])
+
+    @testname("awaitable acquire")
+    def test_Async(self):
+        limiter = ratelimit.RateLimiter(budgets = {1: 2})
+        async def acquire():
+            await asyncio.gather(*[limiter.acquire_async() for i in range(3)])
+        start = time.monotonic()
+        asyncio.run(acquire())
+        self.assertAlmostEqual(time.monotonic() - start, 0.5, delta = 0.15)
+        self.assertEqual(limiter.statistics["acquired"], 3)
+
+    @testname("waiting coroutines keep their priority and hold no thread")
+    def test_AsyncPriority(self):
+        limiter = ratelimit.RateLimiter(budgets = {0.02: 1})
+        order = []
+        async def acquire(priority):
+            await limiter.acquire_async(priority)
+            order.append(priority)
+        async def acquire_all():
+            limiter.acquire() # use up the budget
+            threads = threading.active_count()
+            tasks = [asyncio.ensure_future(acquire(priority)) for priority in
+                [ratelimit.PRIORITY_BACKFILL] * 40 +
+                [ratelimit.PRIORITY_INTERACTIVE] * 10]
+            await asyncio.sleep(0.005)
+            self.assertEqual(limiter.waiting, 50)
+            self.assertLessEqual(threading.active_count(), threads)
+            await asyncio.gather(*tasks)
+        asyncio.run(acquire_all())
+        self.assertEqual(order, [ratelimit.PRIORITY_INTERACTIVE] * 10 +
+            [ratelimit.PRIORITY_BACKFILL] * 40)
+
+    @testname("cancelled coroutines don't take a token")
+    def test_AsyncCancel(self):
+        limiter = ratelimit.RateLimiter(budgets = {0.2: 1})
+        async def cancel():
+            limiter.acquire() # use up the budget
+            task = asyncio.ensure_future(limiter.acquire_async())
+            await asyncio.sleep(0.05)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+            self.assertEqual(limiter.waiting, 0)
+            await asyncio.sleep(0.2)
+            self.assertEqual(limiter.take(), 0) # the token is still there
+        asyncio.run(cancel())
+        self.assertEqual(limiter.statistics["acquired"], 1)
+
+    @testname("threads and coroutines share the queue")
+    def test_AsyncAndThreads(self):
+        limiter = ratelimit.RateLimiter(budgets = {0.05: 1})
+        order = []
+        async def acquire():
+            limiter.acquire() # use up the budget
+            task = asyncio.ensure_future(limiter.acquire_async(
+                ratelimit.PRIORITY_BACKFILL))
+            await asyncio.sleep(0.01)
+            thread = threading.Thread(target = lambda: order.append(
+                limiter.acquire(ratelimit.PRIORITY_INTERACTIVE) or "thread"))
+            thread.start()
+            await task
+            order.append("coroutine")
+            thread.join()
+        asyncio.run(acquire())
+        self.assertEqual(order, ["thread", "coroutine"])
+
+    @testname("async timeout raises RateLimitTimeoutError")
+    def test_AsyncTimeout(self):
+        limiter = ratelimit.RateLimiter(budgets = {60: 1})
+        limiter.acquire()
+        with self.assertRaises(RateLimitTimeoutError):
+            asyncio.run(limiter.acquire_async(timeout = 0.05))
+        self.assertEqual(limiter.waiting, 0)
+
+    @testname("buckets of former budgets are dropped")
+    def test_StaleBuckets(self):
+        limiter = ratelimit.RateLimiter(budgets = {60: 1})
+        limiter.acquire()
+        limiter.budgets = {1: 5}
+        self.assertEqual(limiter.take(), 0)
+        self.assertEqual(list(limiter._buckets), [1.0])
+
+    @testname("file rate limiters share the budget")
+    def test_FileShared(self):
+        os.makedirs(TMPDIR, exist_ok = True)
+        try: os.remove(TMPBUDGETFILE)
+        except OSError: pass
+        a = ratelimit.FileRateLimiter(TMPBUDGETFILE, budgets = {60: 2})
+        b = ratelimit.FileRateLimiter(TMPBUDGETFILE, budgets = {60: 2})
+        a.acquire()
+        b.acquire()
+        self.assertGreater(a.take(), 0)
+        self.assertGreater(b.take(), 0)
+        os.remove(TMPBUDGETFILE)
+
+
+############################
+### test the integration ###
+############################
+class ClientRateLimitTest(BasicTest):
+    # execute this before each test method
+    def setUp(self):
+        self.server = LocalJSONServer(response = {"status":"ok",
+            "body":EXAMPLE_JSON}).__enter__()
+        tokens = EXAMPLE_TOKENS.copy()
+        tokens["token_request_time"] = time.time()
+        self.auth = authentication.Authentication(tokens = tokens)
+        self.pool = connectionpool.ConnectionPool(
+            connection_class = http.client.HTTPConnection)
+
+    # execute this after each test method
+    def tearDown(self):
+        self.pool.clear()
+        self.server.__exit__()
+
+    # create a request to the local server
+    def request(self):
+        apirequest = requests.GetstationsdataRequest(payload = {
+            "device_id": "70:ee:50:00:00:01", "get_favourites": "false"})
+        apirequest.server = self.server.address
+        apirequest.connection_pool = self.pool
+        return apirequest
+
+    @testname("no rate limit by default")
+    def test_Default(self):
+        self.assertIsNone(self.request().rate_limiter)
+        self.assertEqual(self.request().priority, ratelimit.PRIORITY_NORMAL)
+
+    @testname("client requests wait for the client's rate limiter")
+    def test_Client(self):
+        limiter = ratelimit.RateLimiter(budgets = {60: 5})
+        c = client.NetatmoClient(authentication = self.auth,
+            rate_limiter = limiter, priority = ratelimit.PRIORITY_BACKFILL)
+        apirequest = self.request()
+        c.issue(apirequest)
+        self.assertIs(apirequest.rate_limiter, limiter)
+        self.assertEqual(apirequest.priority, ratelimit.PRIORITY_BACKFILL)
+        self.assertEqual(limiter.statistics["acquired"], 1)
+
+    @testname("async client requests wait for the client's rate limiter")
+    def test_AsyncClient(self):
+        limiter = ratelimit.RateLimiter(budgets = {60: 5})
+        c = client.AsyncNetatmoClient(authentication = self.auth,
+            rate_limiter = limiter)
+        self.run_async(c.issue(self.request()), self.pool)
+        self.assertEqual(limiter.statistics["acquired"], 1)
+
+    @testname("throttling response raises ApiThrottlingError")
+    def test_Throttling(self):
+        self.server.response = {"error":{"code":26,
+            "message":"User usage reached"}}
+        c = client.NetatmoClient(authentication = self.auth)
+        with self.assertRaises(ApiThrottlingError) as first:
+            c.issue(self.request())
+        with self.assertRaises(ApiThrottlingError) as second:
+            c.issue(self.request())
+        # a new error each time, its traceback does not grow
+        self.assertIsNot(first.exception, second.exception)
+        self.assertEqual(len(traceback.extract_tb(
+            first.exception.__traceback__)), len(traceback.extract_tb(
+            second.exception.__traceback__)))
+        # still an ApiResponseError
+        self.assertTrue(issubclass(ApiThrottlingError, ApiResponseError))
+
+
+def run():
+    # run the tests
+    logger.info("=== RATELIMIT TESTS ===")
+    unittest.main(exit=False,module=__name__)
+    logger.info("=== END OF RATELIMIT TESTS ===")
@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+# system modules
+import unittest
+import logging
+import time
+import socket
+import asyncio
+import http.client
+
+# import requests modules
+from netatmo.api import requests
+from netatmo.api import connectionpool
+# import test data
+from .test_data import *
+from .test_flow import *
+
+# get a logger
+logger = logging.getLogger(__name__)
+
+
+#####################################
+### test the ConnectionPool class ###
+#####################################
+class ConnectionPoolTest(BasicTest):
+    # execute this before each test method
+    def setUp(self):
+        # a local server
+        self.server = LocalJSONServer(response = EXAMPLE_JSON).__enter__()
+        # a plain HTTP pool
+        self.pool = connectionpool.ConnectionPool(
+            connection_class = http.client.HTTPConnection)
+
+    # execute this after each test method
+    def tearDown(self):
+        self.pool.clear()
+        self.server.__exit__()
+
+    # issue a request through the pool
+    def post(self, cls = requests.GetmeasureRequest):
+        request = cls(payload = {"a":"b"})
+        request.server = self.server.address
+        request.connection_pool = self.pool
+        return request.post_request()
+
+    @testname("shared pool is used by default")
+    def test_DefaultPool(self):
+        for cls in (requests.TokenRequest, requests.GetpublicdataRequest,
+            requests.GetmeasureRequest, requests.GetstationsdataRequest):
+            self.assertIs(cls().connection_pool,
+                connectionpool.CONNECTION_POOL)
+
+    @testname("connections are kept alive and reused")
+    def test_KeepAlive(self):
+        for i in range(3):
+            self.assertEqual(self.post(), EXAMPLE_JSON)
+        # all requests went over the same connection
+        self.assertEqual(len(self.server.connections), 1)
+        statistics = self.pool.statistics
+        self.assertEqual(statistics["misses"], 1)
+        self.assertEqual(statistics["hits"], 2)
+
+    @testname("maxsize 0 disables keep-alive")
+    def test_NoKeepAlive(self):
+        self.pool.maxsize = 0
+        for i in range(3):
+            self.post()
+        self.assertEqual(len(self.server.connections), 3)
+        self.assertEqual(self.pool.statistics["hits"], 0)
+
+    @testname("idle connections expire")
+    def test_IdleTimeout(self):
+        self.pool.idle_timeout = 0
+        self.post()
+        time.sleep(0.01)
+        self.post()
+        self.assertEqual(self.pool.statistics["misses"], 2)
+        self.assertEqual(len(self.server.connections), 2)
+
+    @testname("reconnect when server closed the connection")
+    def test_Reconnect(self):
+        self.server.close_after = True
+        self.assertEqual(self.post(), EXAMPLE_JSON)
+        time.sleep(0.01) # let the server close the connection
+        self.assertEqual(self.post(), EXAMPLE_JSON)
+        self.assertEqual(self.pool.statistics["reconnects"], 1)
+        self.assertEqual(len(self.server.requests), 2)
+
+    @testname("no resend after the response started to arrive")
+    def test_NoResendAfterResponse(self):
+        self.post()
+        self.server.resets = 1
+        with self.assertRaises(connectionpool.STALE_CONNECTION_ERRORS):
+            self.post()
+        self.assertEqual(self.pool.statistics["reconnects"], 0)
+        self.assertEqual(len(self.server.requests), 2)
+
+    @testname("token requests are never resent")
+    def test_TokenRequestNoResend(self):
+        self.server.close_after = True
+        for i in range(2):
+            self.assertEqual(self.post(requests.TokenRequest), EXAMPLE_JSON)
+            time.sleep(0.01) # let the server close the connection
+        self.assertEqual(self.pool.statistics["hits"], 0)
+        self.assertEqual(self.pool.statistics["reconnects"], 0)
+        self.server.failures = [(500, b"")]
+        request = requests.TokenRequest()
+        request.server = self.server.address
+        request.connection_pool = self.pool
+        with self.assertRaises(requests.ApiServerError):
+            request.issue()
+        self.assertEqual(len(self.server.requests), 3)
+
+    @testname("deprecated connection handling delegates to the pool")
+    def test_DeprecatedConnection(self):
+        request = requests.GetmeasureRequest()
+        request.server = self.server.address
+        request.connection_pool = self.pool
+        with self.assertWarns(DeprecationWarning):
+            with request.connection_to_api():
+                with self.assertWarns(DeprecationWarning):
+                    connection = request.api_connection
+                self.assertIsInstance(connection, http.client.HTTPConnection)
+                self.assertIsNotNone(connection.sock)
+        self.assertIsNone(connection.sock)
+        self.assertEqual(self.pool.statistics["misses"], 1)
+        self.assertEqual(self.pool.statistics["discarded"], 1)
+        with self.assertWarns(DeprecationWarning):
+            request.connect_to_api()
+        with self.assertWarns(DeprecationWarning):
+            request.close_api_connection()
+        self.assertEqual(self.pool.statistics["discarded"], 2)
+        # the requests themselves still use the pool
+        self.assertEqual(request.post_request(), EXAMPLE_JSON)
+
+
+#################################
+### test the async transport ###
+#################################
+class AsyncRequestTest(BasicTest):
+    # execute this before each test method
+    def setUp(self):
+        # a local server
+        self.server = LocalJSONServer(response = EXAMPLE_JSON).__enter__()
+
+    # execute this after each test method
+    def tearDown(self):
+        self.server.__exit__()
+
+    # create a request to the local server
+    def request(self, cls = requests.GetmeasureRequest):
+        request = cls(payload = {"a":"b"})
+        request.server = self.server.address
+        request.connection_pool = connectionpool.ConnectionPool(
+            connection_class = http.client.HTTPConnection)
+        return request
+
+    @testname("async post request")
+    def test_PostRequestAsync(self):
+        request = self.request()
+        data = self.run_async(request.post_request_async(),
+            request.connection_pool)
+        self.assertEqual(data, EXAMPLE_JSON)
+        self.assertEqual(self.server.requests,
+            [(request.url, request.payload_urlencoded)])
+
+    @testname("async issue uses the response class")
+    def test_IssueAsync(self):
+        for cls in (requests.TokenRequest, requests.GetpublicdataRequest,
+            requests.GetmeasureRequest, requests.GetstationsdataRequest):
+            request = self.request(cls)
+            response = self.run_async(request.issue_async(),
+                request.connection_pool)
+            self.assertIsInstance(response, request.response_class)
+            self.assertIs(request.response, response)
+            self.assertEqual(response.response, EXAMPLE_JSON)
+
+    @testname("many concurrent async requests")
+    def test_ConcurrentRequestsAsync(self):
+        apirequests = [self.request() for i in range(20)]
+        async def issue_all():
+            return await asyncio.gather(
+                *[request.post_request_async() for request in apirequests])
+        results = self.run_async(issue_all(),
+            *[request.connection_pool for request in apirequests])
+        self.assertEqual(results, [EXAMPLE_JSON] * 20)
+        self.assertEqual(len(self.server.requests), 20)
+
+    @testname("async connections are kept alive and reused")
+    def test_KeepAliveAsync(self):
+        pool = connectionpool.ConnectionPool(
+            connection_class = http.client.HTTPConnection)
+        async def issue_all():
+            for i in range(3):
+                request = self.request()
+                request.connection_pool = pool
+                await request.post_request_async()
+        self.run_async(issue_all(), pool)
+        self.assertEqual(len(self.server.connections), 1)
+        self.assertEqual(pool.statistics["hits"], 2)
+        headers = self.server.headers[-1]
+        self.assertEqual(headers["Host"], self.server.address)
+        self.assertNotIn("Connection", headers)
+
+    @testname("async requests reconnect if the server closed the connection")
+    def test_ReconnectAsync(self):
+        self.server.close_after = True
+        pool = connectionpool.ConnectionPool(
+            connection_class = http.client.HTTPConnection)
+        async def issue_all():
+            results = []
+            for i in range(3):
+                request = self.request()
+                request.connection_pool = pool
+                results.append(await request.post_request_async())
+            return results
+        self.assertEqual(self.run_async(issue_all(), pool),
+            [EXAMPLE_JSON] * 3)
+        self.assertEqual(len(self.server.requests), 3)
+
+    @testname("no async resend after the response started to arrive")
+    def test_NoResendAfterResponseAsync(self):
+        request = self.request()
+        pool = request.connection_pool
+        async def issue_twice():
+            await request.post_request_async()
+            self.server.resets = 1
+            await request.post_request_async()
+        with self.assertRaises(connectionpool.STALE_CONNECTION_ERRORS):
+            self.run_async(issue_twice(), pool)
+        self.assertEqual(pool.statistics["reconnects"], 0)
+        self.assertEqual(len(self.server.requests), 2)
+
+    @testname("async token requests use new connections")
+    def test_TokenRequestFreshAsync(self):
+        request = self.request(requests.TokenRequest)
+        pool = request.connection_pool
+        async def issue_twice():
+            await request.post_request_async()
+            await request.post_request_async()
+        self.run_async(issue_twice(), pool)
+        self.assertEqual(pool.statistics["hits"], 0)
+        self.assertEqual(len(self.server.connections), 2)
+
+    @testname("idle async connections can be closed")
+    def test_ClearAsync(self):
+        request = self.request()
+        pool = request.connection_pool
+        async def issue_twice():
+            await request.post_request_async()
+            await pool.clear_async()
+            await request.post_request_async()
+        self.run_async(issue_twice(), pool)
+        self.assertEqual(len(self.server.connections), 2)
+        self.assertEqual(pool.statistics["hits"], 0)
+
+    @testname("requests time out if the server does not respond")
+    def test_Timeout(self):
+        silent = socket.socket()
+        silent.bind(("localhost", 0))
+        silent.listen()
+        try:
+            request = self.request()
+            request.server = "localhost:{}".format(silent.getsockname()[1])
+            request.connection_pool.timeout = 0.1
+            with self.assertRaises(socket.timeout):
+                request.post_request()
+            with self.assertRaises(socket.timeout):
+                asyncio.run(request.post_request_async())
+        finally:
+            silent.close()
+
+
+def run():
+    # run the tests
+    logger.info("=== REQUESTS TESTS ===")
+    unittest.main(exit=False,module=__name__)
+    logger.info("=== END OF REQUESTS TESTS ===")
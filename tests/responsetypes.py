@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+# system modules
+import unittest
+import logging
+
+# external modules
+import numpy as np
+import pandas
+
+# import responsetypes module
+from netatmo.api import responsetypes
+from netatmo.api import requests
+# import test data
+from .test_data import *
+from .test_flow import *
+
+# get a logger
+logger = logging.getLogger(__name__)
+
+
+#############################################
+### test the GetpublicdataResponse class ###
+#############################################
+class GetpublicdataResponseTest(BasicTest):
+    # execute this before each test method
+    def setUp(self):
+        self.stations = example_stations_grid(HAMBURG_COORDINATES_OUTLINE, 3)
+
+    # create a response for stations
+    def response(self, stations):
+        return responsetypes.GetpublicdataResponse(
+            request = requests.GetpublicdataRequest(),
+            response = {"status":"ok", "body":stations})
+
+    @testname("Getpublicdata DataFrame columns and dtypes")
+    def test_Dataframe(self):
+        df = self.response(self.stations).dataframe
+        self.assertEqual(list(df.columns), ["index", "id", "altitude",
+            "longitude", "latitude", "timezone", "temperature", "humidity",
+            "time_temperature", "time_humidity", "pressure", "time_pressure"])
+        self.assertEqual(len(df), len(self.stations))
+        self.assertEqual(list(df["id"]), [s["_id"] for s in self.stations])
+        self.assertEqual(df["timezone"].dtype, "category")
+        self.assertEqual(df["temperature"].dtype, np.float64)
+        self.assertEqual(list(df["temperature"]),
+            [8.1 + i % 10 for i in range(len(self.stations))])
+        self.assertTrue((df["time_pressure"] == pandas.Timestamp(
+            1487242805, unit="s", tz="UTC")).all())
+
+    @testname("Getpublicdata DataFrame with missing data")
+    def test_DataframeMissingData(self):
+        self.stations[0]["measures"] = {}
+        self.stations[1]["measures"]["70:ee:50:00:00:01"]["res"] = {}
+        del self.stations[2]["place"]
+        df = self.response(self.stations).dataframe
+        self.assertTrue(np.isnan(df["temperature"][0]))
+        self.assertTrue(pandas.isnull(df["time_pressure"][1]))
+        self.assertTrue(np.isnan(df["pressure"][1]))
+        self.assertTrue(np.isnan(df["latitude"][2]))
+        self.assertTrue(pandas.isnull(df["timezone"][2]))
+        self.assertFalse(df.iloc[3:].isnull().any().any())
+
+    @testname("Getpublicdata DataFrame from a station iterator")
+    def test_DataframeFromIterator(self):
+        stations = self.stations * 1000 # more than the initial capacity
+        df = responsetypes.stations_to_dataframe(iter(stations))
+        self.assertTrue(df.equals(self.response(stations).dataframe))
+
+    @testname("Getpublicdata DataFrame without stations")
+    def test_DataframeEmpty(self):
+        df = self.response([]).dataframe
+        self.assertEqual(len(df), 0)
+
+    @testname("Getpublicdata DataFrame without body")
+    def test_DataframeNoBody(self):
+        response = responsetypes.GetpublicdataResponse(
+            request = requests.GetpublicdataRequest(), response = {})
+        with self.assertRaises(responsetypes.ApiResponseError):
+            response.dataframe
+
+
+##########################################
+### test the GetmeasureResponse class ###
+##########################################
+class GetmeasureResponseTest(BasicTest):
+    # create a response for a body
+    def response(self, body, types = "Temperature,Humidity"):
+        return responsetypes.GetmeasureResponse(
+            request = requests.GetmeasureRequest(payload = {"type":types}),
+            response = {"status":"ok", "body":body})
+
+    # the expected DataFrame
+    def expected(self, times, values):
+        return pandas.DataFrame(values, columns = ["Temperature","Humidity"],
+            index = pandas.DatetimeIndex(pandas.to_datetime(times, unit="s",
+            utc=True), name = "time"))
+
+    @testname("unoptimized Getmeasure DataFrame")
+    def test_Unoptimized(self):
+        df = self.response({"1000":[8.1,84], "400":[7.9,None]}).dataframe
+        pandas.testing.assert_frame_equal(df, self.expected([400,1000],
+            [[7.9,np.nan],[8.1,84]]), check_index_type = False)
+
+    @testname("optimized Getmeasure DataFrame")
+    def test_Optimized(self):
+        df = self.response([
+            {"beg_time":400, "step_time":300, "value":[[7.9,80],[8.1,84]]},
+            {"beg_time":2000, "value":[[8.5,None]]},
+            ]).dataframe
+        pandas.testing.assert_frame_equal(df, self.expected([400,700,2000],
+            [[7.9,80],[8.1,84],[8.5,np.nan]]), check_index_type = False)
+
+    @testname("optimized and unoptimized Getmeasure DataFrame are equal")
+    def test_OptimizedEqualsUnoptimized(self):
+        times = range(1487000000, 1487000000 + 1024 * 300, 300)
+        values = [[float(i), float(i % 100)] for i in range(len(times))]
+        optimized = self.response([{"beg_time":times[0],
+            "step_time":300, "value":values}]).dataframe
+        unoptimized = self.response(
+            {str(t):v for t,v in zip(times,values)}).dataframe
+        pandas.testing.assert_frame_equal(optimized, unoptimized)
+
+    @testname("empty Getmeasure DataFrame")
+    def test_Empty(self):
+        for body in ([], {}):
+            df = self.response(body).dataframe
+            self.assertEqual(len(df), 0)
+            self.assertEqual(list(df.columns), ["Temperature","Humidity"])
+
+    @testname("Getmeasure DataFrame with wrong number of types")
+    def test_WrongNumberOfTypes(self):
+        for body in ({"400":[7.9]}, [{"beg_time":400,"value":[[7.9]]}]):
+            with self.assertRaises(responsetypes.ApiResponseError):
+                self.response(body).dataframe
+
+##########################################
+### test the caching of the DataFrame ###
+##########################################
+class DataframeCacheTest(BasicTest):
+    # execute this before each test method
+    def setUp(self):
+        self.apiresponse = responsetypes.GetpublicdataResponse(
+            request = requests.GetpublicdataRequest(),
+            response = {"status":"ok", "body":example_stations_grid(
+                HAMBURG_COORDINATES_OUTLINE, 2)})
+
+    @testname("DataFrame is cached")
+    def test_Cached(self):
+        self.assertIs(self.apiresponse.dataframe, self.apiresponse.dataframe)
+
+    @testname("setting the response invalidates the cache")
+    def test_Invalidated(self):
+        df = self.apiresponse.dataframe
+        self.apiresponse.response = {"status":"ok", "body":
+            example_stations_grid(HAMBURG_COORDINATES_OUTLINE, 3)}
+        self.assertIsNot(self.apiresponse.dataframe, df)
+        self.assertEqual(len(self.apiresponse.dataframe), 9)
+
+    @testname("DataFrame caching can be disabled")
+    def test_Disabled(self):
+        df = self.apiresponse.dataframe
+        self.apiresponse.cache_dataframe = False
+        self.assertIsNot(self.apiresponse.dataframe, df)
+        self.assertIsNot(self.apiresponse.dataframe,
+            self.apiresponse.dataframe)
+
+    @testname("DataFrame caching can be disabled module-wide")
+    def test_DisabledModuleWide(self):
+        responsetypes.CACHE_DATAFRAMES = False
+        try:
+            self.assertIsNot(self.apiresponse.dataframe,
+                self.apiresponse.dataframe)
+        finally:
+            responsetypes.CACHE_DATAFRAMES = True
+
+    @testname("TokenResponse can't be converted")
+    def test_NoConversion(self):
+        apiresponse = responsetypes.TokenResponse(
+            request = requests.TokenRequest(), response = {})
+        with self.assertRaises(NotImplementedError):
+            apiresponse.dataframe
+
+
+#########################################
+### test the compact response objects ###
+#########################################
+class CompactResponseTest(BasicTest):
+    # create a Getmeasure response
+    def response(self, **kwargs):
+        return responsetypes.GetmeasureResponse(
+            request = requests.GetmeasureRequest(payload = {
+                "type":"Temperature,Humidity"}),
+            response = {"status":"ok", "body":{"1000":[8.1,84]}}, **kwargs)
+
+    @testname("requests and responses have no instance dict")
+    def test_Slots(self):
+        apiresponse = self.response()
+        for obj in (apiresponse, apiresponse.request):
+            self.assertFalse(hasattr(obj, "__dict__"))
+            with self.assertRaises(AttributeError):
+                obj.undefined = 1
+
+    @testname("the types are kept when the request is dropped")
+    def test_DropRequest(self):
+        apiresponse = self.response()
+        apiresponse.drop_request()
+        self.assertIsNone(apiresponse.request)
+        self.assertEqual(apiresponse.types, ["Temperature","Humidity"])
+        self.assertEqual(list(apiresponse.dataframe.columns),
+            ["Temperature","Humidity"])
+        self.assertIsNone(self.response(keep_request = False).request)
+
+    @testname("requests can be dropped module-wide")
+    def test_DropRequestModuleWide(self):
+        responsetypes.KEEP_REQUESTS = False
+        try:
+            self.assertIsNone(self.response().request)
+            self.assertIsNotNone(self.response(keep_request = True).request)
+        finally:
+            responsetypes.KEEP_REQUESTS = True
+
+
+def run():
+    # run the tests
+    logger.info("=== RESPONSETYPES TESTS ===")
+    unittest.main(exit=False,module=__name__)
+    logger.info("=== END OF RESPONSETYPES TESTS ===")
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+# system modules
+import unittest
+import logging
+import time
+import json
+import email.utils
+import asyncio
+import http.client
+
+# import retry module
+from netatmo.api import retry
+from netatmo.api import client
+from netatmo.api import requests
+from netatmo.api import authentication
+from netatmo.api import connectionpool
+from netatmo.api.errors import *
+# import test data
+from .test_data import *
+from .test_flow import *
+
+# get a logger
+logger = logging.getLogger(__name__)
+
+# a policy without noticeable waiting
+def fast_policy(**kwargs):
+    kwargs.setdefault("backoff", 0.001)
+    kwargs.setdefault("throttling_backoff", 0.001)
+    return retry.RetryPolicy(**kwargs)
+
+# a function failing with the given errors first
+def failing(*errors):
+    errors = list(errors)
+    def function():
+        if errors:
+            raise errors.pop(0)
+        return "ok"
+    return function
+
+
+#######################
+### test the policy ###
+#######################
+class RetryPolicyTest(BasicTest):
+    @testname("backoff doubles up to the maximum")
+    def test_Backoff(self):
+        policy = retry.RetryPolicy(backoff = 1, max_backoff = 5, jitter = 0)
+        self.assertEqual([policy.delay(i) for i in range(1,6)],
+            [1, 2, 4, 5, 5])
+
+    @testname("jitter shortens the backoff randomly")
+    def test_Jitter(self):
+        policy = retry.RetryPolicy(backoff = 1, jitter = 0.5)
+        delays = [policy.delay(1) for i in range(100)]
+        self.assertTrue(all(0.5 <= d <= 1 for d in delays))
+        self.assertGreater(len(set(delays)), 1)
+
+    @testname("throttled requests wait at least for the rate limit window")
+    def test_ThrottlingBackoff(self):
+        policy = retry.RetryPolicy(backoff = 1, max_backoff = 30, jitter = 0)
+        error = ApiThrottlingError()
+        self.assertEqual([policy.delay(i, error) for i in range(1,4)],
+            [10, 20, 30])
+        policy.jitter = 0.5
+        delays = [policy.delay(1, error) for i in range(100)]
+        self.assertTrue(all(10 <= d <= 15 for d in delays))
+
+    @testname("Retry-After is honoured")
+    def test_RetryAfter(self):
+        policy = retry.RetryPolicy(backoff = 1, jitter = 0.5)
+        error = ApiThrottlingError()
+        error.retry_after = 45
+        self.assertGreaterEqual(policy.delay(1, error), 45)
+        error = ApiServerError(503, retry_after = 3)
+        self.assertGreaterEqual(policy.delay(1, error), 3)
+
+    @testname("Retry-After values are parsed")
+    def test_RetryAfterValues(self):
+        self.assertEqual(requests.retry_after_seconds("120"), 120)
+        date = email.utils.formatdate(time.time() + 60, usegmt = True)
+        self.assertAlmostEqual(requests.retry_after_seconds(date), 60,
+            delta = 2)
+        self.assertIsNone(requests.retry_after_seconds("soon"))
+        self.assertIsNone(requests.retry_after_seconds(None))
+
+    @testname("interrupts are not retried")
+    def test_Interrupt(self):
+        policy = fast_policy()
+        with self.assertRaises(KeyboardInterrupt):
+            policy.call(failing(KeyboardInterrupt()), endpoint = "/api")
+        self.assertEqual(policy.statistics["/api"],
+            {"attempts":1, "retries":0, "failures":0})
+
+    @testname("retryable errors are retried")
+    def test_Retry(self):
+        policy = fast_policy()
+        result = policy.call(failing(ConnectionResetError(),
+            ApiServerError(503)), endpoint = "/api")
+        self.assertEqual(result, "ok")
+        self.assertEqual(policy.statistics["/api"],
+            {"attempts":3, "retries":2, "failures":0})
+
+    @testname("other errors are raised immediately")
+    def test_NotRetryable(self):
+        policy = fast_policy()
+        with self.assertRaises(InvalidCredentialsError):
+            policy.call(failing(InvalidCredentialsError()), endpoint = "/api")
+        self.assertEqual(policy.statistics["/api"],
+            {"attempts":1, "retries":0, "failures":1})
+
+    @testname("the last error is raised after max_attempts")
+    def test_MaxAttempts(self):
+        policy = fast_policy(max_attempts = 2)
+        with self.assertRaises(ApiThrottlingError):
+            policy.call(failing(ApiServerError(500), ApiThrottlingError(),
+                ApiServerError(500)))
+        self.assertEqual(policy.statistics[""]["attempts"], 2)
+
+    @testname("no retry is started after the deadline")
+    def test_Deadline(self):
+        policy = retry.RetryPolicy(backoff = 10, jitter = 0, deadline = 1)
+        start = time.monotonic()
+        with self.assertRaises(ApiServerError):
+            policy.call(failing(ApiServerError(500)))
+        self.assertLess(time.monotonic() - start, 1)
+
+    @testname("awaitable call")
+    def test_Async(self):
+        policy = fast_policy()
+        function = failing(OSError())
+        async def call():
+            return function()
+        self.assertEqual(asyncio.run(policy.call_async(call)), "ok")
+        self.assertEqual(policy.statistics[""]["retries"], 1)
+
+
+#########################
+### test the requests ###
+#########################
+class RequestRetryTest(BasicTest):
+    # execute this before each test method
+    def setUp(self):
+        self.server = LocalJSONServer(response = {"status":"ok",
+            "body":EXAMPLE_JSON}).__enter__()
+        tokens = EXAMPLE_TOKENS.copy()
+        tokens["token_request_time"] = time.time()
+        self.auth = authentication.Authentication(tokens = tokens)
+        self.pool = connectionpool.ConnectionPool(
+            connection_class = http.client.HTTPConnection)
+
+    # execute this after each test method
+    def tearDown(self):
+        self.pool.clear()
+        self.server.__exit__()
+
+    # create a request to the local server
+    def request(self):
+        apirequest = requests.GetstationsdataRequest(payload = {
+            "device_id": "70:ee:50:00:00:01", "get_favourites": "false"})
+        apirequest.server = self.server.address
+        apirequest.connection_pool = self.pool
+        return apirequest
+
+    @testname("no retries by default")
+    def test_Default(self):
+        self.assertIsNone(self.request().retry_policy)
+        self.server.failures = [(503, b"")]
+        with self.assertRaises(ApiServerError):
+            self.request().issue()
+        self.assertEqual(len(self.server.requests), 1)
+
+    @testname("5xx responses are retried")
+    def test_ServerError(self):
+        self.server.failures = [(502, b"<html>Bad Gateway</html>"),
+            (503, b"")]
+        apirequest = self.request()
+        apirequest.retry_policy = policy = fast_policy()
+        apirequest.issue()
+        self.assertEqual(apirequest.response.response["status"], "ok")
+        self.assertEqual(len(self.server.requests), 3)
+        self.assertEqual(policy.statistics[apirequest.url]["retries"], 2)
+
+    @testname("non-JSON responses raise InvalidApiResponseError")
+    def test_InvalidJSON(self):
+        self.server.failures = [(200, b"<html>Maintenance</html>")]
+        with self.assertRaises(InvalidApiResponseError):
+            self.request().issue()
+
+    @testname("throttling responses are retried by the client")
+    def test_Throttling(self):
+        self.server.failures = [(429, b""), (403, json.dumps({"error":{
+            "code":26, "message":"User usage reached"}}).encode())]
+        c = client.NetatmoClient(authentication = self.auth,
+            retry_policy = fast_policy())
+        apiresponse = c.issue(self.request())
+        self.assertEqual(apiresponse.response["status"], "ok")
+        self.assertEqual(len(self.server.requests), 3)
+
+    @testname("the Retry-After header is read")
+    def test_RetryAfterHeader(self):
+        for issue in (lambda r: r.issue(),
+            lambda r: self.run_async(r.issue_async(), self.pool)):
+            self.server.failures = [(429, b"", {"Retry-After":"7"})]
+            with self.assertRaises(ApiThrottlingError) as cm:
+                issue(self.request())
+            self.assertEqual(cm.exception.retry_after, 7)
+
+    @testname("async requests are retried")
+    def test_Async(self):
+        self.server.failures = [(500, b"")]
+        c = client.AsyncNetatmoClient(authentication = self.auth,
+            retry_policy = fast_policy())
+        apiresponse = self.run_async(c.issue(self.request()), self.pool)
+        self.assertEqual(apiresponse.response["status"], "ok")
+        self.assertEqual(len(self.server.requests), 2)
+
+
+def run():
+    # run the tests
+    logger.info("=== RETRY TESTS ===")
+    unittest.main(exit=False,module=__name__)
+    logger.info("=== END OF RETRY TESTS ===")
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+# system modules
+import unittest
+import logging
+import os
+import shutil
+
+# external modules
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+# import storage module
+from netatmo import storage
+from netatmo.api import requests
+# import test data
+from .test_data import *
+from .test_flow import *
+from .test_server import synthetic_stations
+
+# get a logger
+logger = logging.getLogger(__name__)
+
+TMPSTOREDIR = os.path.join(TMPDIR,"store")
+
+# measurements every hour
+def example_frame(start, periods, columns = ("Temperature","Humidity")):
+    index = pd.date_range(start, periods = periods, freq = "h", tz = "UTC",
+        name = "time")
+    return DataFrame({c: np.arange(periods, dtype = float) + i
+        for i, c in enumerate(columns)}, index = index)
+
+
+########################
+### test the storage ###
+########################
+class MeasurementStoreTest(BasicTest):
+    # execute this before each test method
+    def setUp(self):
+        shutil.rmtree(TMPSTOREDIR, ignore_errors = True)
+        self.store = storage.MeasurementStore(TMPSTOREDIR)
+
+    # execute this after each test method
+    def tearDown(self):
+        shutil.rmtree(TMPSTOREDIR, ignore_errors = True)
+
+    @testname("appended measurements are read back")
+    def test_RoundTrip(self):
+        df = example_frame("2017-06-01 20:00", 10)
+        self.store.append("a", df)
+        self.assertEqual(self.store.stations, ["a"])
+        pd.testing.assert_frame_equal(self.store.query("a"), df,
+            check_freq = False, check_index_type = False)
+
+    @testname("measurements are partitioned by day")
+    def test_Partitions(self):
+        self.store.append("a", example_frame("2017-06-01 20:00", 10))
+        self.assertEqual([n for n, e in self.store.partitions("a")],
+            ["2017-06-01", "2017-06-02"])
+        self.assertEqual([e["n"] for n, e in self.store.partitions("a")],
+            [4, 6])
+
+    @testname("range queries read only the overlapping partitions")
+    def test_Range(self):
+        self.store.append("a", example_frame("2017-06-01", 72))
+        start, end = "2017-06-02 05:00", "2017-06-02 07:00"
+        self.assertEqual(len(self.store.partitions("a",
+            start = storage.to_seconds([start])[0],
+            end = storage.to_seconds([end])[0])), 1)
+        df = self.store.query("a", start = start, end = end,
+            columns = ["Temperature"])
+        self.assertEqual(list(df.columns), ["Temperature"])
+        self.assertEqual(list(df["Temperature"]), [29., 30., 31.])
+
+    @testname("the store is read again from disk")
+    def test_Reopen(self):
+        df = example_frame("2017-06-01", 5)
+        self.store.append("a", df)
+        reopened = storage.MeasurementStore(TMPSTOREDIR)
+        self.assertEqual(len(reopened.query("a")), 5)
+
+    @testname("new columns are filled with NaN")
+    def test_NewColumn(self):
+        self.store.append("a", example_frame("2017-06-01", 2,
+            columns = ["Temperature"]))
+        self.store.append("a", example_frame("2017-06-01 02:00", 2,
+            columns = ["Humidity"]))
+        df = self.store.query("a")
+        self.assertEqual(list(df.columns), ["Temperature","Humidity"])
+        np.testing.assert_array_equal(df["Temperature"], [0,1,np.nan,np.nan])
+        np.testing.assert_array_equal(df["Humidity"], [np.nan,np.nan,0,1])
+
+    @testname("unordered appends are returned sorted")
+    def test_Unordered(self):
+        self.store.append("a", example_frame("2017-06-01 05:00", 2))
+        self.store.append("a", example_frame("2017-06-01 01:00", 2))
+        self.assertFalse(self.store.partitions("a")[0][1]["sorted"])
+        df = self.store.query("a", start = "2017-06-01 02:00")
+        self.assertEqual(len(df), 3)
+        self.assertTrue(df.index.is_monotonic_increasing)
+
+    @testname("rows of an interrupted append are dropped")
+    def test_Interrupted(self):
+        self.store.append("a", example_frame("2017-06-01", 2))
+        # simulate a crash after writing the column files
+        directory = self.store.partition_directory("a", "2017-06-01")
+        with open(os.path.join(directory, storage.TIME_FILENAME), "ab") as f:
+            f.write(b"garbage")
+        self.assertEqual(len(self.store.query("a")), 2)
+        self.store.append("a", example_frame("2017-06-01 02:00", 1))
+        df = self.store.query("a")
+        self.assertEqual(len(df), 3)
+        self.assertTrue(df.index.is_monotonic_increasing)
+
+    @testname("Getmeasure responses are stored per device and module")
+    def test_Getmeasure(self):
+        apirequest = requests.GetmeasureRequest(payload = {
+            "device_id":"70:ee:50:00:00:01", "module_id":"02:00:00:00:00:01",
+            "scale":"max", "type":"Temperature,Humidity"})
+        apiresponse = apirequest.response_class(request = apirequest,
+            response = {"status":"ok", "body":{"1496275200":[20.5, 80],
+                "1496275500":[20.6, 79]}})
+        self.store.append_getmeasure(apiresponse)
+        df = self.store.query("70:ee:50:00:00:01/02:00:00:00:00:01")
+        self.assertEqual(list(df["Temperature"]), [20.5, 20.6])
+
+    @testname("Getpublicdata responses are stored per station")
+    def test_Getpublicdata(self):
+        stations = [{"_id":"70:ee:50:00:00:0{}".format(i),
+            "place":{"location":[10,53], "altitude":5,
+                "timezone":"Europe/Berlin"},
+            "measures":{
+                "02:00:00:00:00:01":{"res":{"1496275200":[20.5+i, 80]},
+                    "type":["temperature","humidity"]},
+                "06:00:00:00:00:01":{"res":{"1496275300":[1012]},
+                    "type":["pressure"]},
+                }} for i in range(2)]
+        apirequest = requests.GetpublicdataRequest(payload = {})
+        apiresponse = apirequest.response_class(request = apirequest,
+            response = {"status":"ok", "body":stations})
+        self.store.append_getpublicdata(apiresponse)
+        self.assertEqual(self.store.stations,
+            ["70:ee:50:00:00:00", "70:ee:50:00:00:01"])
+        df = self.store.query("70:ee:50:00:00:01")
+        self.assertEqual(len(df), 2) # two measurement times
+        self.assertEqual(df["temperature"].iloc[0], 21.5)
+        self.assertEqual(df["pressure"].iloc[1], 1012)
+
+    @testname("the index is written once for thousands of stations")
+    def test_ManyStations(self):
+        apirequest = requests.GetpublicdataRequest(payload = {})
+        apiresponse = apirequest.response_class(request = apirequest,
+            response = {"status":"ok", "body":synthetic_stations(2000)})
+        writes = []
+        write_index = self.store.write_index
+        self.store.write_index = lambda: writes.append(write_index())
+        self.store.append_getpublicdata(apiresponse)
+        self.assertEqual(len(writes), 1)
+        reopened = storage.MeasurementStore(TMPSTOREDIR)
+        self.assertEqual(len(reopened.stations), 2000)
+
+    @testname("appends only log their own index entries")
+    def test_IndexLog(self):
+        for day in range(30):
+            self.store.append("a", example_frame(
+                pd.Timestamp("2017-06-01") + pd.Timedelta(days = day), 24))
+        size = os.path.getsize(self.store.index_log_file)
+        self.store.append("b", example_frame("2017-06-01", 1))
+        # one entry, not the whole index
+        self.assertLess(os.path.getsize(self.store.index_log_file) - size,
+            200)
+        self.assertFalse(os.path.exists(self.store.index_file))
+        reopened = storage.MeasurementStore(TMPSTOREDIR)
+        self.assertEqual(reopened.stations, ["a", "b"])
+        self.assertEqual(len(reopened.query("a")), 30 * 24)
+
+    @testname("an interrupted index log write is dropped")
+    def test_IndexLogInterrupted(self):
+        self.store.append("a", example_frame("2017-06-01", 5))
+        size = os.path.getsize(self.store.index_log_file)
+        with open(self.store.index_log_file, "a") as f:
+            f.write('{"b":{"2017-06-0')
+        reopened = storage.MeasurementStore(TMPSTOREDIR)
+        self.assertEqual(reopened.stations, ["a"])
+        self.assertEqual(os.path.getsize(reopened.index_log_file), size)
+        reopened.append("a", example_frame("2017-06-01 05:00", 5))
+        self.assertEqual(len(storage.MeasurementStore(TMPSTOREDIR).query("a")),
+            10)
+
+    @testname("the index log is merged into the index file")
+    def test_IndexCompaction(self):
+        limit = storage.INDEX_LOG_COMPACT_BYTES
+        storage.INDEX_LOG_COMPACT_BYTES = 1000
+        try:
+            for day in range(20):
+                self.store.append("a", example_frame(
+                    pd.Timestamp("2017-06-01") + pd.Timedelta(days = day), 2))
+        finally:
+            storage.INDEX_LOG_COMPACT_BYTES = limit
+        self.assertTrue(os.path.exists(self.store.index_file))
+        self.assertLess(os.path.getsize(self.store.index_log_file),
+            os.path.getsize(self.store.index_file))
+        reopened = storage.MeasurementStore(TMPSTOREDIR)
+        self.assertEqual(len(reopened.partitions("a")), 20)
+        self.assertEqual(len(reopened.query("a")), 40)
+
+    @testname("stations appearing twice are stored once")
+    def test_DuplicateStations(self):
+        body = synthetic_stations(2)
+        apirequest = requests.GetpublicdataRequest(payload = {})
+        apiresponse = apirequest.response_class(request = apirequest,
+            response = {"status":"ok", "body":body + body[:1]})
+        self.store.append_getpublicdata(apiresponse)
+        self.assertEqual(len(self.store.stations), 2)
+        self.assertEqual(len(self.store.query(body[0]["_id"])),
+            len(self.store.query(body[1]["_id"])))
+
+
+def run():
+    # run the tests
+    logger.info("=== STORAGE TESTS ===")
+    unittest.main(exit=False,module=__name__)
+    logger.info("=== END OF STORAGE TESTS ===")
@@ -66,3 +66,38 @@ HAMBURG_COORDINATES_OUTLINE = {
     "lon_sw" : 9.7085,
 }
 
+
+##############################
+### example api responses ###
+##############################
+def example_station(number, lat, lon):
+    """ create a synthetic Getpublicdata station
+    """
+    mac = ":".join(["70","ee"] + ["{:02x}".format(
+        (number >> shift) & 0xff) for shift in (24,16,8,0)])
+    return {
+        "_id": mac,
+        "place": {
+            "location": [lon, lat],
+            "altitude": 30,
+            "timezone": "Europe/Berlin",
+            },
+        "measures": {
+            "02:00:00:00:00:{:02x}".format(number & 0xff): {
+                "res": {"1487242771": [8.1 + number % 10, 84]},
+                "type": ["temperature", "humidity"],
+                },
+            "70:ee:50:00:00:{:02x}".format(number & 0xff): {
+                "res": {"1487242805": [1029.1]},
+                "type": ["pressure"],
+                },
+            },
+        }
+
+def example_stations_grid(region, n):
+    """ create n x n synthetic Getpublicdata stations evenly spread over region
+    """
+    return [ example_station(i * n + j,
+        region["lat_sw"] + (region["lat_ne"]-region["lat_sw"]) * (i+0.5) / n,
+        region["lon_sw"] + (region["lon_ne"]-region["lon_sw"]) * (j+0.5) / n)
+        for i in range(n) for j in range(n) ]
@@ -5,6 +5,13 @@ import shutil
 import logging
 import unittest
 import json
+import threading
+import time
+import socket
+import struct
+import asyncio
+import zlib
+import http.server
 from functools import wraps
 
 # External modules
@@ -22,7 +29,101 @@ logger = logging.getLogger(__name__)
 
 # basic test class with utilities
 class BasicTest(unittest.TestCase):
-    pass
+    # run a coroutine and close the pools' idle asyncio connections before
+    # the event loop ends
+    def run_async(self, coroutine, *pools):
+        async def run():
+            try: return await coroutine
+            finally:
+                for pool in pools:
+                    await pool.clear_async()
+        return asyncio.run(run())
+
+
+# local HTTP server answering every POST request with JSON
+# *use this to test requests without network access*
+class LocalJSONServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, response = {}):
+        self.response = response   # the JSON to respond
+        self.close_after = False   # drop connections without telling client
+        self.requests = []         # (path, body) of all handled requests
+        self.headers = []          # request headers of all handled requests
+        self.encoding = None       # compress responses: gzip, deflate or
+                                   # rawdeflate (deflate without zlib header)
+        self.connections = set()   # client addresses seen
+        self.failures = []         # (status, body bytes[, headers dict]) to
+                                   # answer the next requests with instead
+                                   # of the response
+        self.resets = 0            # reset the connection after the status
+                                   # line for this many next requests
+        server = self
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1" # keep connections alive
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length",0))
+                body = self.rfile.read(length).decode()
+                server.requests.append((self.path, body))
+                server.headers.append(dict(self.headers))
+                server.connections.add(self.client_address)
+                if server.resets:
+                    server.resets -= 1
+                    self.send_response(200)
+                    self.flush_headers()
+                    time.sleep(0.05) # let the client read the status line
+                    self.connection.setsockopt(socket.SOL_SOCKET,
+                        socket.SO_LINGER, struct.pack("ii", 1, 0))
+                    self.connection.close() # sends RST instead of FIN
+                    self.close_connection = True
+                    return
+                if server.failures:
+                    status, data, *headers = server.failures.pop(0)
+                    self.send_response(status)
+                    for header in headers:
+                        for key, value in header.items():
+                            self.send_header(key, value)
+                    self.send_header("Content-Length",str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+                    return
+                data = json.dumps(server.response).encode()
+                encoding = server.encoding
+                if encoding and not encoding.replace("raw","") in \
+                    self.headers.get("Accept-Encoding",""):
+                    encoding = None # client doesn't accept it
+                if encoding:
+                    compressor = zlib.compressobj(wbits = {"gzip":31,
+                        "deflate":15, "rawdeflate":-15}[encoding])
+                    data = compressor.compress(data) + compressor.flush()
+                self.send_response(200)
+                self.send_header("Content-Type","application/json")
+                if encoding:
+                    self.send_header("Content-Encoding",
+                        encoding.replace("raw",""))
+                self.send_header("Content-Length",str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+                if server.close_after:
+                    self.close_connection = True
+            def log_message(self, *args):
+                pass
+        super().__init__(("localhost",0), Handler)
+
+    @property
+    def address(self):
+        return "localhost:{}".format(self.server_address[1])
+
+    def __enter__(self):
+        thread = threading.Thread(target=self.serve_forever,
+            kwargs={"poll_interval":0.01}, daemon=True)
+        thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.shutdown()
+        self.server_close()
 
 
 # in the beginning of a test module, do all this
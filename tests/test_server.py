@@ -0,0 +1,296 @@
+# -*- coding: utf-8 -*-
+# System modules
+import json
+import math
+import time
+import uuid
+import zlib
+import random
+import threading
+import collections
+import urllib.parse
+import http.server
+
+# External modules
+
+# Internal modules
+from netatmo.api.variables import *
+
+
+######################
+### synthetic data ###
+######################
+def mac(prefix, i):
+    """ a MAC address from a prefix (e.g. '70:ee:50') and a number
+    """
+    return "{}:{:02x}:{:02x}:{:02x}".format(prefix,
+        i >> 16 & 0xff, i >> 8 & 0xff, i & 0xff)
+
+def synthetic_stations(n, region = None, seed = 0, now = 1487242771):
+    """ create n synthetic Getpublicdata stations with a realistic mix of
+    modules (outdoor module, indoor module, sometimes rain and wind)
+
+    Args:
+        n (int): the number of stations
+        region (dict, optional): the region to place the stations in.
+            Defaults to Germany.
+        seed (int, optional): the random seed
+        now (int, optional): the time of the measurements
+
+    Returns:
+        list of dict: the 'body' of a Getpublicdata response
+    """
+    region = region or {"lat_ne":55, "lat_sw":47, "lon_ne":15, "lon_sw":5}
+    rng = random.Random(seed)
+    stations = []
+    for i in range(n):
+        t = now + rng.randint(0, 600)
+        measures = {
+            mac("02:00:00", i): {
+                "res": {str(t): [round(rng.uniform(-10,30),1),
+                    rng.randint(20,100)]},
+                "type": ["temperature", "humidity"],
+                },
+            mac("70:ee:50", i): {
+                "res": {str(t + 30): [round(rng.uniform(990,1040),1)]},
+                "type": ["pressure"],
+                },
+            }
+        if i % 3 == 0:
+            measures[mac("05:00:00", i)] = {
+                "rain_60min": 0, "rain_24h": 0.3, "rain_live": 0,
+                "rain_timeutc": t,
+                }
+        if i % 5 == 0:
+            measures[mac("06:00:00", i)] = {
+                "wind_strength": rng.randint(0,30),
+                "wind_angle": rng.randint(0,359),
+                "gust_strength": rng.randint(0,50),
+                "gust_angle": rng.randint(0,359),
+                "wind_timeutc": t,
+                }
+        stations.append({
+            "_id": mac("70:ee:50", i),
+            "place": {
+                "location": [
+                    rng.uniform(region["lon_sw"], region["lon_ne"]),
+                    rng.uniform(region["lat_sw"], region["lat_ne"])],
+                "altitude": rng.randint(0,500),
+                "timezone": "Europe/Berlin",
+                },
+            "mark": rng.randint(1,10),
+            "measures": measures,
+            })
+    return stations
+
+def synthetic_measures(types, date_begin, date_end, scale = "max",
+    limit = GETMEASURE_MAX_MEASURES, optimize = True):
+    """ create synthetic Getmeasure values
+
+    Args:
+        types (list of str): the measure types
+        date_begin, date_end (int): the time range
+        scale (str, optional): the scale. Defaults to 'max'.
+        limit (int, optional): the maximum number of values. Defaults to
+            GETMEASURE_MAX_MEASURES.
+        optimize (bool, optional): the optimized response format. Defaults to
+            True.
+
+    Returns:
+        list or dict: the 'body' of a Getmeasure response
+    """
+    step = GETMEASURE_SCALE_SECONDS[scale]
+    first = -(-int(date_begin) // step) * step # first multiple of step
+    times = range(first, int(date_end) + 1, step)[:limit]
+    values = [[round(20 + 10 * math.sin(t / 86400 * 2 * math.pi) + i, 1)
+        for i in range(len(types))] for t in times]
+    if optimize:
+        return [{"beg_time": times[0], "step_time": step, "value": values}] \
+            if len(times) else []
+    return {str(t): v for t, v in zip(times, values)}
+
+def synthetic_device(device_id, now = 1487242771):
+    """ create a synthetic Getstationsdata device
+
+    Args:
+        device_id (str): the device MAC address
+
+    Returns:
+        dict: the 'body' of a Getstationsdata response
+    """
+    return {
+        "devices": [{
+            "_id": device_id,
+            "station_name": "Synthetic",
+            "type": "NAMain",
+            "data_type": ["Temperature","CO2","Humidity","Noise","Pressure"],
+            "dashboard_data": {"time_utc": now, "Temperature": 21.5,
+                "CO2": 600, "Humidity": 45, "Noise": 35, "Pressure": 1013.2,
+                "AbsolutePressure": 1005.1, "min_temp": 20.1,
+                "max_temp": 22.3, "date_min_temp": now - 3600,
+                "date_max_temp": now - 7200},
+            "modules": [],
+            }],
+        "user": {"mail": "user.email@internet.com"},
+        }
+
+
+#######################
+### the mock server ###
+#######################
+# local stand-in for the netatmo api with synthetic data
+# *use this to test and benchmark the client without network access*
+class MockNetatmoServer(http.server.ThreadingHTTPServer):
+    """ Local HTTP server implementing the token, Getpublicdata, Getmeasure
+    and Getstationsdata endpoints with synthetic data. Use it as context
+    manager to serve in a background thread.
+
+    Args:
+        stations (int, optional): the number of stations Getpublicdata
+            responds. Defaults to 100.
+        measures (int, optional): the maximum number of values Getmeasure
+            responds. Defaults to GETMEASURE_MAX_MEASURES.
+        latency (float, optional): seconds to wait before every response.
+            Defaults to 0.
+        expires_in (int, optional): the lifetime of the tokens in seconds.
+            Defaults to 10800.
+    """
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, stations = 100, measures = GETMEASURE_MAX_MEASURES,
+        latency = 0, expires_in = 10800):
+        self.stations = stations
+        self.measures = measures
+        self.latency = latency
+        self.expires_in = expires_in
+        self.access_tokens = set()  # the valid access tokens
+        self.refresh_tokens = set() # the valid refresh tokens
+        self.requests = collections.Counter() # path -> number of requests
+        self.bytes_sent = 0         # body bytes sent
+        self.lock = threading.Lock()
+        self._bodies = {}           # cached Getpublicdata bodies
+        server = self
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1" # keep connections alive
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length",0))
+                payload = dict(urllib.parse.parse_qsl(
+                    self.rfile.read(length).decode()))
+                if server.latency:
+                    time.sleep(server.latency)
+                status, data = server.respond(self.path, payload)
+                gzip = "gzip" in self.headers.get("Accept-Encoding","")
+                if gzip:
+                    compressor = zlib.compressobj(wbits = 31)
+                    data = compressor.compress(data) + compressor.flush()
+                with server.lock:
+                    server.requests[self.path] += 1
+                    server.bytes_sent += len(data)
+                self.send_response(status)
+                self.send_header("Content-Type","application/json")
+                if gzip:
+                    self.send_header("Content-Encoding","gzip")
+                self.send_header("Content-Length",str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+            def log_message(self, *args):
+                pass
+        super().__init__(("localhost",0), Handler)
+
+    @property
+    def address(self):
+        """ the server address to use as api server
+        """
+        return "localhost:{}".format(self.server_address[1])
+
+    def new_tokens(self):
+        """ issue new tokens
+        """
+        tokens = {
+            "access_token": "{}|{}".format(uuid.uuid4().hex[:24],
+                uuid.uuid4().hex),
+            "refresh_token": "{}|{}".format(uuid.uuid4().hex[:24],
+                uuid.uuid4().hex),
+            "expires_in": self.expires_in,
+            "expire_in": self.expires_in,
+            "scope": ["read_station"],
+            }
+        with self.lock:
+            self.access_tokens.add(tokens["access_token"])
+            self.refresh_tokens.add(tokens["refresh_token"])
+        return tokens
+
+    def respond(self, path, payload):
+        """ the response to a request
+
+        Args:
+            path (str): the requested url
+            payload (dict): the decoded form data
+
+        Returns:
+            status, data: the HTTP status and the JSON bytes
+        """
+        if path == NETATMO_API_TOKEN_URL:
+            grant_type = payload.get("grant_type")
+            if grant_type == "password" and all(payload.get(k) for k in
+                ("client_id","client_secret","username","password")):
+                return 200, json.dumps(self.new_tokens()).encode()
+            if grant_type == "refresh_token":
+                with self.lock:
+                    valid = payload.get("refresh_token") in self.refresh_tokens
+                if valid:
+                    return 200, json.dumps(self.new_tokens()).encode()
+                return 400, b'{"error":"invalid_grant"}'
+            return 400, b'{"error":"invalid_client"}'
+        with self.lock:
+            valid = payload.get("access_token") in self.access_tokens
+        if not valid:
+            return 403, json.dumps({"error":{"code":2,
+                "message":"Invalid access token"}}).encode()
+        if path == NETATMO_API_GETPUBLICDATA_URL:
+            body = self.getpublicdata_body(payload)
+        elif path == NETATMO_API_GETMEASURE_URL:
+            body = json.dumps(synthetic_measures(
+                types = payload.get("type","Temperature").split(","),
+                date_begin = float(payload.get("date_begin", 1487242771)),
+                date_end = float(payload.get("date_end", 1487242771 +
+                    self.measures * 300)),
+                scale = payload.get("scale","max"),
+                limit = min(self.measures,
+                    int(payload.get("limit", GETMEASURE_MAX_MEASURES))),
+                optimize = payload.get("optimize","true") == "true"))
+        elif path == NETATMO_API_GETSTATIONSDATA_URL:
+            body = json.dumps(synthetic_device(payload.get("device_id")))
+        else:
+            return 404, json.dumps({"error":{"code":404,
+                "message":"Not found"}}).encode()
+        return 200, '{{"status":"ok","time_server":{},"body":{}}}'.format(
+            int(time.time()), body).encode()
+
+    def getpublicdata_body(self, payload):
+        """ the JSON of the stations in a region (cached per region)
+        """
+        region = {k: float(payload.get(k, 0)) for k in
+            ("lat_ne","lat_sw","lon_ne","lon_sw")}
+        key = tuple(sorted(region.items()))
+        with self.lock:
+            body = self._bodies.get(key)
+        if body is None:
+            body = json.dumps(synthetic_stations(self.stations,
+                region = region))
+            with self.lock:
+                if len(self._bodies) > 64:
+                    self._bodies.clear()
+                self._bodies[key] = body
+        return body
+
+    def __enter__(self):
+        thread = threading.Thread(target=self.serve_forever,
+            kwargs={"poll_interval":0.01}, daemon=True)
+        thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.shutdown()
+        self.server_close()
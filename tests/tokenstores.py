@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# system modules
+import unittest
+import logging
+import os
+import time
+import multiprocessing
+
+# import tokenstores module
+from netatmo.api import tokenstores
+from netatmo.api import authentication
+# import test data
+from .test_data import *
+from .test_flow import *
+
+# get a logger
+logger = logging.getLogger(__name__)
+
+TMPSQLITEFILE = os.path.join(TMPDIR,"tokens.sqlite")
+
+# hold the lock of a token store in another process for a while
+def hold_lock(store, locked, seconds):
+    with store.locked():
+        locked.set()
+        time.sleep(seconds)
+
+
+############################################
+### base class for the token store tests ###
+############################################
+class TokenStoreTest(BasicTest):
+    # execute this before each test method
+    def setUp(self):
+        for f in (TMPAUTHFILE, TMPSQLITEFILE):
+            if os.path.exists(f):
+                os.remove(f)
+        self.stores = [
+            tokenstores.JSONFileTokenStore(TMPAUTHFILE),
+            tokenstores.SQLiteTokenStore(TMPSQLITEFILE),
+            ]
+
+    @testname("empty store reads empty dict")
+    def test_ReadEmpty(self):
+        for store in self.stores:
+            self.assertEqual(store.read(), {})
+
+    @testname("written tokens can be read")
+    def test_WriteRead(self):
+        for store in self.stores:
+            self.assertTrue(store.write(EXAMPLE_TOKENS))
+            self.assertEqual(store.read(), EXAMPLE_TOKENS)
+            self.assertTrue(store.write(EXAMPLE_TOKENS_2))
+            self.assertEqual(store.read(), EXAMPLE_TOKENS_2)
+
+    @testname("JSON file is replaced without leftovers")
+    def test_AtomicWrite(self):
+        store = self.stores[0]
+        for i in range(3):
+            store.write(EXAMPLE_TOKENS)
+        self.assertEqual(sorted(os.listdir(TMPDIR)), [TMPAUTHFILENAME])
+
+    @testname("lock is reentrant within a thread")
+    def test_ReentrantLock(self):
+        for store in self.stores:
+            with store.locked():
+                with store.locked():
+                    store.write(EXAMPLE_TOKENS)
+                self.assertEqual(store.read(), EXAMPLE_TOKENS)
+            self.assertEqual(store.read(), EXAMPLE_TOKENS)
+
+    @testname("writes in a failing lock are rolled back")
+    def test_Rollback(self):
+        store = self.stores[1]
+        store.write(EXAMPLE_TOKENS)
+        with self.assertRaises(ValueError):
+            with store.locked():
+                store.write(EXAMPLE_TOKENS_2)
+                raise ValueError
+        self.assertEqual(store.read(), EXAMPLE_TOKENS)
+        # only the failing nested level is rolled back
+        with store.locked():
+            store.write(EXAMPLE_TOKENS_2)
+            try:
+                with store.locked():
+                    store.write(EXAMPLE_TOKENS)
+                    raise ValueError
+            except ValueError:
+                pass
+            self.assertEqual(store.read(), EXAMPLE_TOKENS_2)
+        self.assertEqual(store.read(), EXAMPLE_TOKENS_2)
+
+    @testname("lock is shared across processes")
+    @unittest.skipIf(tokenstores.fcntl is None, "no fcntl")
+    def test_CrossProcessLock(self):
+        context = multiprocessing.get_context("fork")
+        for store in self.stores:
+            locked = context.Event()
+            process = context.Process(target = hold_lock,
+                args = (store, locked, 0.3))
+            process.start()
+            locked.wait()
+            start = time.time()
+            with store.locked():
+                waited = time.time() - start
+            process.join()
+            self.assertGreater(waited, 0.1)
+
+
+##############################################
+### test Authentication with a token store ###
+##############################################
+class AuthenticationTokenStoreTest(BasicTest):
+    # execute this before each test method
+    def setUp(self):
+        if os.path.exists(TMPSQLITEFILE):
+            os.remove(TMPSQLITEFILE)
+        self.store = tokenstores.SQLiteTokenStore(TMPSQLITEFILE)
+
+    # create an Authentication using the store with expired tokens
+    def authentication(self):
+        auth = authentication.Authentication(
+            credentials = EXAMPLE_CREDENTIALS.copy())
+        tokens = EXAMPLE_TOKENS.copy()
+        tokens["token_request_time"] = time.time() - \
+            authentication.DEFAULT_EXPIRE_TIME - 1
+        auth.tokens = tokens
+        auth.token_store = self.store
+        auth.refreshs = []
+        def refresh():
+            auth.refreshs.append(time.time())
+            tokens = EXAMPLE_TOKENS_2.copy()
+            tokens["refresh_request_time"] = time.time()
+            auth.tokens = tokens
+        auth.refresh_current_tokens = refresh
+        return auth
+
+    @testname("tokens are written to the store")
+    def test_WriteToStore(self):
+        auth = self.authentication()
+        tokens = auth.tokens # refreshes the tokens
+        self.assertEqual(self.store.read(), tokens)
+        self.assertIsNone(auth.tmpfile)
+
+    @testname("tokens refreshed by another instance are used")
+    def test_SharedRefresh(self):
+        auth1, auth2 = self.authentication(), self.authentication()
+        self.assertEqual(auth1.tokens["access_token"],
+            EXAMPLE_TOKENS_2["access_token"])
+        self.assertEqual(len(auth1.refreshs), 1)
+        # auth2 uses the tokens auth1 refreshed
+        self.assertEqual(auth2.tokens["access_token"],
+            EXAMPLE_TOKENS_2["access_token"])
+        self.assertEqual(auth2.refreshs, [])
+
+    @testname("refresh time counts for the token expiry")
+    def test_RefreshTime(self):
+        auth = self.authentication()
+        auth.tokens
+        self.assertAlmostEqual(auth.tokens_expire_at,
+            time.time() + authentication.DEFAULT_EXPIRE_TIME, delta = 5)
+
+    @testname("tmpfile sets a JSON file token store")
+    def test_TmpfileStore(self):
+        auth = authentication.Authentication(tmpfile = TMPAUTHFILE)
+        self.assertIsInstance(auth.token_store,
+            tokenstores.JSONFileTokenStore)
+        self.assertEqual(auth.token_store.filename, TMPAUTHFILE)
+        auth.tmpfile = None
+        self.assertIsNone(auth.token_store)
+
+
+def run():
+    # run the tests
+    logger.info("=== TOKENSTORES TESTS ===")
+    unittest.main(exit=False,module=__name__)
+    logger.info("=== END OF TOKENSTORES TESTS ===")
@@ -5,6 +5,7 @@ import logging
 import os
 import shutil
 import json
+import unittest.mock
 
 # import utils module
 from netatmo import utils
@@ -79,6 +80,80 @@ class JSONioTest(BasicTest):
         # result should be the same JSON 
         self.assertEqual(utils.read_json_from_file(TMPJSONFILE), EXAMPLE_JSON)
 
+    @testname("atomic write leaves no temporary files")
+    def test_AtomicWrite(self):
+        for i in range(3):
+            self.assertTrue(utils.write_json_to_file(EXAMPLE_JSON,
+                TMPJSONFILE, atomic = True, fsync = True))
+        self.assertEqual(utils.read_json_from_file(TMPJSONFILE), EXAMPLE_JSON)
+        self.assertEqual(os.listdir(TMPDIR), [TMPJSONFILENAME])
+
+    @testname("failed atomic write leaves the file untouched")
+    def test_FailedAtomicWrite(self):
+        utils.write_json_to_file(EXAMPLE_JSON, TMPJSONFILE)
+        self.assertFalse(utils.write_json_to_file(json, TMPJSONFILE,
+            atomic = True))
+        self.assertEqual(utils.read_json_from_file(TMPJSONFILE), EXAMPLE_JSON)
+        self.assertEqual(os.listdir(TMPDIR), [TMPJSONFILENAME])
+
+    @testname("compact write")
+    def test_CompactWrite(self):
+        utils.write_json_to_file(EXAMPLE_JSON, TMPJSONFILE, compact = True)
+        with open(TMPJSONFILE) as f:
+            content = f.read()
+        self.assertNotIn("\n", content)
+        self.assertNotIn(": ", content)
+        self.assertEqual(utils.read_json_from_file(TMPJSONFILE), EXAMPLE_JSON)
+
+    @testname("unchanged files are not parsed again")
+    def test_ReadCache(self):
+        utils.write_json_to_file(EXAMPLE_JSON, TMPJSONFILE)
+        with unittest.mock.patch.object(utils.json, "load",
+            wraps = json.load) as load:
+            first = utils.read_json_from_file(TMPJSONFILE)
+            first["modified"] = True # must not modify the cache
+            second = utils.read_json_from_file(TMPJSONFILE)
+            self.assertEqual(load.call_count, 1)
+            self.assertEqual(second, EXAMPLE_JSON)
+            # a changed file is parsed again
+            utils.write_json_to_file({"a":1}, TMPJSONFILE, atomic = True)
+            self.assertEqual(utils.read_json_from_file(TMPJSONFILE), {"a":1})
+            self.assertEqual(load.call_count, 2)
+            # without cache, it is always parsed
+            utils.read_json_from_file(TMPJSONFILE, cache = False)
+            self.assertEqual(load.call_count, 3)
+
+    @testname("cache hits don't open the file")
+    def test_ReadCacheStatOnly(self):
+        utils.write_json_to_file(EXAMPLE_JSON, TMPJSONFILE)
+        self.assertEqual(utils.read_json_from_file(TMPJSONFILE), EXAMPLE_JSON)
+        with unittest.mock.patch("builtins.open",
+            side_effect = AssertionError("file opened")):
+            self.assertEqual(
+                utils.read_json_from_file(TMPJSONFILE), EXAMPLE_JSON)
+
+    @testname("rewrites in place with the same size are noticed")
+    def test_ReadCacheRewrite(self):
+        utils.write_json_to_file({"a":1}, TMPJSONFILE)
+        stat = os.stat(TMPJSONFILE)
+        self.assertEqual(utils.read_json_from_file(TMPJSONFILE)["a"], 1)
+        # same size, same inode, later modification time
+        with open(TMPJSONFILE, "r+") as f:
+            content = f.read().replace('"a": 1', '"a": 2')
+            f.seek(0)
+            f.write(content)
+        os.utime(TMPJSONFILE,
+            ns = (stat.st_atime_ns, stat.st_mtime_ns + 1000000))
+        self.assertEqual(os.stat(TMPJSONFILE).st_ino, stat.st_ino)
+        self.assertEqual(utils.read_json_from_file(TMPJSONFILE)["a"], 2)
+
+    @testname("atomic writes keep the mode of the file")
+    def test_AtomicWriteMode(self):
+        utils.write_json_to_file(EXAMPLE_JSON, TMPJSONFILE)
+        os.chmod(TMPJSONFILE, 0o640)
+        self.assertTrue(utils.write_json_to_file(EXAMPLE_JSON, TMPJSONFILE,
+            atomic = True))
+        self.assertEqual(os.stat(TMPJSONFILE).st_mode & 0o7777, 0o640)
 
 
 def run():